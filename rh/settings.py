@@ -94,6 +94,64 @@ EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "False").lower() == "true"
 EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "")
 DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "webmaster@localhost")
+# Notificações: mensagens por segundo (0 = sem limite) e tamanho do lote por conexão.
+NOTIFICATION_MAIL_RATE = float(os.getenv("NOTIFICATION_MAIL_RATE", "0"))
+NOTIFICATION_MAIL_BATCH_SIZE = int(os.getenv("NOTIFICATION_MAIL_BATCH_SIZE", "50"))
+# Fila de e-mails (run_automations --only notification_outbox): threads de envio,
+# tentativas antes de desistir e backoff exponencial (s) entre elas.
+NOTIFICATION_OUTBOX_WORKERS = int(os.getenv("NOTIFICATION_OUTBOX_WORKERS", "4"))
+NOTIFICATION_OUTBOX_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_OUTBOX_MAX_ATTEMPTS", "5"))
+NOTIFICATION_OUTBOX_BACKOFF = int(os.getenv("NOTIFICATION_OUTBOX_BACKOFF", "60"))
+
+# Catch-up do run_automations: quantos dias perdidos recuperar a partir do último
+# sucesso de cada rotina, e prazo (dias) para o RH confirmar um plano avisado com atraso.
+AUTOMATION_CATCHUP_MAX_DAYS = int(os.getenv("AUTOMATION_CATCHUP_MAX_DAYS", "31"))
+CAREER_PLAN_LATE_CONFIRMATION_DAYS = int(os.getenv("CAREER_PLAN_LATE_CONFIRMATION_DAYS", "3"))
+
+# run_automations em paralelo: número de workers (vagas) e validade (s) da vaga
+# de um processo que morreu sem liberá-la.
+AUTOMATION_WORKERS = int(os.getenv("AUTOMATION_WORKERS", "1"))
+AUTOMATION_LEASE_SECONDS = int(os.getenv("AUTOMATION_LEASE_SECONDS", "3600"))
+
+# Dias de histórico (AutomationRun/AutomationStep) mantidos pela rotina automation_history.
+AUTOMATION_RUN_RETENTION_DAYS = int(os.getenv("AUTOMATION_RUN_RETENTION_DAYS", "30"))
+
+# Token do scraper do Prometheus para /automations/metrics/ (Authorization: Bearer <token>).
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# run_scheduler: threads para rotinas independentes e atraso aleatório máximo (s).
+# AUTOMATION_SCHEDULES sobrescreve os horários padrão ({'rotina': segundos | 'HH:MM' | None}).
+AUTOMATION_SCHEDULER_WORKERS = int(os.getenv("AUTOMATION_SCHEDULER_WORKERS", "2"))
+AUTOMATION_SCHEDULER_JITTER = int(os.getenv("AUTOMATION_SCHEDULER_JITTER", "30"))
+AUTOMATION_SCHEDULES = {}
+
+# Cache do dashboard: vazio = LRU em memória por processo; ou um alias de CACHES.
+DASHBOARD_CACHE_ALIAS = os.getenv("DASHBOARD_CACHE_ALIAS") or None
+DASHBOARD_CACHE_MAXSIZE = int(os.getenv("DASHBOARD_CACHE_MAXSIZE", "128"))
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv("DASHBOARD_CACHE_TIMEOUT", "300"))
+
+# Limites (em anos) do histograma de tempo de empresa.
+TENURE_BUCKET_EDGES = [int(e) for e in os.getenv("TENURE_BUCKET_EDGES", "1,3,5,10,15").split(",") if e.strip()]
+
+# PDFs: tempo (s) em que um PDF pronto é reaproveitado (0 desliga o cache),
+# tempo máximo de um job em execução e processos do run_pdf_worker.
+PDF_CACHE_TTL = int(os.getenv("PDF_CACHE_TTL", "300"))
+PDF_JOB_TIMEOUT = int(os.getenv("PDF_JOB_TIMEOUT", "600"))
+PDF_WORKER_PROCESSES = int(os.getenv("PDF_WORKER_PROCESSES", "0")) or None
+PDF_PACK_MAX_EMPLOYEES = int(os.getenv("PDF_PACK_MAX_EMPLOYEES", "200"))
+# Kits de admissão até este número de funcionários saem no próprio request; acima, vão para a fila.
+PDF_PACK_INLINE_MAX_EMPLOYEES = int(os.getenv("PDF_PACK_INLINE_MAX_EMPLOYEES", "5"))
+# Folhas de estilo (relativas a STATIC_URL) carregadas uma vez por processo e aplicadas a todo PDF
+PDF_STYLESHEETS = ['global/css/pdf_fonts.css']
+
+# Exportações CSV/XLSX: linhas lidas do banco por bloco (queryset.iterator).
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000"))
+# Máximo de sugestões devolvidas pelo autocomplete da busca de funcionários.
+EMPLOYEE_AUTOCOMPLETE_LIMIT = int(os.getenv("EMPLOYEE_AUTOCOMPLETE_LIMIT", "10"))
+# Busca de CID em memória: intervalo (s) para conferir se a tabela mudou em outro
+# processo (0 = só no restart/load_cids) e max-age (s) das respostas no navegador.
+CID_INDEX_REFRESH_SECONDS = int(os.getenv("CID_INDEX_REFRESH_SECONDS", "300"))
+CID_SEARCH_MAX_AGE = int(os.getenv("CID_SEARCH_MAX_AGE", "300"))
 
 
 # Database
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Employee, Department, JobTitle, Vacation, Training, NotificationLog, NotificationRecipient, NotificationRule, CareerPlan, Occurrence
+from .models import AutomationCheckpoint, AutomationLease, AutomationRun, AutomationStep, Employee, Department, JobTitle, Vacation, Training, NotificationLog, NotificationOutbox, NotificationRecipient, NotificationRule, CareerPlan, Occurrence
 
 class EmployeeAdmin(admin.ModelAdmin):
     ...
@@ -23,14 +23,14 @@ class TrainingAdmin(admin.ModelAdmin):
 
 @admin.register(NotificationRule)
 class NotificationRuleAdmin(admin.ModelAdmin):
-    list_display = ("event_type", "days_in_advance", "is_active")
-    list_filter = ("event_type", "is_active")
+    list_display = ("event_type", "days_in_advance", "is_active", "send_as_digest")
+    list_filter = ("event_type", "is_active", "send_as_digest")
 
 
 @admin.register(NotificationRecipient)
 class NotificationRecipientAdmin(admin.ModelAdmin):
-    list_display = ("name", "email", "receive_all_events", "is_active")
-    list_filter = ("receive_all_events", "is_active")
+    list_display = ("name", "email", "receive_all_events", "digest_mode", "is_active")
+    list_filter = ("receive_all_events", "digest_mode", "is_active")
     search_fields = ("name", "email")
 
 
@@ -40,6 +40,40 @@ class NotificationLogAdmin(admin.ModelAdmin):
     list_filter = ("rule", "reference_year")
     readonly_fields = ("sent_at",)
 
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ("subject", "status", "attempts", "next_attempt_at", "sent_at")
+    list_filter = ("status",)
+    readonly_fields = ("created_at", "sent_at", "last_error")
+
+
+@admin.register(AutomationCheckpoint)
+class AutomationCheckpointAdmin(admin.ModelAdmin):
+    list_display = ("name", "last_success_on", "updated_at")
+    readonly_fields = ("updated_at",)
+
+
+@admin.register(AutomationLease)
+class AutomationLeaseAdmin(admin.ModelAdmin):
+    list_display = ("name", "owner", "acquired_at", "expires_at")
+    readonly_fields = ("acquired_at",)
+
+
+class AutomationStepInline(admin.TabularInline):
+    model = AutomationStep
+    extra = 0
+    readonly_fields = ("name", "status", "started_at", "duration", "rows_scanned", "events_produced", "emails_sent", "errors", "error_message")
+    can_delete = False
+
+
+@admin.register(AutomationRun)
+class AutomationRunAdmin(admin.ModelAdmin):
+    list_display = ("started_at", "status", "dry_run", "slot", "duration")
+    list_filter = ("status", "dry_run")
+    readonly_fields = ("started_at", "finished_at", "duration", "owner", "slot")
+    inlines = (AutomationStepInline,)
+
 @admin.register(CareerPlan)
 class CareerPlanAdmin(admin.ModelAdmin):
     list_display = ("employee", "created_at", "updated_at")
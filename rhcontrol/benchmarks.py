@@ -0,0 +1,524 @@
+"""
+benchmarks.py — Micro-benchmarks for the hot paths of rhcontrol.
+
+Executed through `python manage.py run_benchmarks`. Every benchmark runs
+against the configured database (use `generate_data` to populate it) and
+returns a list of BenchResult rows that the command prints as a table.
+"""
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Callable
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+
+@dataclass
+class BenchResult:
+    label: str
+    seconds: float
+    queries: int
+    notes: list[str] = field(default_factory=list)
+    details: list[str] = field(default_factory=list)  # linhas extras (ex.: plano do EXPLAIN)
+
+
+def measure(label: str, fn: Callable, repeat: int = 5) -> tuple[BenchResult, object]:
+    """
+    Run `fn` `repeat` times and keep the best wall-clock time.
+    Returns the BenchResult plus the value produced by the last call.
+    """
+    best = float('inf')
+    queries = 0
+    value = None
+    for _ in range(max(repeat, 1)):
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            value = fn()
+            elapsed = time.perf_counter() - started
+        best = min(best, elapsed)
+        queries = len(ctx.captured_queries)
+    return BenchResult(label=label, seconds=best, queries=queries), value
+
+
+# ── Upcoming events: annual dates ──────────────────────────────
+
+def _legacy_annual_scan(field_name: str, start, end) -> list[tuple[int, object]]:
+    """Reference implementation: loads every active employee and matches in Python."""
+    from rhcontrol.models import Employee
+    from rhcontrol.services import _ue_next_annual
+
+    matches = []
+    qs = Employee.objects.select_related('department').filter(
+        termination_date__isnull=True, **{f'{field_name}__isnull': False}
+    )
+    for emp in qs:
+        occ = _ue_next_annual(getattr(emp, field_name), start, end)
+        if occ is not None:
+            matches.append((emp.pk, occ))
+    return matches
+
+
+def bench_upcoming_annual_events(repeat: int = 5) -> list[BenchResult]:
+    from rhcontrol.services import _ue_generate_birthday, _ue_generate_company_anniversary
+
+    today = timezone.localdate()
+    results = []
+    windows = [
+        ('30 dias', today, today + timedelta(days=30)),
+        ('virada de ano', today.replace(month=12, day=15), today.replace(month=12, day=15) + timedelta(days=45)),
+    ]
+    for label, start, end in windows:
+        for field_name, generator in (('birth_date', _ue_generate_birthday),
+                                      ('hire_date', _ue_generate_company_anniversary)):
+            legacy, legacy_rows = measure(f'{field_name} [{label}] varredura Python', lambda: _legacy_annual_scan(field_name, start, end), repeat)
+            set_based, events = measure(f'{field_name} [{label}] filtro SQL', lambda: generator(start, end, {}), repeat)
+
+            expected = sorted(legacy_rows)
+            produced = sorted((e['object_id'], e['date']) for e in events)
+            set_based.notes.append('resultado idêntico' if expected == produced else 'DIVERGÊNCIA DE RESULTADO')
+            results.extend([legacy, set_based])
+    return results
+
+
+# ── List exports (CSV/XLSX streaming) ──────────────────────────
+
+def _peak_memory(fn: Callable) -> tuple[object, int]:
+    import tracemalloc
+    tracemalloc.start()
+    try:
+        value = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return value, peak
+
+
+def bench_list_exports(repeat: int = 5) -> list[BenchResult]:
+    from rhcontrol.exports import EMPLOYEE_EXPORT_COLUMNS, iter_csv, iter_export_rows, iter_xlsx
+    from rhcontrol.models import Employee
+
+    queryset = Employee.objects.order_by('name')
+    headers = [header for _, header in EMPLOYEE_EXPORT_COLUMNS]
+    total = queryset.count()
+
+    def materialized():
+        # Referência: lista inteira de instâncias em memória antes de escrever.
+        rows = [
+            (e.name, e.cpf, e.email, e.department.name if e.department else None,
+             e.job_title.name if e.job_title else None, e.hire_date, e.termination_date)
+            for e in queryset.select_related('department', 'job_title')
+        ]
+        return sum(len(chunk) for chunk in iter_csv(headers, rows))
+
+    def streamed(writer):
+        return lambda: sum(len(chunk) for chunk in writer(headers, iter_export_rows(queryset, EMPLOYEE_EXPORT_COLUMNS)))
+
+    def first_row():
+        chunks = iter_csv(headers, iter_export_rows(queryset, EMPLOYEE_EXPORT_COLUMNS))
+        return next(chunks), next(chunks)
+
+    results = []
+    for label, fn in (('CSV com lista materializada', materialized),
+                      ('CSV em streaming', streamed(iter_csv)),
+                      ('XLSX em streaming', streamed(iter_xlsx)),
+                      ('cabeçalho + primeira linha (CSV)', first_row)):
+        result, _ = measure(f'{label} ({total} funcionários)', fn, repeat)
+        _, peak = _peak_memory(fn)
+        result.notes.append(f'pico {peak / 1024:.0f} KiB')
+        results.append(result)
+    return results
+
+
+# ── Notification mail dispatch ─────────────────────────────────
+
+def bench_mail_dispatch(repeat: int = 5, messages: int = 300, handshake_ms: float = 2.0) -> list[BenchResult]:
+    """
+    Per-message send_mail (one connection per e-mail) vs MailDispatcher (one
+    pooled connection), both against Django's locmem backend. The backend
+    counts the connections each strategy opens and sleeps `handshake_ms` on
+    every open to stand in for the SMTP greeting/TLS/AUTH round-trips.
+    """
+    from django.core import mail
+    from django.core.mail import EmailMessage
+    from django.core.mail.backends.locmem import EmailBackend
+    from rhcontrol.mailer import MailDispatcher
+
+    class CountingBackend(EmailBackend):
+        opened = 0
+
+        def open(self):
+            CountingBackend.opened += 1
+            time.sleep(handshake_ms / 1000)
+            return True
+
+    def build():
+        return [
+            EmailMessage(subject=f'Aviso RH {i}', body='Teste', from_email='rh@localhost', to=['gestor@localhost'])
+            for i in range(messages)
+        ]
+
+    def per_message():
+        for message in build():
+            connection = CountingBackend()
+            connection.open()
+            connection.send_messages([message])
+            connection.close()
+
+    def dispatched():
+        with MailDispatcher(connection=CountingBackend(), rate=0) as dispatcher:
+            for i, message in enumerate(build()):
+                dispatcher.add(message, key=i)
+        return dispatcher
+
+    results = []
+    for label, fn in (('send_mail por mensagem', per_message), ('MailDispatcher (conexão única)', dispatched)):
+        CountingBackend.opened = 0
+        mail.outbox = []
+        result, _ = measure(f'{label} ({messages} e-mails)', fn, repeat)
+        result.notes.append(f'{CountingBackend.opened // max(repeat, 1)} conexão(ões) por execução, handshake simulado de {handshake_ms:g} ms')
+        results.append(result)
+    return results
+
+
+# ── Employee search ────────────────────────────────────────────
+
+class _Rollback(Exception):
+    pass
+
+
+def _fill_employees(population: int) -> int:
+    """Completa a tabela com funcionários sintéticos até `population`; devolve quantos criou."""
+    import random
+    from datetime import date
+    from rhcontrol.models import Department, Employee, JobTitle
+    from rhcontrol.search import build_search_document
+    from rhcontrol.utils import only_digits
+
+    missing = population - Employee.objects.count()
+    if missing <= 0:
+        return 0
+    department = Department.objects.first() or Department.objects.create(name='Logística')
+    job_title = JobTitle.objects.filter(department=department).first() or JobTitle.objects.create(
+        name='Auxiliar', department=department, base_salary=2000,
+    )
+    first_names = ['João', 'José', 'Maria', 'Antônio', 'Conceição', 'Inês', 'Sebastião', 'Lúcia', 'André', 'Cláudia']
+    last_names = ['Silva', 'Souza', 'Gonçalves', 'Araújo', 'Simões', 'Magalhães', 'Conceição', 'Brandão', 'Assunção', 'Pereira']
+    rng = random.Random(42)
+    # Gerador separado para as datas, para não mudar os nomes já usados nos outros benchmarks.
+    dates = random.Random(43)
+    today = timezone.localdate()
+    employees = []
+    for i in range(missing):
+        name = f"{rng.choice(first_names)} {rng.choice(last_names)} {rng.choice(last_names)}"
+        cpf = f"9{i:010d}"
+        cpf = f"{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}"
+        email = f"func{i}@bench.local"
+        phone = f"(11) 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}"
+        hire_date = today - timedelta(days=dates.randint(0, 30 * 365))
+        terminated = dates.random() < 0.15
+        employees.append(Employee(
+            name=name, cpf=cpf, email=email, mobile_phone=phone,
+            birth_date=date(1960, 1, 1) + timedelta(days=dates.randint(0, 40 * 365)),
+            hire_date=hire_date,
+            termination_date=hire_date + timedelta(days=dates.randint(1, 900)) if terminated else None,
+            is_trial_contract=not terminated and dates.random() < 0.03,
+            contract_end_date=today + timedelta(days=dates.randint(-30, 365)) if dates.random() < 0.05 else None,
+            department=department, job_title=job_title, cpf_digits=only_digits(cpf),
+            search_document=build_search_document(name, cpf, email, department.name, phone),
+        ))
+    Employee.objects.bulk_create(employees, batch_size=2000)
+    return missing
+
+
+def bench_employee_search(repeat: int = 5, population: int = 100_000) -> list[BenchResult]:
+    """
+    Five-way icontains OR (the old employee_view filter) vs search_employees
+    on the search index. The table is topped up to `population` employees
+    inside a transaction that is rolled back at the end.
+    """
+    from django.db import transaction
+    from django.db.models import Q
+    from rhcontrol.models import Employee
+    from rhcontrol.search import search_backend, search_employees
+
+    def legacy(query):
+        return Employee.objects.select_related('department').filter(
+            Q(name__icontains=query) | Q(cpf__icontains=query) | Q(email__icontains=query)
+            | Q(department__name__icontains=query) | Q(mobile_phone__icontains=query)
+        ).order_by('name')
+
+    def indexed(query):
+        return search_employees(Employee.objects.select_related('department'), query, ranked=True)
+
+    results = []
+    try:
+        with transaction.atomic():
+            created = _fill_employees(population)
+            total = Employee.objects.count()
+            for query in ('joao', 'conceicao silva', 'gonçalves', '90000012', '900.000.012-34'):
+                for label, build in (('icontains OR (5 colunas)', legacy), (f'índice de busca ({search_backend()})', indexed)):
+                    result, page = measure(
+                        f"'{query}' {label}",
+                        lambda: (build(query).count(), list(build(query)[:40])),
+                        repeat,
+                    )
+                    result.notes.append(f'{page[0]} resultado(s) de {total}')
+                    results.append(result)
+            if created:
+                results[-1].notes.append(f'{created} funcionário(s) sintético(s) descartado(s) no rollback')
+            raise _Rollback
+    except _Rollback:
+        pass
+    return results
+
+
+# ── CID search (occurrence form) ───────────────────────────────
+
+def _fill_cids(population: int) -> int:
+    """Completa a tabela de CIDs com códigos sintéticos no formato A000..Z999."""
+    import random
+    from rhcontrol.models import CID
+
+    existing = set(CID.objects.values_list('code', flat=True))
+    rng = random.Random(7)
+    # Vocabulário com frequência de Zipf, como nas descrições reais: poucos termos
+    # muito comuns e milhares de termos raros.
+    syllables = ['ca', 'de', 'fe', 'gi', 'lo', 'ma', 'ni', 'po', 'ra', 'sé', 'tu', 'vi', 'xo', 'ção', 'nha', 'pli']
+    words = ['Diabetes', 'mellitus', 'episódio', 'depressivo', 'fratura', 'fêmur', 'infecção', 'aguda', 'crônica',
+             'lesão', 'músculo', 'tendão', 'punho', 'mão', 'hipertensão', 'essencial', 'transtorno', 'ansiedade']
+    words += [''.join(rng.choices(syllables, k=rng.randint(2, 4))) for _ in range(6000)]
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+    cids = []
+    for letter in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ':
+        for number in range(1000):
+            if len(existing) + len(cids) >= population:
+                break
+            code = f'{letter}{number:03d}'
+            if code not in existing:
+                cids.append(CID(code=code, description=' '.join(rng.choices(words, weights, k=rng.randint(3, 7))).capitalize()))
+    CID.objects.bulk_create(cids, batch_size=2000)
+    return len(cids)
+
+
+def bench_cid_search(repeat: int = 5, population: int = 14_000) -> list[BenchResult]:
+    """
+    The old icontains OR on code/description vs the in-memory CidIndex.
+    Synthetic CIDs (if needed) are rolled back at the end.
+    """
+    from django.db import transaction
+    from django.db.models import Q
+    from rhcontrol.cid_index import CidIndex
+    from rhcontrol.models import CID
+
+    def legacy(query):
+        return [(c.id, f"{c.code} - {c.description}") for c in CID.objects.filter(
+            Q(code__icontains=query) | Q(description__icontains=query)
+        )[:20]]
+
+    results = []
+    try:
+        with transaction.atomic():
+            created = _fill_cids(population)
+            build, index = measure('montagem do índice', lambda: CidIndex(CID.objects.values_list('pk', 'code', 'description')), 1)
+            build.notes.append(f'{len(index)} CIDs, {len(index.vocabulary)} termos')
+            results.append(build)
+            for query in ('F32', 'f320', 'diab', 'infeccao aguda', 'fêmur'):
+                old, _ = measure(f"'{query}' icontains no banco", lambda: legacy(query), repeat)
+                new, found = measure(f"'{query}' índice em memória", lambda: index.search(query), repeat)
+                new.notes.append(f'{len(found)} resultado(s)')
+                results.extend([old, new])
+            if created:
+                results[-1].notes.append(f'{created} CID(s) sintético(s) descartado(s) no rollback')
+            raise _Rollback
+    except _Rollback:
+        pass
+    return results
+
+
+# ── List pagination (OFFSET vs keyset) ─────────────────────────
+
+def bench_list_pagination(repeat: int = 5, population: int = 100_000, deep_page: int = 2000) -> list[BenchResult]:
+    """
+    Django Paginator (COUNT(*) + OFFSET) vs KeysetPaginator on the employee
+    list, at page 1 and at `deep_page` (40 per page, as in employee_view).
+    """
+    from django.core.paginator import Paginator
+    from django.db import transaction
+    from rhcontrol.models import Employee
+    from rhcontrol.pagination import KeysetPaginator
+
+    per_page = 40
+    results = []
+    try:
+        with transaction.atomic():
+            created = _fill_employees(population)
+            queryset = Employee.objects.select_related('department')
+            total = queryset.count()
+            page_number = min(deep_page, max(total // per_page, 1))
+
+            for ordering in (['name'], ['department__name']):
+                paginator = KeysetPaginator(queryset, per_page, ordering, count_cap=None)
+                cursor, page = None, paginator.get_page()
+                for _ in range(page_number - 1):
+                    cursor = page.next_cursor
+                    page = paginator.get_page(cursor)
+                deep_first = page.object_list[0].pk
+
+                label = ordering[0]
+                for number, keyset_cursor in ((1, None), (page_number, cursor)):
+                    offset, offset_page = measure(
+                        f'{label}: página {number} Paginator (COUNT + OFFSET)',
+                        lambda: list(Paginator(queryset.order_by(*ordering, 'pk'), per_page).get_page(number)),
+                        repeat,
+                    )
+                    keyset, keyset_page = measure(
+                        f'{label}: página {number} KeysetPaginator',
+                        lambda: KeysetPaginator(queryset, per_page, ordering).get_page(keyset_cursor),
+                        repeat,
+                    )
+                    same = [e.pk for e in offset_page] == [e.pk for e in keyset_page]
+                    keyset.notes.append(f'total {keyset_page.total_display}; ' + ('mesma página' if same else 'DIVERGÊNCIA DE RESULTADO'))
+                    results.extend([offset, keyset])
+                if deep_first != keyset_page.object_list[0].pk:
+                    results[-1].notes.append('DIVERGÊNCIA NO CURSOR')
+            if created:
+                results[-1].notes.append(f'{created} funcionário(s) sintético(s) descartado(s) no rollback')
+            raise _Rollback
+    except _Rollback:
+        pass
+    return results
+
+
+# ── Hot filters: query plans with and without the indexes ─────
+
+def _fill_employee_records(employee_ids: list[int]) -> None:
+    """Férias, ocorrências e planos de carreira sintéticos para `employee_ids`."""
+    import random
+    from rhcontrol.models import CareerPlan, JobTitle, Occurrence, Vacation
+
+    rng = random.Random(44)
+    today = timezone.localdate()
+    job_title = JobTitle.objects.first()
+    statuses = [value for value, _ in CareerPlan.PlanStatus.choices]
+    vacations, occurrences, plans = [], [], []
+    for employee_id in employee_ids:
+        start = today + timedelta(days=rng.randint(-3 * 365, 120))
+        vacations.append(Vacation(
+            employee_id=employee_id, start_date=start, vacation_duration=30,
+            end_date=start + timedelta(days=29), return_date=start + timedelta(days=30),
+        ))
+        for _ in range(2):
+            occurred = today - timedelta(days=rng.randint(0, 5 * 365))
+            is_absence = rng.random() < 0.3
+            occurrences.append(Occurrence(
+                employee_id=employee_id, title='Ocorrência', description='Gerada pelo benchmark',
+                occurrence_date=occurred, is_absence=is_absence,
+                end_date=occurred + timedelta(days=rng.randint(1, 60)) if is_absence and rng.random() < 0.9 else None,
+            ))
+        if rng.random() < 0.1:
+            plans.append(CareerPlan(
+                employee_id=employee_id, proposed_job=job_title, proposed_salary=3000,
+                promotion_date=today + timedelta(days=rng.randint(-365, 365)), status=rng.choice(statuses),
+            ))
+    Vacation.objects.bulk_create(vacations, batch_size=2000)
+    Occurrence.objects.bulk_create(occurrences, batch_size=2000)
+    CareerPlan.objects.bulk_create(plans, batch_size=2000)
+
+
+def _hot_filter_indexes():
+    """(model, Index) de cada índice declarado em Meta.indexes dos modelos com filtros frequentes."""
+    from rhcontrol.models import CareerPlan, Employee, Occurrence, Vacation
+    return [(model, index) for model in (Employee, Vacation, CareerPlan, Occurrence) for index in model._meta.indexes]
+
+
+def _set_hot_filter_indexes(enabled: bool) -> None:
+    editor = connection.schema_editor(collect_sql=True)
+    with connection.cursor() as cursor:
+        for model, index in _hot_filter_indexes():
+            if enabled:
+                cursor.execute(str(index.create_sql(model, editor)))
+            else:
+                cursor.execute(editor.sql_delete_index % {
+                    'table': editor.quote_name(model._meta.db_table), 'name': editor.quote_name(index.name),
+                })
+        cursor.execute('ANALYZE')
+
+
+def _hot_queries(today, employee_id) -> list[tuple[str, Callable]]:
+    """
+    As consultas de views.py/services.py que os índices cobrem, como querysets
+    prontos. As que terminam em "(count)" são medidas com .count(), como na view.
+    """
+    from django.db.models import Q
+    from rhcontrol.models import CareerPlan, Employee, Occurrence, Vacation
+    from rhcontrol.services import _UE_ACTIVE_CAREER_STATUSES, _ue_annual_window_q
+
+    window = (today, today + timedelta(days=30))
+    active = Employee.objects.filter(termination_date__isnull=True)
+    return [
+        ('dashboard: férias em andamento (count)', lambda: Vacation.objects.filter(end_date__gte=today)),
+        ('employee_view: todos por nome', lambda: Employee.objects.order_by('name', 'pk')[:40]),
+        ('employee_view: desligados por nome',
+         lambda: Employee.objects.filter(termination_date__isnull=False).order_by('name', 'pk')[:40]),
+        ('eventos: aniversários (30 dias)', lambda: active.filter(_ue_annual_window_q('birth_date', *window))),
+        ('eventos: tempo de casa (30 dias)', lambda: active.filter(_ue_annual_window_q('hire_date', *window))),
+        ('eventos: fim de contrato', lambda: active.filter(contract_end_date__isnull=False)),
+        ('eventos: experiência', lambda: active.filter(is_trial_contract=True)),
+        ('eventos: férias (início ou retorno)',
+         lambda: Vacation.objects.filter(Q(start_date__range=window) | Q(return_date__range=window))),
+        ('eventos: planos de carreira',
+         lambda: CareerPlan.objects.filter(promotion_date__range=window, status__in=_UE_ACTIVE_CAREER_STATUSES)),
+        ('automação: planos confirmados vencidos', lambda: CareerPlan.objects.filter(
+            status=CareerPlan.PlanStatus.CONFIRMED, promotion_date__lte=today, effective_applied_at__isnull=True,
+        )),
+        ('employee_view: afastamento (with_status_flags)',
+         lambda: Employee.objects.with_status_flags(today).order_by('name', 'pk')[:40]),
+        ('perfil: afastamentos do funcionário',
+         lambda: Occurrence.objects.filter(employee_id=employee_id, is_absence=True)),
+    ]
+
+
+def bench_query_plans(repeat: int = 5, population: int = 100_000) -> list[BenchResult]:
+    """
+    Each hot filter from views.py/services.py, first with the indexes from
+    migration 0045 dropped and then with them recreated, printing the
+    EXPLAIN plan under each timing. Synthetic rows and the index changes
+    happen inside a transaction that is rolled back at the end.
+    """
+    from django.db import transaction
+    from django.db.models import Max
+    from rhcontrol.models import Employee, Occurrence
+
+    today = timezone.localdate()
+    results = []
+    try:
+        with transaction.atomic():
+            last_pk = Employee.objects.aggregate(last=Max('pk'))['last'] or 0
+            created = _fill_employees(population)
+            if created:
+                _fill_employee_records(list(Employee.objects.filter(pk__gt=last_pk).values_list('pk', flat=True)))
+
+            employee_id = Occurrence.objects.filter(is_absence=True).values_list('employee_id', flat=True).last()
+            timings = {}
+            for enabled in (False, True):
+                _set_hot_filter_indexes(enabled)
+                for label, build in _hot_queries(today, employee_id):
+                    evaluate = (lambda: build().count()) if label.endswith('(count)') else (lambda: len(list(build())))
+                    result, rows = measure(f"{label} [{'com' if enabled else 'sem'} índices]", evaluate, repeat)
+                    result.details = build().explain().splitlines()
+                    result.notes.append(f'{rows} linha(s)')
+                    if enabled and timings[label]:
+                        result.notes.append(f'{timings[label] / max(result.seconds, 1e-9):.1f}x')
+                    timings[label] = result.seconds
+                    results.append(result)
+            # Antes / depois lado a lado.
+            half = len(results) // 2
+            results = [row for pair in zip(results[:half], results[half:]) for row in pair]
+            if created:
+                results[-1].notes.append(f'{created} funcionário(s) sintético(s) descartado(s) no rollback')
+            raise _Rollback
+    except _Rollback:
+        pass
+    return results
@@ -0,0 +1,162 @@
+"""
+cache.py — Cache do dashboard.
+
+Por padrão usa um LRU em memória (por processo). Para compartilhar entre
+workers, aponte DASHBOARD_CACHE_ALIAS para um alias de settings.CACHES
+(ex.: Redis/Memcached).
+
+Chave: a data. Com backend compartilhado cada entrada guarda a versão em
+que foi calculada, e um acerto é um único get_many (versão + entrada).
+Escritas em Employee, Vacation, Training e CareerPlan incrementam a versão
+(ver signals.py), o que invalida todas as entradas de uma vez sem precisar
+enumerá-las.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from django.conf import settings
+
+
+class LRUCache:
+    """LRU simples, thread-safe, com expiração opcional por entrada."""
+
+    def __init__(self, maxsize: int = 128, timeout: float | None = None):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value) -> None:
+        expires_at = time.monotonic() + self.timeout if self.timeout else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+_MISSING = object()
+
+
+class DashboardCache:
+    """
+    Fachada usada pelo dashboard_view. O backend é resolvido na primeira
+    utilização, então mudanças de settings em testes são respeitadas após reset().
+    """
+    VERSION_KEY = 'rhcontrol:dashboard:version'
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._backend = None
+        self._lock = threading.Lock()
+
+    # ── backend ─────────────────────────────────────────────────
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            alias = getattr(settings, 'DASHBOARD_CACHE_ALIAS', None)
+            if alias:
+                from django.core.cache import caches
+                self._backend = caches[alias]
+            else:
+                self._backend = LRUCache(
+                    maxsize=getattr(settings, 'DASHBOARD_CACHE_MAXSIZE', 128),
+                    timeout=getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300),
+                )
+        return self._backend
+
+    def _is_local(self) -> bool:
+        return isinstance(self.backend, LRUCache)
+
+    # ── API ─────────────────────────────────────────────────────
+
+    def make_key(self, day) -> str:
+        return f"rhcontrol:dashboard:{day.isoformat()}"
+
+    def get_or_compute(self, key: str, compute: Callable[[], dict]) -> dict:
+        if self._is_local():
+            value = self.backend.get(key, _MISSING)
+            if value is not _MISSING:
+                self._count_hit()
+                return value
+            self._count_miss()
+            value = compute()
+            self.backend.set(key, value)
+            return value
+
+        # Uma ida ao backend por acerto: a versão atual e a entrada juntas.
+        found = self.backend.get_many([self.VERSION_KEY, key])
+        version = found.get(self.VERSION_KEY)
+        entry = found.get(key)
+        if version is not None and entry is not None and entry[0] == version:
+            self._count_hit()
+            return entry[1]
+
+        self._count_miss()
+        if version is None:
+            # Versão nova a cada (re)criação: entradas de antes de um despejo não voltam a valer.
+            self.backend.add(self.VERSION_KEY, time.time_ns(), timeout=None)
+            version = self.backend.get(self.VERSION_KEY)
+        value = compute()
+        self.backend.set(key, (version, value), timeout=getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300))
+        return value
+
+    def invalidate(self) -> None:
+        if self._is_local():
+            self.backend.clear()
+            return
+        try:
+            self.backend.incr(self.VERSION_KEY)
+        except ValueError:
+            pass  # sem versão gravada, a próxima leitura cria uma nova
+
+    def _count_hit(self) -> None:
+        with self._lock:
+            self.hits += 1
+
+    def _count_miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': (self.hits / total) if total else 0.0,
+            'backend': type(self.backend).__name__,
+        }
+
+    def reset(self) -> None:
+        """Zera contadores e descarta o backend (usado em testes)."""
+        if self._backend is not None and self._is_local():
+            self._backend.clear()
+        self._backend = None
+        self.hits = 0
+        self.misses = 0
+
+
+dashboard_cache = DashboardCache()
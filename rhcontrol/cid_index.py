@@ -0,0 +1,188 @@
+"""
+cid_index.py — Índice em memória do CID-10 para o autocomplete das ocorrências.
+
+A tabela CID (~14 mil linhas) muda só quando `load_cids` roda, então cada
+processo monta o índice uma vez (no primeiro uso) e responde a busca sem ir
+ao banco:
+
+- códigos normalizados (sem ponto, maiúsculos) num array ordenado, para
+  busca por prefixo com bisect;
+- índice invertido token → entradas sobre as descrições sem acento, com o
+  vocabulário ordenado para expandir prefixos (o último termo está sendo
+  digitado).
+
+Ranking: código exato, prefixo de código e então descrição (frase no início,
+primeira palavra, demais), desempatando pelo código.
+
+O índice é descartado pelos signals de CID e pelo `load_cids` no mesmo
+processo; os demais processos conferem a cada CID_INDEX_REFRESH_SECONDS se a
+tabela mudou (quantidade e maior id, que o `load_cids` sempre altera).
+"""
+import hashlib
+import heapq
+import re
+import threading
+import time
+from bisect import bisect_left
+from itertools import islice
+
+from django.conf import settings
+
+from .utils import normalize_search_text
+
+_CODE_QUERY = re.compile(r'^[A-Za-z]\d[\d.]*$')
+
+
+def normalize_cid_code(code: str) -> str:
+    """
+    >>> normalize_cid_code(' f32.1 ')
+    'F321'
+    """
+    return (code or '').replace('.', '').strip().upper()
+
+
+def _prefix_slice(sorted_keys: list[str], prefix: str) -> slice:
+    """Trecho de `sorted_keys` cujas chaves começam com `prefix`."""
+    start = bisect_left(sorted_keys, prefix)
+    return slice(start, bisect_left(sorted_keys, prefix + '\uffff', start))
+
+
+def _prefix_range(sorted_keys: list[str], prefix: str) -> range:
+    bounds = _prefix_slice(sorted_keys, prefix)
+    return range(bounds.start, bounds.stop)
+
+
+class CidIndex:
+    """
+    Índice imutável de uma leitura da tabela. `rows` = (id, código, descrição).
+
+    >>> index = CidIndex([(1, 'F32', 'Episódios depressivos'), (2, 'F320', 'Episódio depressivo leve'),
+    ...                   (3, 'E10', 'Diabetes mellitus insulino-dependente')])
+    >>> [r['id'] for r in index.search('f32')]
+    [1, 2]
+    >>> [r['id'] for r in index.search('episodio depr')]
+    [2, 1]
+    >>> index.search('diabetes insulino')[0]['text']
+    'E10 - Diabetes mellitus insulino-dependente'
+    """
+
+    def __init__(self, rows):
+        self.entries = sorted(
+            ((pk, code, description) for pk, code, description in rows),
+            key=lambda row: normalize_cid_code(row[1]),
+        )
+        self.codes = [normalize_cid_code(code) for _, code, _ in self.entries]
+        self.texts = [normalize_search_text(description) for _, _, description in self.entries]
+
+        postings: dict[str, list[int]] = {}
+        for position, text in enumerate(self.texts):
+            for token in set(re.findall(r'\w+', text)):
+                postings.setdefault(token, []).append(position)
+        self.vocabulary = sorted(postings)
+        self.postings = [postings[token] for token in self.vocabulary]
+        # Primeira palavra de cada descrição, ordenada: os resultados que começam
+        # pelo termo buscado saem por prefixo, sem ordenar todos os candidatos.
+        self.first_words = sorted((text.split(' ', 1)[0], position) for position, text in enumerate(self.texts))
+        self.first_word_keys = [word for word, _ in self.first_words]
+
+        digest = hashlib.sha1()
+        for pk, code, description in self.entries:
+            digest.update(f'{pk}\x1f{code}\x1f{description}\x1e'.encode('utf-8'))
+        self.version = digest.hexdigest()[:16]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def search(self, query: str, limit: int = 20) -> list[dict]:
+        text = normalize_search_text(query)
+        if not text:
+            return []
+
+        ranked: list[int] = []
+        seen: set[int] = set()
+
+        def take(positions):
+            for position in positions:
+                if position not in seen:
+                    seen.add(position)
+                    ranked.append(position)
+
+        if _CODE_QUERY.match(text):
+            code = normalize_cid_code(text)
+            matches = _prefix_range(self.codes, code)
+            take(position for position in matches if self.codes[position] == code)
+            take(sorted(matches, key=lambda position: (len(self.codes[position]), position)))
+
+        tokens = re.findall(r'\w+', text)
+        if tokens and len(ranked) < limit:
+            # Todo termo casa como prefixo de uma palavra (o último ainda está sendo digitado).
+            postings = [[self.postings[i] for i in _prefix_range(self.vocabulary, token)] for token in tokens]
+            if len(tokens) == 1:
+                # Termo único: quem começa por ele já é candidato e o restante sai em
+                # ordem de código mesclando as listas, sem montar conjuntos.
+                is_candidate = None
+                remaining = heapq.merge(*postings[0])
+            else:
+                candidates = set.intersection(*sorted((set().union(*lists) for lists in postings), key=len))
+                is_candidate = candidates.__contains__
+                remaining = iter(sorted(candidates))
+            leading = heapq.nsmallest(
+                limit,
+                (position for _, position in self.first_words[_prefix_slice(self.first_word_keys, tokens[0])]
+                 if is_candidate is None or is_candidate(position)),
+                # Com um termo só, todo candidato inicial já começa pelo texto buscado.
+                key=None if text == tokens[0] else lambda position: (not self.texts[position].startswith(text), position),
+            )
+            take(leading)
+            take(islice((position for position in remaining if position not in seen), max(limit - len(ranked), 0)))
+
+        return [
+            {'id': self.entries[position][0], 'text': f"{self.entries[position][1]} - {self.entries[position][2]}"}
+            for position in ranked[:limit]
+        ]
+
+    def etag(self, query: str) -> str:
+        key = f'{self.version}:{normalize_search_text(query)}'
+        return hashlib.md5(key.encode('utf-8')).hexdigest()
+
+
+class CidIndexHolder:
+    """Índice do processo: montado no primeiro uso e refeito quando a tabela muda."""
+
+    def __init__(self):
+        self._index: CidIndex | None = None
+        self._stamp = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _table_stamp():
+        from django.db.models import Count, Max
+        from .models import CID
+        stats = CID.objects.aggregate(total=Count('pk'), last=Max('pk'))
+        return stats['total'], stats['last']
+
+    def _build(self) -> None:
+        from .models import CID
+        self._stamp = self._table_stamp()
+        self._index = CidIndex(CID.objects.values_list('pk', 'code', 'description').iterator(chunk_size=2000))
+        self._checked_at = time.monotonic()
+
+    def get(self) -> CidIndex:
+        refresh_every = getattr(settings, 'CID_INDEX_REFRESH_SECONDS', 300)
+        with self._lock:
+            if self._index is None:
+                self._build()
+            elif refresh_every and time.monotonic() - self._checked_at >= refresh_every:
+                self._checked_at = time.monotonic()
+                if self._table_stamp() != self._stamp:
+                    self._build()
+            return self._index
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._index = None
+            self._stamp = None
+
+
+cid_index = CidIndexHolder()
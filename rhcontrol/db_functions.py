@@ -0,0 +1,43 @@
+"""
+db_functions.py — Expressões de banco usadas nos filtros e nos índices.
+
+MonthDay(campo) devolve mês e dia de uma data como um inteiro MMDD
+(15/05 → 515), para que "aniversário entre 10/05 e 09/06" seja um único
+intervalo (MonthDay BETWEEN 510 AND 609) sobre um índice funcional.
+
+O SQL é gerado sem parâmetros de propósito: o SQLite só usa um índice de
+expressão quando a consulta traz exatamente a mesma expressão, e o
+`campo__month` do Django passa 'month' como parâmetro (?), o que nunca casa.
+"""
+from django.db.models import Func, IntegerField, Value
+from django.db.models.functions import ExtractDay, ExtractMonth
+
+
+def month_day(value) -> int:
+    """
+    >>> from datetime import date
+    >>> month_day(date(1990, 5, 15))
+    515
+    """
+    return value.month * 100 + value.day
+
+
+class MonthDay(Func):
+    """Mês/dia (MMDD) de um DateField."""
+
+    arity = 1
+    output_field = IntegerField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        date_expression = self.source_expressions[0]
+        return compiler.compile(ExtractMonth(date_expression) * Value(100) + ExtractDay(date_expression))
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # DateField é gravado como 'AAAA-MM-DD'.
+        sql, params = compiler.compile(self.source_expressions[0])
+        return f"CAST(REPLACE(SUBSTR({sql}, 6, 5), '-', '') AS INTEGER)", params
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        # EXTRACT sobre date é IMMUTABLE, então a expressão pode ser indexada.
+        sql, params = compiler.compile(self.source_expressions[0])
+        return f"CAST(EXTRACT(MONTH FROM {sql}) * 100 + EXTRACT(DAY FROM {sql}) AS integer)", (*params, *params)
@@ -0,0 +1,235 @@
+"""
+exports.py — Exportação das listas em CSV/XLSX via streaming.
+
+As views montam o queryset com os mesmos filtros dos PDFs e passam uma
+projeção `.values()`; as linhas são lidas com `.iterator(chunk_size=...)` e
+escritas conforme saem do banco, então a memória não cresce com o número de
+linhas e o primeiro byte sai imediatamente.
+"""
+import csv
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, Iterator
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+from .streams import ZipStream
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# (campo do .values(), cabeçalho)
+EMPLOYEE_EXPORT_COLUMNS = [
+    ('name', 'Nome'),
+    ('cpf', 'CPF'),
+    ('email', 'E-mail'),
+    ('department__name', 'Setor'),
+    ('job_title__name', 'Cargo'),
+    ('hire_date', 'Admissão'),
+    ('termination_date', 'Demissão'),
+]
+
+VACATION_EXPORT_COLUMNS = [
+    ('employee__name', 'Funcionário'),
+    ('start_date', 'Início'),
+    ('end_date', 'Término'),
+    ('return_date', 'Retorno'),
+    ('vacation_duration', 'Duração (dias)'),
+]
+
+TRAINING_EXPORT_COLUMNS = [
+    ('training_name', 'Treinamento'),
+    ('training_provider', 'Fornecedor'),
+    ('start_date', 'Início'),
+    ('end_date', 'Término'),
+    ('training_total_hours', 'Carga Horária'),
+    ('num_attended', 'Participantes'),
+    ('num_scheduled', 'Agendados'),
+    ('is_integration', 'Integração'),
+]
+
+
+# Texto de CSV que começa com um destes caracteres é lido como fórmula pelo
+# Excel/LibreOffice (CSV injection): um nome "=HYPERLINK(...)" cadastrado no
+# sistema viraria um link executável na planilha exportada.
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _neutralize_formula(text: str) -> str:
+    """
+    >>> _neutralize_formula('=1+1')
+    "'=1+1"
+    >>> _neutralize_formula('Maria')
+    'Maria'
+    """
+    return f"'{text}" if text.startswith(_FORMULA_PREFIXES) else text
+
+
+def _chunk_size() -> int:
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def iter_export_rows(queryset, columns) -> Iterator[tuple]:
+    """Linhas como tuplas, na ordem das colunas, lidas do banco em blocos."""
+    fields = [field for field, _ in columns]
+    return queryset.values_list(*fields).iterator(chunk_size=_chunk_size())
+
+
+# ── CSV ─────────────────────────────────────────────────────────
+
+class _Echo:
+    """csv.writer escreve aqui e recebe de volta a linha já formatada."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'Sim' if value else 'Não'
+    if isinstance(value, (date, datetime)):
+        return value.strftime('%d/%m/%Y')
+    if isinstance(value, str):
+        return _neutralize_formula(value)
+    return value
+
+
+def iter_csv(headers: list[str], rows: Iterable[tuple]) -> Iterator[str]:
+    # BOM + ';' para o Excel em pt-BR abrir acentos e colunas corretamente.
+    writer = csv.writer(_Echo(), delimiter=';')
+    yield '﻿' + writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+# ── XLSX ────────────────────────────────────────────────────────
+# Planilha única escrita direto no zip: sem openpyxl e sem montar o XML em memória.
+
+_XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Estilo 1 = data (dd/mm/aaaa), estilo 2 = cabeçalho em negrito.
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<numFmts count="1"><numFmt numFmtId="164" formatCode="dd/mm/yyyy"/></numFmts>'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="3">'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+        '</cellXfs>'
+        '</styleSheet>'
+    ),
+}
+
+_XLSX_EPOCH = date(1899, 12, 30)
+_XML_ILLEGAL_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _xlsx_workbook(sheet_name: str) -> str:
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(sheet_name[:31], {chr(34): "&quot;"})}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+
+def _xlsx_cell(value, style: int = 0) -> str:
+    if value is None:
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c><v>{value}</v></c>'
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return f'<c s="1"><v>{(value - _XLSX_EPOCH).days}</v></c>'
+    # inlineStr nunca é avaliado como fórmula: o texto vai como está.
+    text = escape(_XML_ILLEGAL_CHARS.sub('', str(value)))
+    style_attr = f' s="{style}"' if style else ''
+    return f'<c t="inlineStr"{style_attr}><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values, style: int = 0) -> str:
+    return '<row>' + ''.join(_xlsx_cell(value, style) for value in values) + '</row>'
+
+
+def iter_xlsx(headers: list[str], rows: Iterable[tuple], sheet_name: str = 'Planilha1') -> Iterator[bytes]:
+    stream = ZipStream()
+    with zipfile.ZipFile(stream, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+        archive.writestr('xl/workbook.xml', _xlsx_workbook(sheet_name))
+        yield stream.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', mode='w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row(headers, style=2).encode('utf-8'))
+            buffer = []
+            for row in rows:
+                buffer.append(_xlsx_row(row))
+                if len(buffer) >= 500:
+                    sheet.write(''.join(buffer).encode('utf-8'))
+                    buffer.clear()
+                    chunk = stream.drain()
+                    if chunk:
+                        yield chunk
+            sheet.write(''.join(buffer).encode('utf-8'))
+            sheet.write(b'</sheetData></worksheet>')
+    yield stream.drain()
+
+
+def export_response(queryset, columns, filename: str, fmt: str) -> StreamingHttpResponse:
+    """
+    Resposta em streaming para `fmt` ('csv' ou 'xlsx'); `filename` sem extensão.
+    Levanta ValueError para formatos desconhecidos.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportação inválido: {fmt}")
+
+    headers = [header for _, header in columns]
+    rows = iter_export_rows(queryset, columns)
+    content = iter_csv(headers, rows) if fmt == 'csv' else iter_xlsx(headers, rows)
+
+    response = StreamingHttpResponse(content, content_type=EXPORT_FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
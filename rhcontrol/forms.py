@@ -2,6 +2,7 @@ from datetime import date, timezone
 from decimal import Decimal
 from django import forms 
 from django.contrib.auth.models import Group, User
+from rhcontrol.utils import only_digits
 from rhcontrol.models import Dependent, Employee, EmployeeHistory, JobTitle, NotificationRecipient, NotificationRule, Training, UserAlertPreference, Vacation, Department, CareerPlan, Occurrence
 
 class LoginForm(forms.Form):
@@ -31,7 +32,7 @@ def validate_cpf(cpf):
     if not cpf:
         return False
 
-    clean_cpf = ''.join([c for c in cpf if c.isdigit()])
+    clean_cpf = only_digits(cpf)
 
     if len(clean_cpf) != 11: return False
 
@@ -119,7 +120,17 @@ class EmployeeForm(forms.ModelForm):
         cpf = self.cleaned_data.get('cpf')
         if not validate_cpf(cpf):
             raise forms.ValidationError("CPF Inválido ou Inexistente.")
+        # Compara só os dígitos: '123.456.789-01' e '12345678901' são o mesmo CPF.
+        if Employee.objects.filter(cpf_digits=only_digits(cpf)).exclude(pk=self.instance.pk).exists():
+            raise forms.ValidationError("Já existe um funcionário cadastrado com este CPF.")
         return cpf
+
+    def clean_pis(self):
+        pis = self.cleaned_data.get('pis')
+        digits = only_digits(pis)
+        if digits and Employee.objects.filter(pis_digits=digits).exclude(pk=self.instance.pk).exists():
+            raise forms.ValidationError("Já existe um funcionário cadastrado com este PIS.")
+        return pis
     
     def clean_birth_date(self):
         birth_date = self.cleaned_data.get('birth_date')
@@ -287,6 +298,8 @@ class DependentForm(forms.ModelForm):
         cpf = self.cleaned_data.get('cpf')
         if not validate_cpf(cpf):
             raise forms.ValidationError("CPF Inválido ou Inexistente.")
+        if Dependent.objects.filter(cpf_digits=only_digits(cpf)).exclude(pk=self.instance.pk).exists():
+            raise forms.ValidationError("Já existe um dependente cadastrado com este CPF.")
         return cpf
 
         
@@ -604,6 +617,11 @@ class SystemUserUpdateForm(forms.ModelForm):
         required=False 
     )
 
+    digest_mode = forms.BooleanField(
+        label="Receber um resumo diário (um único e-mail com todos os eventos do dia)",
+        required=False,
+    )
+
     class Meta:
         model = User
         fields = ['first_name', 'last_name', 'email', 'username']
@@ -632,6 +650,7 @@ class SystemUserUpdateForm(forms.ModelForm):
                 recipient = NotificationRecipient.objects.filter(email=email).first()
                 if recipient:
                     self.fields['receive_all_events'].initial = recipient.receive_all_events
+                    self.fields['digest_mode'].initial = recipient.digest_mode
                     self.fields['alerts'].initial = recipient.subscribed_rules.all()
 
     def clean(self):
@@ -680,6 +699,7 @@ class SystemUserUpdateForm(forms.ModelForm):
                     recipient.name = nome_completo if nome_completo else user.username
                     recipient.email = email
                     recipient.receive_all_events = receive_all
+                    recipient.digest_mode = self.cleaned_data.get('digest_mode', False)
                     recipient.is_active = True
                     recipient.save()
 
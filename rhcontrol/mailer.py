@@ -0,0 +1,136 @@
+"""
+mailer.py — Envio de e-mails em lote por uma única conexão.
+
+O MailDispatcher acumula EmailMessage e envia em lotes pela mesma conexão
+(get_connection().send_messages), respeitando um limite de mensagens por
+segundo (NOTIFICATION_MAIL_RATE). Cada mensagem tem seu resultado registrado
+em MailOutcome, então a falha de um destinatário não derruba o lote.
+"""
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MailOutcome:
+    key: Any
+    recipients: list[str]
+    sent: bool = False
+    error: str = ''
+    sent_at: float | None = None
+
+
+class MailDispatcher:
+    """
+    Uso:
+        with MailDispatcher() as dispatcher:
+            dispatcher.add(message, key=log.pk)
+        for outcome in dispatcher.outcomes: ...
+
+    `rate` = mensagens por segundo (0/None = sem limite); `batch_size` = quantas
+    mensagens acumular antes de enviar.
+    """
+
+    def __init__(self, connection=None, rate: float | None = None, batch_size: int | None = None):
+        self.connection = connection
+        self.rate = getattr(settings, 'NOTIFICATION_MAIL_RATE', 0) if rate is None else rate
+        self.batch_size = batch_size or getattr(settings, 'NOTIFICATION_MAIL_BATCH_SIZE', 50)
+        self.outcomes: list[MailOutcome] = []
+        self._pending: list[tuple[EmailMessage, MailOutcome]] = []
+        self._opened = False
+        self._last_sent = 0.0
+
+    # ── contexto ────────────────────────────────────────────────
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            self.close()
+        return False
+
+    def open(self) -> None:
+        if self.connection is None:
+            self.connection = get_connection(fail_silently=False)
+        if not self._opened:
+            self.connection.open()
+            self._opened = True
+
+    def close(self) -> None:
+        if self._opened:
+            try:
+                self.connection.close()
+            except Exception as e:
+                logger.warning(f"Falha ao fechar a conexão de e-mail: {str(e)}")
+            self._opened = False
+
+    # ── envio ───────────────────────────────────────────────────
+
+    def add(self, message: EmailMessage, key: Any = None) -> MailOutcome:
+        outcome = MailOutcome(key=key, recipients=list(message.recipients()))
+        self._pending.append((message, outcome))
+        self.outcomes.append(outcome)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+        return outcome
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        try:
+            self.open()
+        except Exception as e:
+            for _, outcome in pending:
+                outcome.error = f"Falha de conexão: {str(e)}"
+            return
+        for message, outcome in pending:
+            self._throttle()
+            try:
+                # Uma mensagem por chamada para saber exatamente qual falhou;
+                # a conexão continua aberta entre elas.
+                sent = self.connection.send_messages([message])
+            except Exception as e:
+                outcome.error = str(e) or type(e).__name__
+                self._reconnect()
+                continue
+            outcome.sent = bool(sent)
+            outcome.sent_at = time.time()
+            if not sent:
+                outcome.error = 'Mensagem não aceita pelo servidor'
+
+    def _throttle(self) -> None:
+        if not self.rate:
+            return
+        wait = self._last_sent + 1.0 / self.rate - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_sent = time.monotonic()
+
+    def _reconnect(self) -> None:
+        # Após erro de SMTP a conexão pode ter caído; a próxima mensagem reabre.
+        self.close()
+        try:
+            self.open()
+        except Exception as e:
+            logger.error(f"Falha ao reabrir a conexão de e-mail: {str(e)}")
+
+    # ── resultado ───────────────────────────────────────────────
+
+    @property
+    def sent(self) -> list[MailOutcome]:
+        return [o for o in self.outcomes if o.sent]
+
+    @property
+    def failed(self) -> list[MailOutcome]:
+        return [o for o in self.outcomes if not o.sent and o.error]
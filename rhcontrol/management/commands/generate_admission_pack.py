@@ -0,0 +1,86 @@
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connections
+from rhcontrol.models import Employee
+from rhcontrol.pdf import (
+    ADMISSION_DOCUMENTS, init_render_process, iter_admission_pack_zip, pack_worker_count,
+    parse_admission_pack_request, render_admission_pack_pdf,
+)
+
+#The commands are: generate_admission_pack --employees 1,2,3 (--documents registration_form,bank_presentation --format zip|pdf --output kit.zip --workers 4)
+
+class Command(BaseCommand):
+    help = 'Gera o kit de admissão (todos os documentos) para vários funcionários de uma vez.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--employees',
+            type=str,
+            required=True,
+            help='IDs dos funcionários separados por vírgula',
+        )
+        parser.add_argument(
+            '--documents',
+            type=str,
+            default='all',
+            help=f"Documentos separados por vírgula ou 'all' ({', '.join(ADMISSION_DOCUMENTS)})",
+        )
+        parser.add_argument(
+            '--format',
+            choices=['zip', 'pdf'],
+            default='zip',
+            help='zip (um arquivo por documento, em paralelo) ou pdf (arquivo único)',
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Arquivo de saída (default: kit_admissao.<formato>)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=pack_worker_count(),
+            help='Processos de renderização no modo zip',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            employee_ids, doc_types = parse_admission_pack_request(options['employees'], options['documents'])
+        except ValueError as e:
+            self.stderr.write(self.style.ERROR(f"ERRO: {e}"))
+            sys.exit(1)
+
+        found = set(Employee.objects.filter(pk__in=employee_ids).values_list('pk', flat=True))
+        missing = [pk for pk in employee_ids if pk not in found]
+        if missing:
+            self.stderr.write(self.style.WARNING(f"Ignorados (não encontrados): {', '.join(map(str, missing))}"))
+        employee_ids = [pk for pk in employee_ids if pk in found]
+        if not employee_ids:
+            self.stderr.write(self.style.ERROR("ERRO: Nenhum funcionário encontrado."))
+            sys.exit(1)
+
+        fmt = options['format']
+        output = options['output'] or f'kit_admissao.{fmt}'
+        start_time = time.time()
+        self.stdout.write(self.style.NOTICE(
+            f"=== KIT DE ADMISSÃO: {len(employee_ids)} funcionário(s) x {len(doc_types)} documento(s) ==="
+        ))
+
+        with open(output, 'wb') as fh:
+            if fmt == 'pdf':
+                fh.write(render_admission_pack_pdf(employee_ids, doc_types))
+            else:
+                workers = max(options['workers'], 1)
+                if workers == 1:
+                    for chunk in iter_admission_pack_zip(employee_ids, doc_types):
+                        fh.write(chunk)
+                else:
+                    connections.close_all()  # os processos filhos abrem as próprias conexões
+                    with ProcessPoolExecutor(max_workers=workers, initializer=init_render_process) as pool:
+                        for chunk in iter_admission_pack_zip(employee_ids, doc_types, pool=pool):
+                            fh.write(chunk)
+
+        duration = time.time() - start_time
+        self.stdout.write(self.style.SUCCESS(f"Kit gerado em {output} ({duration:.2f}s)"))
@@ -1,6 +1,7 @@
 import csv
 import urllib.request
 from django.core.management.base import BaseCommand
+from rhcontrol.cid_index import cid_index
 from rhcontrol.models import CID
 
 class Command(BaseCommand):
@@ -70,6 +71,9 @@ class Command(BaseCommand):
             # Limpa e popula o banco
             CID.objects.all().delete()
             CID.objects.bulk_create(cids_to_create, batch_size=1000)
+            # bulk_create não dispara signals; os outros processos percebem pela
+            # troca de ids (CID_INDEX_REFRESH_SECONDS).
+            cid_index.invalidate()
             
             self.stdout.write(self.style.SUCCESS(f'Missão Cumprida! {len(cids_to_create)} doenças foram catalogadas no banco.'))
             
@@ -1,19 +1,223 @@
+import os
 import time
 import sys
+import socket
 import logging
+import inspect
+import threading
+from datetime import date, timedelta
+from django.conf import settings
 from django.core.management.base import BaseCommand
-from rhcontrol.services import process_career_plans, process_notifications
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from rhcontrol.models import AutomationCheckpoint, AutomationLease, AutomationRun, AutomationStep
+from rhcontrol.pdf import purge_expired_pdf_jobs
+from rhcontrol.services import (
+    drain_notification_outbox, expire_cipa_mandates, process_career_plans, process_notifications,
+    purge_automation_history, rebuild_event_calendar,
+)
 
-#The commands are: run_automations (career_plans or notifications)
+#The commands are: run_automations (career_plans, notifications, notification_outbox, cipa_expiry, event_calendar, pdf_cleanup or automation_history) (--since 2024-05-01 --workers 4)
 
 logger = logging.getLogger(__name__)
 
 AUTOMATIONS_REGISTRY = {
     'notifications': process_notifications,
     'career_plans': process_career_plans,
- 
+    'notification_outbox': drain_notification_outbox,
+    'cipa_expiry': expire_cipa_mandates,
+    'event_calendar': rebuild_event_calendar,
+    'pdf_cleanup': purge_expired_pdf_jobs,
+    'automation_history': purge_automation_history,
 }
 
+
+# Métricas padrão gravadas em AutomationStep. As rotinas devolvem um dict com
+# (parte de) essas chaves; um int conta como eventos gerados.
+STEP_METRICS = ('rows_scanned', 'events_produced', 'emails_sent', 'errors')
+
+
+def accepts(func, param: str) -> bool:
+    return param in inspect.signature(func).parameters
+
+
+def step_metrics(result) -> dict:
+    if isinstance(result, bool):
+        return {}
+    if isinstance(result, int):
+        return {'events_produced': result}
+    if isinstance(result, dict):
+        return {key: int(result[key]) for key in STEP_METRICS if key in result}
+    return {}
+
+
+def checkpoint_name(name: str, shard: tuple[int, int] | None = None) -> str:
+    """
+    Chave do AutomationCheckpoint. Rotina fatiada grava uma por fatia, porque
+    o sucesso de uma fatia não diz nada sobre as outras.
+
+    >>> checkpoint_name('career_plans', (1, 4))
+    'career_plans:1/4'
+    """
+    return name if shard is None else f"{name}:{shard[0]}/{shard[1]}"
+
+
+def catchup_since(name: str, today: date, shard: tuple[int, int] | None = None) -> date | None:
+    """
+    Primeiro dia não processado da rotina (ou da fatia), a partir do último
+    sucesso gravado. None quando rodou ontem (ou nunca rodou); limitado a
+    AUTOMATION_CATCHUP_MAX_DAYS para trás. Fatia sem checkpoint próprio (ex.:
+    o --workers mudou) usa o da rotina.
+    """
+    key = checkpoint_name(name, shard)
+    last_success = dict(AutomationCheckpoint.objects.filter(name__in={key, name}).values_list('name', 'last_success_on'))
+    last_success_on = last_success.get(key, last_success.get(name))
+    if last_success_on is None or last_success_on >= today - timedelta(days=1):
+        return None
+    max_days = getattr(settings, 'AUTOMATION_CATCHUP_MAX_DAYS', 31)
+    return max(last_success_on + timedelta(days=1), today - timedelta(days=max_days))
+
+
+def record_success(name: str, today: date) -> None:
+    AutomationCheckpoint.objects.update_or_create(name=name, defaults={'last_success_on': today})
+
+
+# ── Vagas de execução (AutomationLease) ─────────────────────────
+# Até `workers` processos rodam ao mesmo tempo, cada um numa vaga
+# 'run_automations:<slot>'. O slot 0 roda todas as rotinas; os demais só
+# as que aceitam `shard` (e processam a fatia employee_id % workers == slot).
+# A vaga é renovada por LeaseHeartbeat enquanto o processo trabalha.
+#
+# O run_scheduler ocupa 'run_scheduler:<rotina>' enquanto roda cada rotina.
+# Os dois comandos não rodam ao mesmo tempo: cada um ocupa a própria vaga e
+# só então confere as do outro (desistindo se houver alguma ativa), então ao
+# menos um dos dois sempre vê o outro.
+
+LEASE_PREFIX = 'run_automations'
+SCHEDULER_LEASE_PREFIX = 'run_scheduler'
+
+
+def lease_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def lease_ttl() -> timedelta:
+    return timedelta(seconds=getattr(settings, 'AUTOMATION_LEASE_SECONDS', 3600))
+
+
+def acquire_lease(name: str, owner: str) -> bool:
+    """Ocupa a vaga `name` se estiver livre ou expirada."""
+    now = timezone.now()
+    taken = AutomationLease.objects.filter(name=name, expires_at__lte=now).update(
+        owner=owner, acquired_at=now, expires_at=now + lease_ttl(),
+    )
+    if taken:
+        return True
+    try:
+        with transaction.atomic():
+            AutomationLease.objects.create(name=name, owner=owner, expires_at=now + lease_ttl())
+        return True
+    except IntegrityError:
+        return False
+
+
+def acquire_lease_slot(workers: int, owner: str) -> int | None:
+    """Ocupa a primeira vaga livre (ou expirada) e devolve o slot; None se todas estão ocupadas."""
+    for slot in range(workers):
+        if acquire_lease(f"{LEASE_PREFIX}:{slot}", owner):
+            return slot
+    return None
+
+
+def renew_lease(name: str, owner: str) -> None:
+    AutomationLease.objects.filter(name=name, owner=owner).update(expires_at=timezone.now() + lease_ttl())
+
+
+def release_lease(name: str, owner: str) -> None:
+    AutomationLease.objects.filter(name=name, owner=owner).delete()
+
+
+def active_leases(prefix: str) -> list[str]:
+    """Vagas não expiradas de um dos comandos ('run_automations' ou 'run_scheduler')."""
+    return list(
+        AutomationLease.objects.filter(name__startswith=f"{prefix}:", expires_at__gt=timezone.now())
+        .order_by('name').values_list('name', flat=True)
+    )
+
+
+class LeaseHeartbeat:
+    """
+    Renova a vaga numa thread enquanto o bloco roda (a cada 1/3 do TTL), para
+    que uma rotina mais longa que AUTOMATION_LEASE_SECONDS não perca a vaga
+    para o próximo disparo do cron.
+    """
+
+    def __init__(self, name: str, owner: str, interval: float | None = None):
+        self.name = name
+        self.owner = owner
+        self.interval = interval or lease_ttl().total_seconds() / 3
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, name=f"lease:{name}", daemon=True)
+
+    def _beat(self) -> None:
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    renew_lease(self.name, self.owner)
+                except Exception:
+                    logger.exception(f"Falha ao renovar a vaga '{self.name}'")
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_routine(run: AutomationRun, name: str, func, *, dry_run: bool, today: date, since: date | None = None,
+                shard: tuple[int, int] | None = None) -> AutomationStep:
+    """
+    Executa uma rotina do registry e grava o AutomationStep com as métricas.
+    `since` explícito ou o catch-up automático vão só para quem aceita `since`;
+    `shard` só para quem aceita `shard`, e o checkpoint é o da fatia. A exceção
+    não é propagada: o status do step indica a falha. Usado pelo
+    run_automations e pelo run_scheduler.
+    """
+    step = AutomationStep(run=run, name=name)
+    routine_start = time.time()
+    if not accepts(func, 'shard'):
+        shard = None
+    try:
+        kwargs = {'dry_run': dry_run}
+        if accepts(func, 'since'):
+            kwargs['since'] = since or catchup_since(name, today, shard)
+            if kwargs['since']:
+                logger.info(f"Catch-up de '{checkpoint_name(name, shard)}': recuperando desde {kwargs['since']}.")
+        if shard is not None:
+            kwargs['shard'] = shard
+
+        result = func(**kwargs)
+        for field, value in step_metrics(result).items():
+            setattr(step, field, value)
+
+        if not dry_run:
+            record_success(checkpoint_name(name, shard), today)
+        step.status = AutomationRun.RunStatus.SUCCESS
+    except Exception as e:
+        step.status = AutomationRun.RunStatus.FAILED
+        step.errors += 1
+        step.error_message = str(e)
+        logger.exception(f"Erro fatal na automação '{name}'")
+
+    step.duration = time.time() - routine_start
+    step.save()
+    return step
+
+
 class Command(BaseCommand):
     help = 'Hub central para execução de automações agendadas do sistema.'
 
@@ -28,10 +232,27 @@ class Command(BaseCommand):
             action='store_true',
             help='Executa em modo de simulação (não grava no banco nem envia e-mails)',
         )
+        parser.add_argument(
+            '--since',
+            type=date.fromisoformat,
+            help='Recupera os dias perdidos desde a data (AAAA-MM-DD); default: último sucesso de cada rotina',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=getattr(settings, 'AUTOMATION_WORKERS', 1),
+            help='Total de workers em paralelo (inicie N processos com o mesmo --workers N); sem vaga livre, a invocação sai',
+        )
 
     def handle(self, *args, **options):
         only = options.get('only')
         dry_run = options.get('dry_run')
+        since = options.get('since')
+        today = timezone.localdate()
+
+        if since and since > today:
+            self.stderr.write(self.style.ERROR(f"ERRO: --since ({since}) não pode ser uma data futura."))
+            sys.exit(1)
 
         routines_to_run = {}
         if only:
@@ -42,34 +263,47 @@ class Command(BaseCommand):
         else:
             routines_to_run = AUTOMATIONS_REGISTRY
 
+        # Dry-run não ocupa vaga e simula tudo num único processo.
+        workers = 1 if dry_run else max(options.get('workers') or 1, 1)
+        owner = lease_owner()
+        slot = 0
+        if not dry_run:
+            slot = acquire_lease_slot(workers, owner)
+            if slot is None:
+                self.stdout.write(self.style.WARNING(
+                    f"Todas as {workers} vaga(s) de execução estão ocupadas por outro processo. Nada a fazer."
+                ))
+                return
+            scheduler_leases = active_leases(SCHEDULER_LEASE_PREFIX)
+            if scheduler_leases:
+                release_lease(f"{LEASE_PREFIX}:{slot}", owner)
+                self.stdout.write(self.style.WARNING(
+                    f"O run_scheduler está executando ({', '.join(scheduler_leases)}). "
+                    "Use apenas um dos dois comandos em produção. Nada a fazer."
+                ))
+                return
+
         start_time = time.time()
         dry_run_tag = "[DRY-RUN ATIVO] " if dry_run else ""
-        self.stdout.write(self.style.NOTICE(f"=== INICIANDO HUB DE AUTOMAÇÕES {dry_run_tag}==="))
+        worker_tag = f"[WORKER {slot + 1}/{workers}] " if workers > 1 else ""
+        self.stdout.write(self.style.NOTICE(f"=== INICIANDO HUB DE AUTOMAÇÕES {worker_tag}{dry_run_tag}==="))
 
-        has_failures = False
-        results = {}
-
-        for name, func in routines_to_run.items():
-            self.stdout.write(f"-> Iniciando rotina: {name}...")
-            routine_start = time.time()
-            
-            try:
-
-                func(dry_run=dry_run)
-                
-                duration = time.time() - routine_start
-                results[name] = {'status': 'SUCCESS', 'duration': duration}
-                self.stdout.write(self.style.SUCCESS(f"   [SUCCESS] {name} concluída em {duration:.2f}s"))
-                
-            except Exception as e:
-                duration = time.time() - routine_start
-                has_failures = True
-                results[name] = {'status': 'FAILED', 'duration': duration, 'error': str(e)}
-                
-                self.stderr.write(self.style.ERROR(f"   [FAILED] {name} falhou em {duration:.2f}s: {str(e)}"))
-                logger.exception(f"Erro fatal na automação '{name}'")
+        run = AutomationRun.objects.create(dry_run=dry_run, owner=owner, slot=slot)
+        try:
+            if dry_run:
+                has_failures, results = self.run_routines(run, routines_to_run, dry_run, since, today, slot, workers)
+            else:
+                with LeaseHeartbeat(f"{LEASE_PREFIX}:{slot}", owner):
+                    has_failures, results = self.run_routines(run, routines_to_run, dry_run, since, today, slot, workers)
+        finally:
+            if not dry_run:
+                release_lease(f"{LEASE_PREFIX}:{slot}", owner)
 
         total_duration = time.time() - start_time
+        run.status = AutomationRun.RunStatus.FAILED if has_failures else AutomationRun.RunStatus.SUCCESS
+        run.finished_at = timezone.now()
+        run.duration = total_duration
+        run.save(update_fields=['status', 'finished_at', 'duration'])
 
         self.stdout.write("\n=== RESUMO DA EXECUÇÃO ===")
         for name, data in results.items():
@@ -83,4 +317,27 @@ class Command(BaseCommand):
             self.stderr.write(self.style.ERROR("Processamento finalizado com falhas em uma ou mais rotinas."))
             sys.exit(1)  
         else:
-            self.stdout.write(self.style.SUCCESS("Processamento finalizado com sucesso total."))
\ No newline at end of file
+            self.stdout.write(self.style.SUCCESS("Processamento finalizado com sucesso total."))
+
+    def run_routines(self, run, routines_to_run, dry_run, since, today, slot, workers):
+        has_failures = False
+        results = {}
+        shard = (slot, workers) if workers > 1 else None
+
+        for name, func in routines_to_run.items():
+            if slot > 0 and not accepts(func, 'shard'):
+                # Rotinas sem fatiamento rodam só no primeiro worker.
+                continue
+
+            self.stdout.write(f"-> Iniciando rotina: {name}...")
+            step = run_routine(run, name, func, dry_run=dry_run, today=today, since=since, shard=shard)
+
+            results[name] = {'status': step.status, 'duration': step.duration}
+            if step.status == AutomationRun.RunStatus.SUCCESS:
+                self.stdout.write(self.style.SUCCESS(f"   [SUCCESS] {name} concluída em {step.duration:.2f}s"))
+            else:
+                has_failures = True
+                results[name]['error'] = step.error_message
+                self.stderr.write(self.style.ERROR(f"   [FAILED] {name} falhou em {step.duration:.2f}s: {step.error_message}"))
+
+        return has_failures, results
@@ -0,0 +1,55 @@
+import sys
+from django.core.management.base import BaseCommand
+from rhcontrol.benchmarks import (
+    bench_cid_search, bench_employee_search, bench_list_exports, bench_list_pagination,
+    bench_mail_dispatch, bench_query_plans, bench_upcoming_annual_events,
+)
+
+#The commands are: run_benchmarks (--only upcoming_annual_events --repeat 10)
+
+BENCHMARKS_REGISTRY = {
+    'upcoming_annual_events': bench_upcoming_annual_events,
+    'list_exports': bench_list_exports,
+    'mail_dispatch': bench_mail_dispatch,
+    'employee_search': bench_employee_search,
+    'cid_search': bench_cid_search,
+    'list_pagination': bench_list_pagination,
+    'query_plans': bench_query_plans,
+}
+
+class Command(BaseCommand):
+    help = 'Executa os benchmarks dos caminhos críticos contra o banco configurado.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--only',
+            type=str,
+            help='Executa apenas o benchmark especificado (ex: --only upcoming_annual_events)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Número de repetições por medição (o melhor tempo é reportado)',
+        )
+
+    def handle(self, *args, **options):
+        only = options.get('only')
+        repeat = options.get('repeat')
+
+        if only:
+            if only not in BENCHMARKS_REGISTRY:
+                self.stderr.write(self.style.ERROR(f"ERRO: Benchmark '{only}' não encontrado no registry."))
+                sys.exit(1)
+            benchmarks_to_run = {only: BENCHMARKS_REGISTRY[only]}
+        else:
+            benchmarks_to_run = BENCHMARKS_REGISTRY
+
+        for name, func in benchmarks_to_run.items():
+            self.stdout.write(self.style.NOTICE(f"=== {name} (repeat={repeat}) ==="))
+            for result in func(repeat=repeat):
+                notes = f"  [{'; '.join(result.notes)}]" if result.notes else ""
+                self.stdout.write(f" - {result.label:<60} {result.seconds * 1000:>10.2f} ms {result.queries:>6} queries{notes}")
+                for line in result.details:
+                    self.stdout.write(f"       {line}")
+            self.stdout.write("")
@@ -0,0 +1,91 @@
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from rhcontrol.pdf import (
+    init_render_process, claim_pdf_jobs, complete_pdf_job, purge_expired_pdf_jobs, render_admission_pack_job,
+    render_html_to_pdf_timed,
+)
+
+#The commands are: run_pdf_worker (--workers 4 --once --poll-interval 2)
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Processa a fila de PDFs (?async=1 e kits de admissão) em um pool de processos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=getattr(settings, 'PDF_WORKER_PROCESSES', None) or os.cpu_count() or 1,
+            help='Número de processos de renderização',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Segundos entre consultas à fila quando ela está vazia',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Processa o que estiver na fila e encerra',
+        )
+
+    def handle(self, *args, **options):
+        workers = max(options['workers'], 1)
+        poll_interval = options['poll_interval']
+        once = options['once']
+
+        self.stdout.write(self.style.NOTICE(f"=== WORKER DE PDF ({workers} processo(s)) ==="))
+
+        # Conexões abertas não podem ser herdadas pelos processos filhos.
+        connections.close_all()
+        processed = 0
+        last_purge = 0.0
+
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_render_process) as pool:
+                while True:
+                    if time.monotonic() - last_purge > 300:
+                        purge_expired_pdf_jobs()
+                        last_purge = time.monotonic()
+
+                    jobs = claim_pdf_jobs(limit=workers * 2)
+                    if not jobs:
+                        if once:
+                            break
+                        time.sleep(poll_interval)
+                        continue
+
+                    futures = {pool.submit(render_html_to_pdf_timed, job.html, job.base_url): job for job in jobs if not job.pack}
+                    for future in as_completed(futures):
+                        self.finish(futures[future], future.result)
+                        processed += 1
+
+                    # Kits de admissão: um por vez, com os documentos espalhados pelo pool.
+                    for job in (job for job in jobs if job.pack):
+                        self.finish(job, lambda: render_admission_pack_job(job, pool))
+                        processed += 1
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Interrompido; jobs em andamento voltam para a fila após PDF_JOB_TIMEOUT."))
+
+        self.stdout.write(self.style.NOTICE(f"=== WORKER ENCERRADO: {processed} PDF(s) processado(s) ==="))
+
+    def finish(self, job, render) -> None:
+        """Chama `render` (→ bytes, ms) e grava o resultado ou o erro no job."""
+        try:
+            pdf, render_ms = render()
+            complete_pdf_job(job, pdf=pdf, render_ms=render_ms)
+            self.stdout.write(self.style.SUCCESS(f" - [OK] PDF #{job.pk} {job.filename} ({render_ms:.0f} ms)"))
+        except Exception as e:
+            complete_pdf_job(job, error=str(e))
+            logger.error(f"Falha ao renderizar PDF #{job.pk} ({job.template_name}): {str(e)}")
+            self.stderr.write(self.style.ERROR(f" - [ERRO] PDF #{job.pk} {job.filename}: {str(e)}"))
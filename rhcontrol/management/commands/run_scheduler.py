@@ -0,0 +1,231 @@
+import random
+import signal
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.utils import timezone
+from rhcontrol.models import AutomationCheckpoint, AutomationRun
+from rhcontrol.management.commands.run_automations import (
+    AUTOMATIONS_REGISTRY, LEASE_PREFIX, SCHEDULER_LEASE_PREFIX, LeaseHeartbeat, acquire_lease, active_leases,
+    lease_owner, release_lease, run_routine,
+)
+
+#The commands are: run_scheduler (--workers 2 --jitter 30)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCHEDULES = {
+    'notifications': '06:00',
+    'career_plans': '06:05',
+    'notification_outbox': 60,
+    'cipa_expiry': '02:00',
+    'event_calendar': '03:00',
+    'pdf_cleanup': 3600,
+    'automation_history': '04:00',
+}
+
+# Uma rotina não começa enquanto alguma das suas dependências está rodando
+# (fica para o próximo tick); as demais rodam em paralelo no pool.
+ROUTINE_DEPENDENCIES = {
+    'notification_outbox': ('notifications', 'career_plans'),
+    'event_calendar': ('career_plans', 'cipa_expiry'),
+}
+
+
+def parse_schedule(spec) -> int | tuple[int, int]:
+    """
+    int = intervalo em segundos; 'HH:MM' = uma vez por dia nesse horário local.
+    Levanta ValueError para formatos inválidos.
+    """
+    if isinstance(spec, int) and not isinstance(spec, bool):
+        if spec <= 0:
+            raise ValueError(f"Intervalo inválido: {spec}")
+        return spec
+    try:
+        hour, minute = (int(part) for part in str(spec).split(':'))
+    except ValueError:
+        raise ValueError(f"Agendamento inválido: {spec!r} (use segundos ou 'HH:MM')")
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"Horário inválido: {spec!r}")
+    return hour, minute
+
+
+def next_run_after(schedule: int | tuple[int, int], now: datetime, jitter: float = 0) -> datetime:
+    if isinstance(schedule, int):
+        due = now + timedelta(seconds=schedule)
+    else:
+        local_now = timezone.localtime(now)
+        due = local_now.replace(hour=schedule[0], minute=schedule[1], second=0, microsecond=0)
+        if due <= local_now:
+            due += timedelta(days=1)
+    return due + timedelta(seconds=random.uniform(0, jitter)) if jitter else due
+
+
+def ensure_usable_connections() -> None:
+    """Mantém a conexão aberta entre execuções; só descarta a que caiu (ex.: restart do banco)."""
+    for conn in connections.all(initialized_only=True):
+        if conn.connection is not None and not conn.is_usable():
+            conn.close()
+
+
+@dataclass
+class ScheduledRoutine:
+    name: str
+    func: Callable
+    schedule: int | tuple[int, int]
+    next_run: datetime
+
+
+class Scheduler:
+    """
+    Laço do run_scheduler: a cada tick dispara no pool as rotinas vencidas.
+    Uma rotina ainda em execução não é disparada de novo (pula para o próximo
+    horário) e cada execução ocupa a vaga 'run_scheduler:<rotina>', então dois
+    agendadores não rodam a mesma rotina ao mesmo tempo. Enquanto um
+    run_automations (cron) estiver com alguma vaga, nenhuma rotina é disparada.
+    """
+
+    def __init__(self, schedules: dict, workers: int = 2, jitter: float = 0, now: datetime | None = None):
+        now = now or timezone.now()
+        unknown = set(schedules) - set(AUTOMATIONS_REGISTRY)
+        if unknown:
+            raise ValueError(f"Rotina(s) fora do registry: {', '.join(sorted(unknown))}")
+
+        self.jitter = jitter
+        self.owner = lease_owner()
+        self.pool = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix='scheduler')
+        self.stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self.running: set[str] = set()
+
+        checkpoints = dict(AutomationCheckpoint.objects.values_list('name', 'last_success_on'))
+        today = timezone.localdate(now)
+        self.routines = []
+        for name, spec in schedules.items():
+            schedule = parse_schedule(spec)
+            if isinstance(schedule, int):
+                first_run = now + timedelta(seconds=random.uniform(0, jitter)) if jitter else now
+            else:
+                first_run = next_run_after(schedule, now, jitter)
+                # Horário de hoje já passou e a rotina não rodou hoje: roda já.
+                last_success = checkpoints.get(name)
+                if timezone.localdate(first_run) > today and (last_success is None or last_success < today):
+                    first_run = now
+            self.routines.append(ScheduledRoutine(name, AUTOMATIONS_REGISTRY[name], schedule, first_run))
+
+    def tick(self, now: datetime | None = None) -> list:
+        """Dispara as rotinas vencidas em `now`; devolve os futures submetidos."""
+        now = now or timezone.now()
+        submitted = []
+        for routine in self.routines:
+            if routine.next_run > now:
+                continue
+            with self._lock:
+                if routine.name in self.running:
+                    logger.warning(f"Agendador: '{routine.name}' ainda em execução, pulando este horário.")
+                    routine.next_run = next_run_after(routine.schedule, now, self.jitter)
+                    continue
+                if any(dep in self.running for dep in ROUTINE_DEPENDENCIES.get(routine.name, ())):
+                    continue
+                self.running.add(routine.name)
+            routine.next_run = next_run_after(routine.schedule, now, self.jitter)
+            submitted.append(self.pool.submit(self._execute, routine))
+        return submitted
+
+    def _execute(self, routine: ScheduledRoutine) -> None:
+        lease_name = f"{SCHEDULER_LEASE_PREFIX}:{routine.name}"
+        try:
+            ensure_usable_connections()
+            if not acquire_lease(lease_name, self.owner):
+                logger.info(f"Agendador: '{routine.name}' já está rodando em outro processo, pulando.")
+                return
+            try:
+                cron_leases = active_leases(LEASE_PREFIX)
+                if cron_leases:
+                    logger.warning(
+                        f"Agendador: run_automations em execução ({', '.join(cron_leases)}), pulando '{routine.name}'. "
+                        "Use apenas um dos dois comandos em produção."
+                    )
+                    return
+                run = AutomationRun.objects.create(owner=self.owner)
+                with LeaseHeartbeat(lease_name, self.owner):
+                    step = run_routine(run, routine.name, routine.func, dry_run=False, today=timezone.localdate())
+                run.status = step.status
+                run.finished_at = timezone.now()
+                run.duration = step.duration
+                run.save(update_fields=['status', 'finished_at', 'duration'])
+                logger.info(f"Agendador: '{routine.name}' {step.status} em {step.duration:.2f}s.")
+            finally:
+                release_lease(lease_name, self.owner)
+        except Exception:
+            logger.exception(f"Agendador: falha ao executar '{routine.name}'")
+        finally:
+            with self._lock:
+                self.running.discard(routine.name)
+
+    def seconds_until_next(self, now: datetime | None = None) -> float:
+        now = now or timezone.now()
+        upcoming = min((routine.next_run for routine in self.routines), default=now + timedelta(seconds=60))
+        return min(max((upcoming - now).total_seconds(), 0.5), 60)
+
+    def run_forever(self) -> None:
+        while not self.stop_event.is_set():
+            ensure_usable_connections()
+            self.tick()
+            self.stop_event.wait(self.seconds_until_next())
+
+    def shutdown(self) -> None:
+        """Para de disparar e espera as rotinas em andamento terminarem."""
+        self.stop_event.set()
+        self.pool.shutdown(wait=True)
+
+
+class Command(BaseCommand):
+    help = 'Agendador contínuo das automações: roda o AUTOMATIONS_REGISTRY sem depender do cron.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=getattr(settings, 'AUTOMATION_SCHEDULER_WORKERS', 2),
+            help='Threads para rotinas independentes rodarem em paralelo',
+        )
+        parser.add_argument(
+            '--jitter',
+            type=float,
+            default=getattr(settings, 'AUTOMATION_SCHEDULER_JITTER', 30),
+            help='Atraso aleatório máximo (s) somado a cada horário',
+        )
+
+    def handle(self, *args, **options):
+        schedules = {**DEFAULT_SCHEDULES, **getattr(settings, 'AUTOMATION_SCHEDULES', {})}
+        schedules = {name: spec for name, spec in schedules.items() if spec is not None}
+        workers = max(options['workers'], 1)
+        if connection.vendor == 'sqlite' and workers > 1:
+            # SQLite não aceita escritas concorrentes ("database is locked").
+            self.stdout.write(self.style.WARNING("SQLite: rotinas em série (1 worker)."))
+            workers = 1
+        scheduler = Scheduler(schedules, workers=workers, jitter=max(options['jitter'], 0))
+
+        def stop(signum, frame):
+            self.stdout.write(self.style.WARNING("Sinal recebido: aguardando as rotinas em andamento para encerrar..."))
+            scheduler.stop_event.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        self.stdout.write(self.style.NOTICE(f"=== AGENDADOR DE AUTOMAÇÕES ({workers} worker(s)) ==="))
+        for routine in scheduler.routines:
+            self.stdout.write(f" - {routine.name}: próxima execução em {timezone.localtime(routine.next_run):%d/%m/%Y %H:%M:%S}")
+
+        try:
+            scheduler.run_forever()
+        finally:
+            scheduler.shutdown()
+        self.stdout.write(self.style.SUCCESS("Agendador encerrado."))
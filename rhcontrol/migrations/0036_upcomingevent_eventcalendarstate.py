@@ -0,0 +1,45 @@
+# Generated by Django 5.2.9 on 2026-10-18 12:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rhcontrol', '0035_employee_contract_end_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventCalendarState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('horizon_start', models.DateField(blank=True, null=True)),
+                ('horizon_end', models.DateField(blank=True, null=True)),
+                ('is_rebuilding', models.BooleanField(default=False)),
+                ('rebuilt_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UpcomingEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('match_date', models.DateField(verbose_name='Data de Exibição')),
+                ('date', models.DateField(verbose_name='Data do Evento')),
+                ('category', models.CharField(max_length=40, verbose_name='Categoria')),
+                ('title', models.TextField(verbose_name='Título')),
+                ('employee_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('department_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('object_type', models.CharField(max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('status', models.CharField(default='PENDING', max_length=30)),
+                ('email_event', models.BooleanField(default=False)),
+                ('requires_action', models.BooleanField(default=False)),
+                ('employee', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='rhcontrol.employee')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['match_date', 'category'], name='rhcontrol_u_match_d_bd9ce3_idx'), models.Index(fields=['object_type', 'object_id'], name='rhcontrol_u_object__04c81b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.9 on 2026-10-18 12:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rhcontrol', '0036_upcomingevent_eventcalendarstate'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PdfRenderJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'Na Fila'), ('RUNNING', 'Renderizando'), ('DONE', 'Concluído'), ('FAILED', 'Falhou')], default='PENDING', max_length=10, verbose_name='Status')),
+                ('cache_key', models.CharField(blank=True, db_index=True, default='', max_length=64)),
+                ('template_name', models.CharField(max_length=255)),
+                ('filename', models.CharField(max_length=255)),
+                ('html', models.TextField(blank=True, default='')),
+                ('base_url', models.CharField(blank=True, default='', max_length=500)),
+                ('pdf', models.BinaryField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pdf_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='rhcontrol_p_status_bd0581_idx')],
+            },
+        ),
+    ]
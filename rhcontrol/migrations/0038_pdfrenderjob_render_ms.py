@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 12:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rhcontrol', '0037_pdfrenderjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdfrenderjob',
+            name='render_ms',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Tempo de renderização (ms)'),
+        ),
+    ]
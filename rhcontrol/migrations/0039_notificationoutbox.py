@@ -0,0 +1,37 @@
+# Generated by Django 5.2.9 on 2026-10-18 13:02
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rhcontrol', '0038_pdfrenderjob_render_ms'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255, verbose_name='Assunto')),
+                ('body', models.TextField(verbose_name='Mensagem')),
+                ('from_email', models.CharField(max_length=255, verbose_name='Remetente')),
+                ('recipients', models.JSONField(default=list, verbose_name='Destinatários')),
+                ('status', models.CharField(choices=[('PENDING', 'Pendente'), ('SENDING', 'Enviando'), ('SENT', 'Enviado'), ('DEAD', 'Falhou (Desistência)')], default='PENDING', max_length=10, verbose_name='Status')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Tentativas')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Próxima Tentativa')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Último Erro')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Enviado em')),
+                ('log', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='outbox', to='rhcontrol.notificationlog')),
+            ],
+            options={
+                'verbose_name': 'E-mail na Fila',
+                'verbose_name_plural': 'Fila de E-mails',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='rhcontrol_n_status_789923_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.9 on 2026-10-18 13:04
+
+from django.db import migrations, models
+
+
+def copy_outbox_logs(apps, schema_editor):
+    NotificationOutbox = apps.get_model('rhcontrol', 'NotificationOutbox')
+    Through = NotificationOutbox.logs.through
+    Through.objects.bulk_create([
+        Through(notificationoutbox_id=pk, notificationlog_id=log_id)
+        for pk, log_id in NotificationOutbox.objects.values_list('pk', 'log_id')
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rhcontrol', '0039_notificationoutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='logs',
+            field=models.ManyToManyField(related_name='outbox_messages', to='rhcontrol.notificationlog', verbose_name='Notificações'),
+        ),
+        migrations.RunPython(copy_outbox_logs, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='notificationoutbox',
+            name='log',
+        ),
+        migrations.AddField(
+            model_name='notificationrecipient',
+            name='digest_mode',
+            field=models.BooleanField(default=False, help_text='Recebe um único e-mail por dia com todos os eventos, em vez de um e-mail por evento.', verbose_name='Resumo Diário'),
+        ),
+        migrations.AddField(
+            model_name='notificationrule',
+            name='send_as_digest',
+            field=models.BooleanField(default=False, help_text='Os eventos desta regra vão para o resumo diário de cada destinatário, em vez de um e-mail por evento.', verbose_name='Enviar no Resumo Diário'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.9 on 2026-10-18 13:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rhcontrol', '0040_notification_digest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AutomationCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Rotina')),
+                ('last_success_on', models.DateField(verbose_name='Último Sucesso')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-18 13:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rhcontrol', '0041_automationcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AutomationLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('owner', models.CharField(max_length=255, verbose_name='Processo')),
+                ('acquired_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(verbose_name='Expira em')),
+            ],
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.9 on 2026-10-18 13:17
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rhcontrol', '0042_automationlease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AutomationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('RUNNING', 'Em execução'), ('SUCCESS', 'Sucesso'), ('FAILED', 'Falhou')], default='RUNNING', max_length=10, verbose_name='Status')),
+                ('dry_run', models.BooleanField(default=False, verbose_name='Simulação')),
+                ('owner', models.CharField(blank=True, max_length=255, verbose_name='Processo')),
+                ('slot', models.PositiveSmallIntegerField(default=0, verbose_name='Worker')),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Início')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Fim')),
+                ('duration', models.FloatField(blank=True, null=True, verbose_name='Duração (s)')),
+            ],
+            options={
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['started_at'], name='rhcontrol_a_started_444a0f_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AutomationStep',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, verbose_name='Rotina')),
+                ('status', models.CharField(choices=[('RUNNING', 'Em execução'), ('SUCCESS', 'Sucesso'), ('FAILED', 'Falhou')], max_length=10, verbose_name='Status')),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Início')),
+                ('duration', models.FloatField(default=0, verbose_name='Duração (s)')),
+                ('rows_scanned', models.PositiveIntegerField(default=0, verbose_name='Linhas lidas')),
+                ('events_produced', models.PositiveIntegerField(default=0, verbose_name='Eventos gerados')),
+                ('emails_sent', models.PositiveIntegerField(default=0, verbose_name='E-mails enviados')),
+                ('errors', models.PositiveIntegerField(default=0, verbose_name='Erros')),
+                ('error_message', models.TextField(blank=True, verbose_name='Erro')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='steps', to='rhcontrol.automationrun')),
+            ],
+            options={
+                'ordering': ['run', 'started_at'],
+                'indexes': [models.Index(fields=['name', 'started_at'], name='rhcontrol_a_name_f99008_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.9 on 2026-10-18 13:27
+
+from django.db import migrations, models
+
+from rhcontrol.search import build_search_document, install_search_index, uninstall_search_index
+
+
+def fill_search_document(apps, schema_editor):
+    Employee = apps.get_model('rhcontrol', 'Employee')
+    fields = ('pk', 'name', 'cpf', 'email', 'department__name', 'mobile_phone')
+    last_pk = 0
+    while True:
+        rows = list(Employee.objects.filter(pk__gt=last_pk).order_by('pk').values_list(*fields)[:2000])
+        if not rows:
+            break
+        Employee.objects.bulk_update(
+            [Employee(pk=pk, search_document=build_search_document(*values)) for pk, *values in rows],
+            ['search_document'],
+        )
+        last_pk = rows[-1][0]
+
+
+def create_search_index(apps, schema_editor):
+    install_search_index(schema_editor)
+
+
+def drop_search_index(apps, schema_editor):
+    uninstall_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rhcontrol', '0043_automationrun_automationstep'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Documento de Busca'),
+        ),
+        migrations.RunPython(fill_search_document, migrations.RunPython.noop),
+        # FTS5 no SQLite, pg_trgm no PostgreSQL (ver rhcontrol/search.py).
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.9 on 2026-10-18 13:56
+
+import rhcontrol.db_functions
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rhcontrol', '0044_employee_search_document'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='careerplan',
+            index=models.Index(fields=['status', 'promotion_date'], name='careerplan_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['name', 'id'], name='employee_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(rhcontrol.db_functions.MonthDay('birth_date'), condition=models.Q(('termination_date__isnull', True)), name='employee_active_birth_md_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(rhcontrol.db_functions.MonthDay('hire_date'), condition=models.Q(('termination_date__isnull', True)), name='employee_active_hire_md_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(condition=models.Q(('termination_date__isnull', True), ('contract_end_date__isnull', False)), fields=['contract_end_date'], name='employee_active_contract_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(condition=models.Q(('termination_date__isnull', True), ('is_trial_contract', True)), fields=['hire_date'], name='employee_active_trial_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='occurrence',
+            index=models.Index(fields=['employee', 'is_absence', 'occurrence_date'], name='occurrence_emp_absence_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vacation',
+            index=models.Index(fields=['start_date'], name='vacation_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vacation',
+            index=models.Index(fields=['end_date'], name='vacation_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vacation',
+            index=models.Index(fields=['return_date'], name='vacation_return_idx'),
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.9 on 2026-10-18 14:00
+
+from django.db import migrations, models, transaction
+
+from rhcontrol.utils import only_digits
+
+BATCH_SIZE = 2000
+
+
+def check_duplicate_documents(apps, schema_editor):
+    # '123.456.789-01' e '12345678901' passavam pelo unique de `cpf`. Roda antes
+    # de qualquer alteração: numa migration não atômica, falhar no meio deixaria
+    # as colunas criadas e a migration não poderia ser repetida.
+    alias = schema_editor.connection.alias
+    for model_name, source in (('Employee', 'cpf'), ('Employee', 'pis'), ('Dependent', 'cpf')):
+        model = apps.get_model('rhcontrol', model_name)
+        seen, duplicates = set(), set()
+        for value in model.objects.using(alias).values_list(source, flat=True).iterator(chunk_size=BATCH_SIZE):
+            digits = only_digits(value)
+            if digits and digits in seen:
+                duplicates.add(digits)
+            seen.add(digits)
+        if duplicates:
+            raise RuntimeError(
+                f"{model_name}.{source} repetido (só dígitos) em mais de um cadastro: {', '.join(sorted(duplicates)[:20])}. "
+                "Corrija os cadastros duplicados e rode a migration de novo."
+            )
+
+
+def fill_document_digits(apps, schema_editor):
+    # Migration não atômica: cada lote é gravado na sua própria transação, então
+    # uma tabela grande não fica travada até o fim do preenchimento.
+    alias = schema_editor.connection.alias
+    for model_name, sources in (('Employee', ('cpf', 'pis')), ('Dependent', ('cpf',))):
+        model = apps.get_model('rhcontrol', model_name)
+        last_pk = 0
+        while True:
+            rows = list(model.objects.using(alias).filter(pk__gt=last_pk).order_by('pk').values_list('pk', *sources)[:BATCH_SIZE])
+            if not rows:
+                break
+            with transaction.atomic(using=alias):
+                model.objects.using(alias).bulk_update(
+                    [model(pk=pk, **{f'{name}_digits': only_digits(value) or None for name, value in zip(sources, values)})
+                     for pk, *values in rows],
+                    [f'{name}_digits' for name in sources],
+                )
+            last_pk = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('rhcontrol', '0045_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_documents, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='dependent',
+            name='cpf_digits',
+            field=models.CharField(blank=True, editable=False, max_length=14, null=True, verbose_name='CPF (Dígitos)'),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='cpf_digits',
+            field=models.CharField(blank=True, editable=False, max_length=14, null=True, verbose_name='CPF (Dígitos)'),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='pis_digits',
+            field=models.CharField(blank=True, editable=False, max_length=20, null=True, verbose_name='PIS (Dígitos)'),
+        ),
+        migrations.RunPython(fill_document_digits, migrations.RunPython.noop),
+        # Índices únicos parciais (só linhas preenchidas): no SQLite viram CREATE
+        # UNIQUE INDEX, sem recriar a tabela (e sem perder os triggers da busca).
+        migrations.AddConstraint(
+            model_name='dependent',
+            constraint=models.UniqueConstraint(condition=models.Q(('cpf_digits__isnull', False)), fields=('cpf_digits',), name='dependent_unique_cpf_digits'),
+        ),
+        migrations.AddConstraint(
+            model_name='employee',
+            constraint=models.UniqueConstraint(condition=models.Q(('cpf_digits__isnull', False)), fields=('cpf_digits',), name='employee_unique_cpf_digits'),
+        ),
+        migrations.AddConstraint(
+            model_name='employee',
+            constraint=models.UniqueConstraint(condition=models.Q(('pis_digits__isnull', False)), fields=('pis_digits',), name='employee_unique_pis_digits'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.9 on 2026-10-18 14:26
+
+from django.db import migrations, models
+
+
+def create_pdf_cache_state(apps, schema_editor):
+    # Registro único já criado: invalidate_pdf_cache() vira um único UPDATE.
+    PdfCacheState = apps.get_model('rhcontrol', 'PdfCacheState')
+    PdfCacheState.objects.using(schema_editor.connection.alias).get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rhcontrol', '0046_document_digits'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PdfCacheState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_pdf_cache_state, migrations.RunPython.noop),
+    ]
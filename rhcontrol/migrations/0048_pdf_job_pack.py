@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 14:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rhcontrol', '0047_pdf_cache_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdfrenderjob',
+            name='pack',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
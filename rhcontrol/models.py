@@ -9,6 +9,11 @@ from django.contrib.auth.models import User
 import holidays
 
 from django.conf import settings
+from rhcontrol.db_functions import MonthDay
+from rhcontrol.search import build_search_document
+from rhcontrol.utils import only_digits
+
+ACTIVE_EMPLOYEE = models.Q(termination_date__isnull=True)
 
 class Vacation(models.Model):
     employee = models.ForeignKey('Employee', on_delete=models.CASCADE, related_name='vacations')
@@ -17,6 +22,13 @@ class Vacation(models.Model):
     return_date = models.DateField(blank=True, null=True, verbose_name="Data de Retorno")
     vacation_duration= models.IntegerField(help_text='Duração em dias', verbose_name="Duração")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['start_date'], name='vacation_start_idx'),
+            models.Index(fields=['end_date'], name='vacation_end_idx'),
+            models.Index(fields=['return_date'], name='vacation_return_idx'),
+        ]
+
     #Função para verificação de feriados/dias não úteis + cálculo de data de término
     def save(self, *args, **kwargs):
         if self.start_date and self.vacation_duration:
@@ -117,6 +129,8 @@ class Dependent(models.Model):
     employee = models.ForeignKey('Employee', on_delete=models.CASCADE, related_name='dependents')
     name = models.CharField(max_length=100, verbose_name="Nome Completo")
     cpf = models.CharField(max_length=14, unique=True, verbose_name="CPF")
+    # CPF só com dígitos, mantido no save(): unicidade e busca por igualdade.
+    cpf_digits = models.CharField(max_length=14, blank=True, null=True, editable=False, verbose_name="CPF (Dígitos)")
     birth_date = models.DateField(verbose_name="Data de Nascimento")
 
     TYPE_CHOICES = [
@@ -129,10 +143,65 @@ class Dependent(models.Model):
     relationship_type = models.CharField(max_length=10, choices=TYPE_CHOICES, verbose_name="Parentesco")
     has_disability = models.BooleanField(default=False, verbose_name="Possui Deficiência")
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['cpf_digits'], condition=models.Q(cpf_digits__isnull=False), name='dependent_unique_cpf_digits',
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.cpf_digits = only_digits(self.cpf) or None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'cpf' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'cpf_digits'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.name
-    
+
+
+class EmployeeQuerySet(models.QuerySet):
+    def with_status_flags(self, today=None):
+        """
+        Anota `on_leave_flag` (afastamento em aberto) e `cipa_status_flag`
+        ('active' / 'stability' / None) para listas; Employee.is_on_leave e
+        Employee.cipa_status leem a anotação em vez de consultar por linha.
+        """
+        today = today or timezone.localdate()
+        open_absences = Occurrence.objects.filter(
+            employee=models.OuterRef('pk'),
+            is_absence=True,
+            occurrence_date__lte=today,
+        ).filter(models.Q(end_date__isnull=True) | models.Q(end_date__gte=today))
+
+        # Mesmas regras de Employee.cipa_status (início ausente = fim - 365 dias).
+        mandate_started = (
+            models.Q(cipa_mandate_start_date__lte=today)
+            | models.Q(cipa_mandate_start_date__isnull=True, cipa_mandate_end_date__lte=today + timedelta(days=365))
+        )
+        return self.annotate(
+            on_leave_flag=models.Exists(open_absences),
+            cipa_status_flag=models.Case(
+                models.When(
+                    mandate_started, is_cipa_member=True, cipa_mandate_end_date__gte=today,
+                    then=models.Value('active'),
+                ),
+                models.When(
+                    is_cipa_member=True,
+                    cipa_mandate_end_date__lt=today,
+                    cipa_mandate_end_date__gte=today - timedelta(days=365),
+                    then=models.Value('stability'),
+                ),
+                default=None,
+                output_field=models.CharField(),
+            ),
+        )
+
+
 class Employee(models.Model):
+    objects = EmployeeQuerySet.as_manager()
+
     name = models.CharField(max_length=100, verbose_name="Nome")
     cpf = models.CharField(max_length=14, unique=True, verbose_name="CPF")
     rg = models.CharField(max_length=20, blank=True, null=True, verbose_name="RG")
@@ -141,6 +210,9 @@ class Employee(models.Model):
     ctps_series = models.CharField(max_length=10, blank=True, null=True, verbose_name="Série")
     ctps_issue_date = models.DateField(blank=True, null=True, verbose_name="Emissão da CTPS") 
     pis = models.CharField(max_length=20, blank=True, null=True, verbose_name="PIS")
+    # CPF e PIS só com dígitos, mantidos no save(): unicidade e busca por igualdade.
+    cpf_digits = models.CharField(max_length=14, blank=True, null=True, editable=False, verbose_name="CPF (Dígitos)")
+    pis_digits = models.CharField(max_length=20, blank=True, null=True, editable=False, verbose_name="PIS (Dígitos)")
     registration_number = models.CharField(max_length=5, blank=True, null=True, verbose_name="Matrícula")
 
     ETHINICITY_CHOICES = [
@@ -292,6 +364,57 @@ class Employee(models.Model):
     ] 
     cipa_role = models.CharField(max_length=20, choices=ROLE_CHOICES, blank=True, null=True, verbose_name="Função na CIPA") 
 
+    # Nome, CPF, e-mail, setor e celular normalizados para a busca (ver search.py).
+    search_document = models.TextField(blank=True, default='', editable=False, verbose_name="Documento de Busca")
+
+    SEARCH_DOCUMENT_FIELDS = frozenset({'name', 'cpf', 'email', 'department', 'mobile_phone'})
+
+    class Meta:
+        # Índices dos filtros frequentes (ver benchmark query_plans). Os parciais
+        # cobrem só quem está ativo, que é o que as rotinas de eventos consultam.
+        indexes = [
+            models.Index(fields=['name', 'id'], name='employee_name_idx'),
+            models.Index(MonthDay('birth_date'), name='employee_active_birth_md_idx', condition=ACTIVE_EMPLOYEE),
+            models.Index(MonthDay('hire_date'), name='employee_active_hire_md_idx', condition=ACTIVE_EMPLOYEE),
+            models.Index(
+                fields=['contract_end_date'], name='employee_active_contract_idx',
+                condition=ACTIVE_EMPLOYEE & models.Q(contract_end_date__isnull=False),
+            ),
+            models.Index(
+                fields=['hire_date'], name='employee_active_trial_idx',
+                condition=ACTIVE_EMPLOYEE & models.Q(is_trial_contract=True),
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['cpf_digits'], condition=models.Q(cpf_digits__isnull=False), name='employee_unique_cpf_digits',
+            ),
+            models.UniqueConstraint(
+                fields=['pis_digits'], condition=models.Q(pis_digits__isnull=False), name='employee_unique_pis_digits',
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.search_document = self.build_search_document()
+        self.cpf_digits = only_digits(self.cpf) or None
+        self.pis_digits = only_digits(self.pis) or None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            derived = set()
+            if self.SEARCH_DOCUMENT_FIELDS.intersection(update_fields):
+                derived.add('search_document')
+            if 'cpf' in update_fields:
+                derived.add('cpf_digits')
+            if 'pis' in update_fields:
+                derived.add('pis_digits')
+            if derived:
+                kwargs['update_fields'] = {*update_fields, *derived}
+        super().save(*args, **kwargs)
+
+    def build_search_document(self):
+        department_name = self.department.name if self.department_id else ''
+        return build_search_document(self.name, self.cpf, self.email, department_name, self.mobile_phone)
+
     def check_cipa_expiration(self):
         """
         Verifies if the total time (Mandate + 1 Year Stability) has expired.
@@ -315,6 +438,8 @@ class Employee(models.Model):
 
     @property
     def cipa_status(self):
+        if hasattr(self, 'cipa_status_flag'):
+            return self.cipa_status_flag
 
         if not self.is_cipa_member or not self.cipa_mandate_end_date:
             return None
@@ -394,7 +519,10 @@ class Employee(models.Model):
     def is_on_leave(self):
         from django.utils import timezone
         from django.db.models import Q
-        
+
+        if hasattr(self, 'on_leave_flag'):
+            return self.on_leave_flag
+
         hoje = timezone.localdate()
 
         return self.occurrences.filter(
@@ -449,6 +577,9 @@ class CareerPlan(models.Model):
                 name='unique_active_career_plan'
             )
         ]
+        indexes = [
+            models.Index(fields=['status', 'promotion_date'], name='careerplan_status_date_idx'),
+        ]
 
     def clean(self):
         super().clean()
@@ -507,6 +638,10 @@ class NotificationRule(models.Model):
     event_type = models.CharField('Tipo de Evento', max_length=30, choices=EventTypes.choices)
     days_in_advance = models.PositiveIntegerField('Dias de Antecedência', default=15)
     is_active = models.BooleanField('Regra Ativa', default=True)
+    send_as_digest = models.BooleanField(
+        'Enviar no Resumo Diário', default=False,
+        help_text='Os eventos desta regra vão para o resumo diário de cada destinatário, em vez de um e-mail por evento.'
+    )
 
     class Meta:
 
@@ -527,6 +662,10 @@ class NotificationRecipient(models.Model):
         verbose_name='Regras Inscritas'
     )
     is_active = models.BooleanField('Ativo', default=True)
+    digest_mode = models.BooleanField(
+        'Resumo Diário', default=False,
+        help_text='Recebe um único e-mail por dia com todos os eventos, em vez de um e-mail por evento.'
+    )
 
     def __str__(self):
         return f"{self.name} <{self.email}>"
@@ -559,7 +698,44 @@ class NotificationLog(models.Model):
 
     def __str__(self):
         return f"Log: {self.rule.event_type} - {self.employee.name} ({self.reference_year})"
-    
+
+
+class NotificationOutbox(models.Model):
+    """
+    E-mail pendente de uma notificação, gravado na mesma transação do(s)
+    NotificationLog e enviado depois pela rotina notification_outbox
+    (services.drain_notification_outbox), com novas tentativas e backoff.
+    Um resumo diário cobre vários logs; um aviso avulso, apenas um.
+    """
+    class OutboxStatus(models.TextChoices):
+        PENDING = 'PENDING', 'Pendente'
+        SENDING = 'SENDING', 'Enviando'
+        SENT = 'SENT', 'Enviado'
+        DEAD = 'DEAD', 'Falhou (Desistência)'
+
+    logs = models.ManyToManyField(NotificationLog, related_name='outbox_messages', verbose_name='Notificações')
+    subject = models.CharField('Assunto', max_length=255)
+    body = models.TextField('Mensagem')
+    from_email = models.CharField('Remetente', max_length=255)
+    recipients = models.JSONField('Destinatários', default=list)
+
+    status = models.CharField('Status', max_length=10, choices=OutboxStatus.choices, default=OutboxStatus.PENDING)
+    attempts = models.PositiveIntegerField('Tentativas', default=0)
+    next_attempt_at = models.DateTimeField('Próxima Tentativa', default=timezone.now)
+    last_error = models.TextField('Último Erro', blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField('Enviado em', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'E-mail na Fila'
+        verbose_name_plural = 'Fila de E-mails'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"Outbox #{self.pk} - {self.subject} ({self.get_status_display()})"
+
 class CID(models.Model):
     code = models.CharField(max_length=10, unique=True, verbose_name='Código CID')
     description = models.CharField(max_length=500, verbose_name='Descrição Oficial')
@@ -624,6 +800,9 @@ class Occurrence(models.Model):
         verbose_name = 'Ocorrência'
         verbose_name_plural = 'Ocorrências'
         ordering = ['-occurrence_date', '-created_at']
+        indexes = [
+            models.Index(fields=['employee', 'is_absence', 'occurrence_date'], name='occurrence_emp_absence_idx'),
+        ]
 
     @property
     def absence_duration(self):
@@ -680,4 +859,169 @@ class UserAlertPreference(models.Model):
         unique_together = ('user', 'alert_type')
 
     def __str__(self):
-        return f"{self.user.username} - {self.get_alert_type_display()}"
\ No newline at end of file
+        return f"{self.user.username} - {self.get_alert_type_display()}"
+
+class UpcomingEvent(models.Model):
+    """
+    Linha materializada do calendário de eventos (ver services.rebuild_event_calendar).
+    `match_date` é a data usada no filtro por período — difere de `date` nos avisos
+    de contrato/experiência, que aparecem alguns dias antes da data real.
+    """
+    match_date = models.DateField('Data de Exibição')
+    date = models.DateField('Data do Evento')
+    category = models.CharField('Categoria', max_length=40)
+    title = models.TextField('Título')
+
+    employee = models.ForeignKey('Employee', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    employee_name = models.CharField(max_length=255, null=True, blank=True)
+    department_name = models.CharField(max_length=100, null=True, blank=True)
+
+    object_type = models.CharField(max_length=20)
+    object_id = models.PositiveIntegerField()
+    status = models.CharField(max_length=30, default='PENDING')
+    email_event = models.BooleanField(default=False)
+    requires_action = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['match_date', 'category']),
+            models.Index(fields=['object_type', 'object_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.match_date} - {self.category} - {self.title}"
+
+
+class EventCalendarState(models.Model):
+    """Registro único com o horizonte coberto pela tabela UpcomingEvent."""
+    horizon_start = models.DateField(null=True, blank=True)
+    horizon_end = models.DateField(null=True, blank=True)
+    is_rebuilding = models.BooleanField(default=False)
+    rebuilt_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Calendário de eventos: {self.horizon_start} → {self.horizon_end}"
+
+
+class PdfCacheState(models.Model):
+    """
+    Registro único com a versão dos dados dos PDFs. Entra no `cache_key` de
+    cada PdfRenderJob; escritas nos modelos dos relatórios incrementam a
+    versão, e os PDFs da versão anterior deixam de ser reaproveitados.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Cache de PDFs: versão {self.version}"
+
+
+class PdfRenderJob(models.Model):
+    """
+    Fila de renderização de PDFs e cache dos PDFs prontos (ver rhcontrol/pdf.py).
+    `cache_key` é o hash do template + caminho + parâmetros + usuário + versão
+    dos dados (PdfCacheState).
+    """
+    class JobStatus(models.TextChoices):
+        PENDING = 'PENDING', 'Na Fila'
+        RUNNING = 'RUNNING', 'Renderizando'
+        DONE = 'DONE', 'Concluído'
+        FAILED = 'FAILED', 'Falhou'
+
+    status = models.CharField(max_length=10, choices=JobStatus.choices, default=JobStatus.PENDING, verbose_name='Status')
+    cache_key = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    template_name = models.CharField(max_length=255)
+    filename = models.CharField(max_length=255)
+
+    html = models.TextField(blank=True, default='')
+    base_url = models.CharField(max_length=500, blank=True, default='')
+    # Kit de admissão ({'employees': [...], 'documents': [...], 'format': 'zip'|'pdf'}); vazio nos demais PDFs.
+    pack = models.JSONField(null=True, blank=True)
+    pdf = models.BinaryField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='pdf_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    render_ms = models.PositiveIntegerField(null=True, blank=True, verbose_name='Tempo de renderização (ms)')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"PDF #{self.pk} - {self.filename} ({self.get_status_display()})"
+
+
+class AutomationCheckpoint(models.Model):
+    """
+    Último dia em que cada rotina do run_automations terminou com sucesso.
+    Usado para recuperar (catch-up) os dias perdidos quando o cron fica parado.
+    """
+    name = models.CharField(max_length=50, unique=True, verbose_name='Rotina')
+    last_success_on = models.DateField(verbose_name='Último Sucesso')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_success_on}"
+
+
+class AutomationLease(models.Model):
+    """
+    Vaga de execução do run_automations ('run_automations:<slot>'). Cada processo
+    ocupa uma vaga até terminar (ou até expires_at, se morrer no meio); sem vaga
+    livre, a nova invocação sai sem fazer nada.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    owner = models.CharField(max_length=255, verbose_name='Processo')
+    acquired_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(verbose_name='Expira em')
+
+    def __str__(self):
+        return f"{self.name} ({self.owner})"
+
+
+class AutomationRun(models.Model):
+    """ Uma execução do run_automations (um registro por worker). """
+
+    class RunStatus(models.TextChoices):
+        RUNNING = 'RUNNING', 'Em execução'
+        SUCCESS = 'SUCCESS', 'Sucesso'
+        FAILED = 'FAILED', 'Falhou'
+
+    status = models.CharField(max_length=10, choices=RunStatus.choices, default=RunStatus.RUNNING, verbose_name='Status')
+    dry_run = models.BooleanField(default=False, verbose_name='Simulação')
+    owner = models.CharField(max_length=255, blank=True, verbose_name='Processo')
+    slot = models.PositiveSmallIntegerField(default=0, verbose_name='Worker')
+    started_at = models.DateTimeField(default=timezone.now, verbose_name='Início')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Fim')
+    duration = models.FloatField(null=True, blank=True, verbose_name='Duração (s)')
+
+    class Meta:
+        ordering = ['-started_at']
+        indexes = [models.Index(fields=['started_at'])]
+
+    def __str__(self):
+        return f"Execução #{self.pk} - {self.started_at:%d/%m/%Y %H:%M} ({self.get_status_display()})"
+
+
+class AutomationStep(models.Model):
+    """ Resultado e métricas de uma rotina dentro de um AutomationRun. """
+    run = models.ForeignKey(AutomationRun, on_delete=models.CASCADE, related_name='steps')
+    name = models.CharField(max_length=50, verbose_name='Rotina')
+    status = models.CharField(max_length=10, choices=AutomationRun.RunStatus.choices, verbose_name='Status')
+    started_at = models.DateTimeField(default=timezone.now, verbose_name='Início')
+    duration = models.FloatField(default=0, verbose_name='Duração (s)')
+    rows_scanned = models.PositiveIntegerField(default=0, verbose_name='Linhas lidas')
+    events_produced = models.PositiveIntegerField(default=0, verbose_name='Eventos gerados')
+    emails_sent = models.PositiveIntegerField(default=0, verbose_name='E-mails enviados')
+    errors = models.PositiveIntegerField(default=0, verbose_name='Erros')
+    error_message = models.TextField(blank=True, verbose_name='Erro')
+
+    class Meta:
+        ordering = ['run', 'started_at']
+        indexes = [models.Index(fields=['name', 'started_at'])]
+
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()}, {self.duration:.2f}s)"
@@ -0,0 +1,199 @@
+"""
+pagination.py — Paginação por cursor (keyset) para as listas grandes.
+
+O Paginator do Django faz COUNT(*) e OFFSET n, que ficam mais lentos a cada
+página. O KeysetPaginator ordena pelas colunas escolhidas + pk e busca a
+página seguinte com WHERE (coluna, pk) > (último valor, último pk), então a
+página 2.000 custa o mesmo que a primeira.
+
+O cursor vai na URL (?cursor=...) ao lado dos filtros. Colunas que aceitam
+NULL são ordenadas por Coalesce(coluna, sentinela) para a comparação valer
+em todas as linhas; a sentinela é o maior valor do tipo, o que deixa os
+nulos no fim da ordem crescente (igual ao padrão do PostgreSQL). O total é
+opcional e aproximado (ver approximate_count).
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+
+_SENTINELS = {
+    'DateField': date(9999, 12, 31),
+    'DateTimeField': datetime(9999, 12, 31, tzinfo=dt_timezone.utc),
+    'IntegerField': 2 ** 31 - 1,
+    'SmallIntegerField': 2 ** 15 - 1,
+    'PositiveIntegerField': 2 ** 31 - 1,
+    'PositiveSmallIntegerField': 2 ** 15 - 1,
+    'BigIntegerField': 2 ** 63 - 1,
+    'DecimalField': Decimal('9' * 15),
+    'FloatField': 1e308,
+    'CharField': '\uffff',
+    'TextField': '\uffff',
+    'EmailField': '\uffff',
+}
+
+
+@dataclass
+class KeysetPage:
+    object_list: list
+    next_cursor: str | None = None
+    previous_cursor: str | None = None
+    total: int | None = None
+    total_display: str = ''
+    per_page: int = 0
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self) -> bool:
+        return self.has_next or self.has_previous
+
+
+def approximate_count(queryset, cap: int = 1000) -> tuple[int, str]:
+    """
+    (total, texto para exibir). Conta de verdade só até `cap` linhas; acima
+    disso usa a estimativa do planejador no PostgreSQL ("≈ N") ou para em
+    `cap` nos demais bancos ("mais de N").
+    """
+    queryset = queryset.order_by()
+    counted = queryset[:cap + 1].count()
+    if counted <= cap:
+        return counted, str(counted)
+
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = max(int(plan[0]['Plan']['Plan Rows']), cap + 1)
+        return estimate, f'≈ {estimate}'
+    return cap, f'mais de {cap}'
+
+
+class KeysetPaginator:
+    """
+    `ordering` = campos como no order_by ('-occurrence_date', 'employee__name');
+    o pk é acrescentado como desempate. Também aceita anotações do queryset.
+    """
+
+    def __init__(self, queryset, per_page: int, ordering: list[str], count_cap: int | None = 1000):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.count_cap = count_cap
+        self.keys = []  # (alias, expressão, output_field, descending)
+
+        for position, name in enumerate([*ordering, 'pk']):
+            descending = name.startswith('-')
+            path = name.lstrip('-')
+            output_field, nullable = self._resolve(path)
+            expression = F(path)
+            if nullable:
+                expression = Coalesce(F(path), Value(_SENTINELS[output_field.get_internal_type()], output_field=output_field))
+            if path == 'pk' and ordering:
+                descending = ordering[-1].startswith('-')
+            self.keys.append((f'keyset_{position}', expression, output_field, descending))
+
+    def _resolve(self, path: str):
+        annotation = self.queryset.query.annotations.get(path)
+        if annotation is not None:
+            return annotation.output_field, False
+        model = self.queryset.model
+        nullable = False
+        model_field = None
+        for name in path.split('__'):
+            model_field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+            nullable = nullable or model_field.null
+            if model_field.is_relation:
+                model = model_field.related_model
+        if model_field.is_relation:
+            model_field = model_field.target_field
+        return model_field, nullable
+
+    # ── cursor ──────────────────────────────────────────────────
+
+    def _encode(self, forward: bool, row) -> str:
+        values = [str(getattr(row, alias)) for alias, *_ in self.keys]
+        raw = json.dumps(['n' if forward else 'p', values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def _decode(self, cursor: str | None):
+        """(forward, valores) ou None para cursor ausente/inválido (= primeira página)."""
+        if not cursor:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(raw)
+            if direction not in ('n', 'p') or len(values) != len(self.keys):
+                return None
+            parsed = [output_field.to_python(value) for (_, _, output_field, _), value in zip(self.keys, values)]
+        except (binascii.Error, ValueError, TypeError, ValidationError, FieldDoesNotExist):
+            return None
+        return direction == 'n', parsed
+
+    # ── página ──────────────────────────────────────────────────
+
+    def _seek(self, values, forward: bool) -> Q:
+        # (k0, k1, ..., pk) > (v0, v1, ..., vpk) expandido em OR de prefixos iguais.
+        condition = Q(pk__in=[])
+        equal_prefix = Q()
+        for (alias, _, _, descending), value in zip(self.keys, values):
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= equal_prefix & Q(**{f'{alias}__{lookup}': value})
+            equal_prefix &= Q(**{alias: value})
+        return condition
+
+    def get_page(self, cursor: str | None = None) -> KeysetPage:
+        decoded = self._decode(cursor)
+        forward = decoded is None or decoded[0]
+
+        queryset = self.queryset.annotate(**{alias: expression for alias, expression, _, _ in self.keys})
+        if decoded is not None:
+            queryset = queryset.filter(self._seek(decoded[1], forward))
+        queryset = queryset.order_by(*[
+            F(alias).desc() if descending == forward else F(alias).asc()
+            for alias, _, _, descending in self.keys
+        ])
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+
+        has_next = has_more if forward else decoded is not None
+        has_previous = decoded is not None if forward else has_more
+
+        page = KeysetPage(
+            object_list=rows,
+            next_cursor=self._encode(True, rows[-1]) if rows and has_next else None,
+            previous_cursor=self._encode(False, rows[0]) if rows and has_previous else None,
+            per_page=self.per_page,
+        )
+        if self.count_cap is not None:
+            page.total, page.total_display = approximate_count(self.queryset, self.count_cap)
+        return page
@@ -0,0 +1,499 @@
+"""
+pdf.py — Renderização de PDFs (WeasyPrint), fila assíncrona e cache.
+
+Todas as views de PDF chamam render_pdf_response(). O fluxo é:
+
+1. Procura um PDF pronto com o mesmo `cache_key` (template + caminho +
+   parâmetros GET + usuário + versão dos dados) dentro de PDF_CACHE_TTL — se
+   houver, devolve na hora. Escritas nos modelos dos relatórios incrementam a
+   versão (ver signals.py).
+2. Com `?async=1`, renderiza apenas o HTML, enfileira um PdfRenderJob e responde
+   202 com as URLs de status/download; `python manage.py run_pdf_worker` faz o resto.
+3. Sem `async`, renderiza no próprio request (comportamento original) e guarda o
+   resultado no cache.
+
+O pacote de admissão (vários documentos para N funcionários) fica no fim do
+arquivo: ZIP ou PDF único. Kits pequenos saem direto no request; os maiores
+vão para a fila e são renderizados em paralelo pelo pool do run_pdf_worker
+(ou pelo do generate_admission_pack, na linha de comando).
+
+O import do WeasyPrint é tardio: só quem renderiza precisa das bibliotecas nativas.
+"""
+import functools
+import hashlib
+import logging
+import mimetypes
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from typing import Iterator
+from urllib.parse import urljoin, urlparse
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.http import HttpResponse, JsonResponse
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import PdfCacheState, PdfRenderJob
+from .streams import ZipStream
+
+logger = logging.getLogger(__name__)
+
+JobStatus = PdfRenderJob.JobStatus
+
+
+def render_html_to_pdf(html: str, base_url: str | None = None) -> bytes:
+    """
+    Renderiza HTML em PDF com os assets do processo: folhas de estilo já
+    parseadas, FontConfiguration única e estáticos lidos do disco (sem HTTP).
+    Função pura (sem ORM): roda também nos processos do worker.
+    """
+    from weasyprint import HTML
+    return HTML(string=html, base_url=base_url or PDF_ASSETS_BASE_URL, url_fetcher=static_url_fetcher).write_pdf(
+        stylesheets=get_pdf_stylesheets(), font_config=get_font_config(),
+    )
+
+
+def render_html_to_pdf_timed(html: str, base_url: str | None = None) -> tuple[bytes, float]:
+    """Como render_html_to_pdf(), devolvendo também a duração em milissegundos."""
+    started = time.perf_counter()
+    pdf = render_html_to_pdf(html, base_url)
+    return pdf, (time.perf_counter() - started) * 1000
+
+
+# ── Assets compartilhados (por processo) ────────────────────────
+# Nada aqui é recarregado entre renderizações: o primeiro PDF do processo
+# paga a leitura/parse, os seguintes reaproveitam.
+
+PDF_ASSETS_BASE_URL = 'http://localhost/'
+DEFAULT_PDF_STYLESHEETS = ('global/css/pdf_fonts.css',)
+
+
+@functools.lru_cache(maxsize=64)
+def _read_static_file(relative_path: str) -> bytes | None:
+    from django.contrib.staticfiles import finders
+    found = finders.find(relative_path)
+    if not found and settings.STATIC_ROOT:
+        candidate = os.path.join(settings.STATIC_ROOT, relative_path)
+        found = candidate if os.path.isfile(candidate) else None
+    if not found:
+        return None
+    with open(found, 'rb') as fh:
+        return fh.read()
+
+
+def static_url_fetcher(url: str, *args, **kwargs) -> dict:
+    """URL fetcher do WeasyPrint que serve STATIC_URL do disco (com cache) em vez de HTTP."""
+    path = urlparse(url).path
+    if path.startswith(settings.STATIC_URL):
+        data = _read_static_file(path[len(settings.STATIC_URL):])
+        if data is None:
+            raise ValueError(f"Arquivo estático não encontrado: {path}")
+        return {'string': data, 'mime_type': mimetypes.guess_type(path)[0], 'redirected_url': url}
+    from weasyprint import default_url_fetcher
+    return default_url_fetcher(url, *args, **kwargs)
+
+
+@functools.lru_cache(maxsize=1)
+def get_font_config():
+    from weasyprint.text.fonts import FontConfiguration
+    return FontConfiguration()
+
+
+@functools.lru_cache(maxsize=1)
+def get_pdf_stylesheets() -> tuple:
+    """
+    Folhas de estilo comuns a todos os PDFs (settings.PDF_STYLESHEETS), parseadas
+    uma única vez. As @font-face ficam registradas na FontConfiguration do processo.
+    """
+    from weasyprint import CSS
+    font_config = get_font_config()
+    return tuple(
+        CSS(url=urljoin(PDF_ASSETS_BASE_URL, settings.STATIC_URL + path), url_fetcher=static_url_fetcher, font_config=font_config)
+        for path in getattr(settings, 'PDF_STYLESHEETS', DEFAULT_PDF_STYLESHEETS)
+    )
+
+
+def preload_pdf_assets() -> None:
+    """Aquece os caches do processo antes da primeira renderização."""
+    get_pdf_stylesheets()
+
+
+def _cache_ttl() -> int:
+    return getattr(settings, 'PDF_CACHE_TTL', 300)
+
+
+def pdf_cache_version() -> int:
+    return PdfCacheState.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+
+def pdf_cache_key(request, template_name: str) -> str:
+    params = sorted(
+        (key, value)
+        for key, values in request.GET.lists() if key != 'async'
+        for value in values
+    )
+    payload = '|'.join([template_name, request.path, repr(params), str(request.user.pk), str(pdf_cache_version())])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def get_cached_pdf_job(cache_key: str) -> PdfRenderJob | None:
+    ttl = _cache_ttl()
+    if not ttl:
+        return None
+    return (
+        PdfRenderJob.objects
+        .filter(cache_key=cache_key, status=JobStatus.DONE, finished_at__gte=timezone.now() - timedelta(seconds=ttl))
+        .order_by('-finished_at')
+        .first()
+    )
+
+
+def pdf_file_response(pdf: bytes, filename: str) -> HttpResponse:
+    response = HttpResponse(bytes(pdf), content_type='application/pdf')
+    response['Content-Disposition'] = f'inline; filename="{filename}"'
+    return response
+
+
+def pdf_job_payload(job: PdfRenderJob) -> dict:
+    payload = {
+        'id': job.pk,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'status_url': reverse('rhcontrol:pdf_job_status', args=[job.pk]),
+        'download_url': None,
+        'error': job.error or None,
+    }
+    if job.status == JobStatus.DONE:
+        payload['download_url'] = reverse('rhcontrol:pdf_job_download', args=[job.pk])
+    return payload
+
+
+def _wants_async(request) -> bool:
+    return request.GET.get('async', '').lower() in ('1', 'true')
+
+
+def render_pdf_response(request, template_name: str, context: dict, filename: str, *, with_request: bool = True):
+    """
+    Ponto único das views de PDF. `with_request=False` reproduz as views que
+    renderizavam o template sem context processors.
+    """
+    cache_key = pdf_cache_key(request, template_name)
+    user = request.user if request.user.is_authenticated else None
+
+    cached = get_cached_pdf_job(cache_key)
+    if cached is not None:
+        logger.debug(f"PDF servido do cache: {filename} (job #{cached.pk})")
+        return pdf_file_response(cached.pdf, filename)
+
+    html = render_to_string(template_name, context, request=request if with_request else None)
+    base_url = request.build_absolute_uri()
+
+    if _wants_async(request):
+        job = (
+            PdfRenderJob.objects
+            .filter(cache_key=cache_key, status__in=[JobStatus.PENDING, JobStatus.RUNNING])
+            .first()
+        )
+        if job is None:
+            job = PdfRenderJob.objects.create(
+                cache_key=cache_key, template_name=template_name, filename=filename,
+                html=html, base_url=base_url, requested_by=user,
+            )
+        return JsonResponse(pdf_job_payload(job), status=202)
+
+    pdf, render_ms = render_html_to_pdf_timed(html, base_url)
+    logger.info(f"PDF renderizado: {filename} em {render_ms:.0f} ms")
+    if _cache_ttl():
+        now = timezone.now()
+        PdfRenderJob.objects.create(
+            status=JobStatus.DONE, cache_key=cache_key, template_name=template_name, filename=filename,
+            base_url=base_url, pdf=pdf, requested_by=user, started_at=now, finished_at=now, render_ms=round(render_ms),
+        )
+    response = pdf_file_response(pdf, filename)
+    response['Server-Timing'] = f'pdf;dur={render_ms:.1f}'
+    return response
+
+
+# ── Worker helpers (run_pdf_worker) ─────────────────────────────
+
+def claim_pdf_jobs(limit: int) -> list[PdfRenderJob]:
+    """
+    Reserva até `limit` jobs pendentes (ou presos em RUNNING além de
+    PDF_JOB_TIMEOUT) para este worker. O UPDATE condicionado ao status
+    garante que dois workers não peguem o mesmo job.
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=getattr(settings, 'PDF_JOB_TIMEOUT', 600))
+    claimable = Q(status=JobStatus.PENDING) | Q(status=JobStatus.RUNNING, started_at__lt=stale_before)
+
+    with transaction.atomic():
+        ids = list(
+            PdfRenderJob.objects.select_for_update(skip_locked=True)
+            .filter(claimable)
+            .order_by('created_at')
+            .values_list('pk', flat=True)[:limit]
+        )
+        claimed = PdfRenderJob.objects.filter(claimable, pk__in=ids).update(status=JobStatus.RUNNING, started_at=now)
+    if not claimed:
+        return []
+    return list(PdfRenderJob.objects.filter(pk__in=ids, status=JobStatus.RUNNING, started_at=now))
+
+
+def complete_pdf_job(job: PdfRenderJob, pdf: bytes | None = None, error: str = '', render_ms: float | None = None) -> None:
+    job.finished_at = timezone.now()
+    job.render_ms = round(render_ms) if render_ms is not None else None
+    if error:
+        job.status = JobStatus.FAILED
+        job.error = error
+    else:
+        job.status = JobStatus.DONE
+        job.pdf = pdf
+        job.html = ''  # o HTML só era necessário para renderizar
+    job.save(update_fields=['status', 'pdf', 'html', 'error', 'finished_at', 'render_ms'])
+
+
+def purge_expired_pdf_jobs(dry_run: bool = False) -> None:
+    """Remove PDFs prontos/falhos mais antigos que o dobro do TTL do cache."""
+    cutoff = timezone.now() - timedelta(seconds=max(_cache_ttl(), 60) * 2)
+    expired = PdfRenderJob.objects.filter(status__in=[JobStatus.DONE, JobStatus.FAILED], finished_at__lt=cutoff)
+    if dry_run:
+        logger.info(f"[DRY-RUN] Simulação: Removeria {expired.count()} PDF(s) expirado(s) da fila.")
+        return
+    deleted, _ = expired.delete()
+    logger.info(f"Fila de PDFs: {deleted} job(s) expirado(s) removido(s).")
+
+
+def invalidate_pdf_cache() -> None:
+    """
+    Os dados mudaram: incrementa a versão do cache (UPDATE de uma linha só).
+    PDFs prontos continuam baixáveis pelo id, mas não são mais reaproveitados.
+    """
+    if not PdfCacheState.objects.filter(pk=1).update(version=F('version') + 1):
+        PdfCacheState.objects.get_or_create(pk=1, defaults={'version': 1})
+
+
+
+# ── Pacote de admissão ──────────────────────────────────────────
+# doc_type → (template, prefixo do arquivo). Mesma ordem em que o kit é impresso.
+
+ADMISSION_DOCUMENTS = {
+    'registration_form':     ('dashboard/pages/employee/pdf/registration_form.html',     'ficha_cadastral'),
+    'confidentiality_term':  ('dashboard/pages/employee/pdf/confidentiality_term.html',  'termo_de_confidencialidade'),
+    'bank_presentation':     ('dashboard/pages/employee/pdf/bank_presentation.html',     'apresentacao_bancaria'),
+    'personal_data_consent': ('dashboard/pages/employee/pdf/personal_data_consent.html', 'termo_de_consentimento_dados_pessoais'),
+    'commitment_term':       ('dashboard/pages/employee/pdf/commitment_term.html',       'termo_de_compromisso'),
+    'image_consent':         ('dashboard/pages/employee/pdf/image_consent.html',         'termo_de_consentimento_uso_imagem'),
+    'benefits_acquisition':  ('dashboard/pages/employee/pdf/benefits_acquisition.html',  'termo_de_aquisicao_beneficios'),
+    'internal_regulation':   ('dashboard/pages/employee/pdf/internal_regulation.html',   'regimento_interno'),
+}
+
+
+def admission_filename(employee, doc_type: str) -> str:
+    safe_name = employee.name.replace(' ', '_')
+    return f"{ADMISSION_DOCUMENTS[doc_type][1]}_{employee.id}_{safe_name}.pdf"
+
+
+def admission_context(employee, user=None) -> dict:
+    return {
+        'employee': employee,
+        'user': user,
+        'generated_at': timezone.now(),
+        'company_name_settings': settings.COMPANY_NAME,
+    }
+
+
+def render_admission_html(employee, doc_type: str, user=None) -> str:
+    """HTML de um documento fora de um request (context processors aplicados manualmente)."""
+    from django.contrib.auth.models import AnonymousUser
+    from .context_processors import company_info
+    # base_pdf.html lê user.username no rodapé; fora de um request não há usuário.
+    context = {**company_info(None), **admission_context(employee, user or AnonymousUser())}
+    return render_to_string(ADMISSION_DOCUMENTS[doc_type][0], context)
+
+
+def _render_admission_document(employee_id: int, doc_type: str, user_id: int | None) -> tuple[str, bytes]:
+    """Unidade de trabalho do pool: busca, renderiza o HTML e gera o PDF no processo filho."""
+    from django.contrib.auth.models import User
+    from .models import Employee
+    employee = Employee.objects.select_related('department', 'job_title').get(pk=employee_id)
+    user = User.objects.filter(pk=user_id).first() if user_id else None
+    html = render_admission_html(employee, doc_type, user)
+    return admission_filename(employee, doc_type), render_html_to_pdf(html, PDF_ASSETS_BASE_URL)
+
+
+def init_render_process():
+    # Com start method "spawn" o processo filho não herda o Django configurado.
+    import django
+    django.setup()
+    preload_pdf_assets()
+
+
+def parse_admission_pack_request(raw_employees: str, raw_documents: str) -> tuple[list[int], list[str]]:
+    """Valida as listas separadas por vírgula da view e do comando. Levanta ValueError."""
+    try:
+        employee_ids = list(dict.fromkeys(int(e) for e in raw_employees.split(',') if e.strip()))
+    except ValueError:
+        raise ValueError("IDs de funcionário inválidos.")
+    if not employee_ids:
+        raise ValueError("Informe ao menos um funcionário.")
+    max_employees = getattr(settings, 'PDF_PACK_MAX_EMPLOYEES', 200)
+    if len(employee_ids) > max_employees:
+        raise ValueError(f"Máximo de {max_employees} funcionários por kit.")
+
+    doc_types = [d.strip() for d in raw_documents.split(',') if d.strip()] if raw_documents and raw_documents != 'all' else list(ADMISSION_DOCUMENTS)
+    unknown = [d for d in doc_types if d not in ADMISSION_DOCUMENTS]
+    if unknown:
+        raise ValueError(f"Documento(s) desconhecido(s): {', '.join(unknown)}")
+    return employee_ids, doc_types
+
+
+def pack_worker_count() -> int:
+    return getattr(settings, 'PDF_WORKER_PROCESSES', None) or os.cpu_count() or 1
+
+
+def _admission_error_entry(employee_id: int, doc_type: str, error: Exception) -> tuple[str, bytes]:
+    """Entrada no lugar de um documento que falhou: o ZIP já está sendo enviado, não dá mais para responder 500."""
+    logger.error(f"Kit de admissão: falha em '{doc_type}' do funcionário {employee_id}: {error}", exc_info=error)
+    message = f"Não foi possível gerar '{doc_type}' para o funcionário {employee_id}: {error}\n"
+    return f"ERRO_{ADMISSION_DOCUMENTS[doc_type][1]}_{employee_id}.txt", message.encode('utf-8')
+
+
+def iter_admission_pack_zip(employee_ids: list[int], doc_types: list[str], user_id: int | None = None,
+                            pool: ProcessPoolExecutor | None = None) -> Iterator[bytes]:
+    """
+    Gera o ZIP do kit em pedaços, na ordem funcionário → documento.
+    Um documento que falha vira uma entrada ERRO_*.txt no ZIP e os demais
+    seguem. Com `pool` (run_pdf_worker, generate_admission_pack) os documentos
+    são renderizados em paralelo nos processos do pool; sem ele, em sequência
+    no processo atual (kits pequenos servidos direto pela view).
+    """
+    tasks = [(employee_id, doc_type, user_id) for employee_id in employee_ids for doc_type in doc_types]
+    if pool is None:
+        results = (_call_admission_document(*task) for task in tasks)
+    else:
+        futures = [pool.submit(_render_admission_document, *task) for task in tasks]
+        results = (_future_admission_document(task, future) for task, future in zip(tasks, futures))
+
+    stream = ZipStream()
+    with zipfile.ZipFile(stream, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, pdf in results:
+            archive.writestr(name, pdf)
+            yield stream.drain()
+    yield stream.drain()
+
+
+def _call_admission_document(employee_id: int, doc_type: str, user_id: int | None) -> tuple[str, bytes]:
+    try:
+        return _render_admission_document(employee_id, doc_type, user_id)
+    except Exception as e:
+        return _admission_error_entry(employee_id, doc_type, e)
+
+
+def _future_admission_document(task: tuple, future) -> tuple[str, bytes]:
+    try:
+        return future.result()
+    except Exception as e:
+        return _admission_error_entry(task[0], task[1], e)
+
+
+def merge_html_to_pdf(documents: list[str], base_url: str) -> bytes:
+    """Renderiza vários HTMLs e junta as páginas num único PDF (fontes compartilhadas)."""
+    from weasyprint import HTML
+    font_config = get_font_config()
+    stylesheets = get_pdf_stylesheets()
+    rendered = [
+        HTML(string=html, base_url=base_url, url_fetcher=static_url_fetcher).render(stylesheets=stylesheets, font_config=font_config)
+        for html in documents
+    ]
+    pages = [page for document in rendered for page in document.pages]
+    return rendered[0].copy(pages).write_pdf()
+
+
+def render_admission_pack_pdf(employee_ids: list[int], doc_types: list[str], user=None) -> bytes:
+    """
+    Kit em um único PDF, na ordem funcionário → documento, com os
+    funcionários na ordem de `employee_ids`. O merge exige os documentos no
+    mesmo processo, então este modo não usa o pool.
+    """
+    from .models import Employee
+    employees = Employee.objects.select_related('department', 'job_title').in_bulk(employee_ids)
+    documents = [
+        render_admission_html(employees[pk], doc_type, user)
+        for pk in employee_ids if pk in employees
+        for doc_type in doc_types
+    ]
+    return merge_html_to_pdf(documents, PDF_ASSETS_BASE_URL)
+
+
+def _render_admission_pack_pdf(employee_ids: list[int], doc_types: list[str], user_id: int | None) -> bytes:
+    """render_admission_pack_pdf() num processo do pool (recebe só ids)."""
+    from django.contrib.auth.models import User
+    user = User.objects.filter(pk=user_id).first() if user_id else None
+    return render_admission_pack_pdf(employee_ids, doc_types, user)
+
+
+# ── Kit de admissão na fila ─────────────────────────────────────
+# Kits maiores que PDF_PACK_INLINE_MAX_EMPLOYEES não são renderizados no
+# request: viram um PdfRenderJob com `pack` preenchido e o run_pdf_worker
+# distribui os documentos entre os processos do pool.
+
+def pack_inline_limit() -> int:
+    return getattr(settings, 'PDF_PACK_INLINE_MAX_EMPLOYEES', 5)
+
+
+def enqueue_admission_pack(employee_ids: list[int], doc_types: list[str], fmt: str, user=None) -> PdfRenderJob:
+    """Enfileira o kit, reaproveitando um job igual pronto (dentro do TTL) ou ainda na fila."""
+    pack = {'employees': employee_ids, 'documents': doc_types, 'format': fmt}
+    payload = '|'.join(['admission_pack', repr(sorted(pack.items())), str(user.pk if user else None), str(pdf_cache_version())])
+    cache_key = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    job = get_cached_pdf_job(cache_key) or (
+        PdfRenderJob.objects
+        .filter(cache_key=cache_key, status__in=[JobStatus.PENDING, JobStatus.RUNNING])
+        .first()
+    )
+    if job is None:
+        job = PdfRenderJob.objects.create(
+            cache_key=cache_key, template_name='admission_pack', filename=f'kit_admissao.{fmt}',
+            pack=pack, requested_by=user,
+        )
+    return job
+
+
+def render_admission_pack_job(job: PdfRenderJob, pool: ProcessPoolExecutor) -> tuple[bytes, float]:
+    """
+    Renderiza um job de kit no run_pdf_worker. No ZIP cada documento vai para
+    um processo do pool; o `started_at` do job é renovado a cada documento
+    pronto, para que um kit grande não seja tomado por outro worker após
+    PDF_JOB_TIMEOUT. Devolve os bytes e a duração em milissegundos.
+    """
+    started = time.perf_counter()
+    employee_ids, doc_types = job.pack['employees'], job.pack['documents']
+    user_id = job.requested_by_id
+    if job.pack.get('format') == 'pdf':
+        content = pool.submit(_render_admission_pack_pdf, employee_ids, doc_types, user_id).result()
+    else:
+        chunks = []
+        last_touch = time.monotonic()
+        for chunk in iter_admission_pack_zip(employee_ids, doc_types, user_id, pool=pool):
+            chunks.append(chunk)
+            if time.monotonic() - last_touch > 30:
+                PdfRenderJob.objects.filter(pk=job.pk, status=JobStatus.RUNNING).update(started_at=timezone.now())
+                last_touch = time.monotonic()
+        content = b''.join(chunks)
+    return content, (time.perf_counter() - started) * 1000
+
+
+def pdf_job_file_response(job: PdfRenderJob) -> HttpResponse:
+    """Download de um job pronto: PDF inline, kit em ZIP como anexo."""
+    if not job.filename.endswith('.zip'):
+        return pdf_file_response(job.pdf, job.filename)
+    response = HttpResponse(bytes(job.pdf), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{job.filename}"'
+    return response
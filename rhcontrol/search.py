@@ -0,0 +1,209 @@
+"""
+search.py — Busca de funcionários sem acento e sem diferenciar maiúsculas.
+
+Employee.search_document guarda nome, CPF, e-mail, setor e celular já
+normalizados (minúsculas, sem acentos; CPF e celular também só com dígitos)
+e é recalculado no save(). O índice por cima dele depende do banco:
+
+- SQLite: tabela FTS5 `rhcontrol_employee_fts` (external content sobre
+  rhcontrol_employee), mantida por triggers; cada termo casa por prefixo e o
+  ranking é o bm25. Sem resultado no FTS (fragmento do meio de uma palavra,
+  parte de um número) ou com um termo só de pontuação ("@", "-"), a busca cai
+  no `contains`, como antes do índice.
+- PostgreSQL: índice GIN trigram (pg_trgm) em search_document; cada termo
+  casa por substring e o ranking é a similaridade de trigramas.
+- Outros bancos: `contains` em search_document, sem índice.
+
+Um CPF ou PIS completo (11 dígitos, com ou sem pontuação) é procurado
+primeiro por igualdade nas colunas cpf_digits/pis_digits, que têm índice
+único.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, ExpressionWrapper, F, FloatField, Q, QuerySet, Value
+from django.db.models.expressions import RawSQL
+
+from .utils import normalize_search_text, only_digits
+
+FTS_TABLE = 'rhcontrol_employee_fts'
+TRIGRAM_INDEX = 'rhcontrol_employee_search_trgm'
+
+_DOCUMENT_QUERY = re.compile(r'^[\d.\-/\s]+$')
+_FTS_TOKEN = re.compile(r'\w')
+
+_SQLITE_INSTALL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "search_document, content='rhcontrol_employee', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON rhcontrol_employee BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, search_document) VALUES (new.id, new.search_document); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON rhcontrol_employee BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_document) VALUES ('delete', old.id, old.search_document); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF search_document ON rhcontrol_employee BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_document) VALUES ('delete', old.id, old.search_document); "
+    f"INSERT INTO {FTS_TABLE}(rowid, search_document) VALUES (new.id, new.search_document); END",
+]
+
+_SQLITE_UNINSTALL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def build_search_document(name, cpf, email, department_name, mobile_phone) -> str:
+    """
+    Texto indexado de um funcionário.
+
+    >>> build_search_document('João Souza', '123.456.789-01', 'joao@rh.com', 'Logística', '(11) 98765-4321')
+    'joao souza 123.456.789-01 12345678901 joao@rh.com logistica (11) 98765-4321 11987654321'
+    """
+    parts = [name, cpf, only_digits(cpf), email, department_name, mobile_phone, only_digits(mobile_phone)]
+    return normalize_search_text(' '.join(part for part in parts if part))
+
+
+def search_backend(conn=None) -> str:
+    """'fts5', 'trigram' ou 'contains', conforme o banco da conexão."""
+    vendor = (conn or connection).vendor
+    if vendor == 'sqlite':
+        return 'fts5'
+    if vendor == 'postgresql':
+        return 'trigram'
+    return 'contains'
+
+
+# ── Instalação (migrations) ─────────────────────────────────────
+
+def install_search_index(schema_editor) -> None:
+    """
+    Cria o índice do banco em uso. Idempotente: as migrations que recriam
+    rhcontrol_employee no SQLite (e com isso perdem os triggers) chamam de novo.
+    """
+    backend = search_backend(schema_editor.connection)
+    if backend == 'fts5':
+        for sql in _SQLITE_INSTALL:
+            schema_editor.execute(sql)
+        schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    elif backend == 'trigram':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} ON rhcontrol_employee "
+            "USING gin (search_document gin_trgm_ops)"
+        )
+
+
+def uninstall_search_index(schema_editor) -> None:
+    backend = search_backend(schema_editor.connection)
+    if backend == 'fts5':
+        for sql in _SQLITE_UNINSTALL:
+            schema_editor.execute(sql)
+    elif backend == 'trigram':
+        schema_editor.execute(f"DROP INDEX IF EXISTS {TRIGRAM_INDEX}")
+
+
+# ── Consulta ────────────────────────────────────────────────────
+
+def document_number(query: str) -> str | None:
+    """
+    Dígitos de um CPF/PIS completo digitado na busca, ou None.
+
+    >>> document_number('123.456.789-01')
+    '12345678901'
+    >>> document_number('123.456') is None
+    True
+    """
+    if not query or not _DOCUMENT_QUERY.match(query):
+        return None
+    digits = only_digits(query)
+    return digits if len(digits) == 11 else None
+
+
+def _fts_match(terms: list[str]) -> str:
+    # Cada termo vira uma frase com prefixo ("termo"*); termos separados por espaço = AND.
+    return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+def _fts_ids(queryset: QuerySet, terms: list[str]) -> RawSQL | None:
+    """
+    Subconsulta com os ids que casam no FTS, ou None quando a busca deve cair
+    no `contains`: algum termo sem palavra (só pontuação) ou nenhum resultado
+    (o FTS só casa o início das palavras; "ceic" não acha "conceicao").
+    """
+    if not all(_FTS_TOKEN.search(term) for term in terms):
+        return None
+    fts_ids = RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (_fts_match(terms),))
+    return fts_ids if queryset.filter(pk__in=fts_ids).exists() else None
+
+
+def search_employees(queryset: QuerySet, query: str, ranked: bool = False) -> QuerySet:
+    """
+    Filtra `queryset` (de Employee) pelos termos de `query`; todos precisam
+    casar. Com `ranked`, anota `search_rank` (maior = mais relevante) e ordena
+    por ele, desempatando pelo nome.
+    """
+    terms = normalize_search_text(query).split()
+    if not terms:
+        return queryset
+
+    number = document_number(query)
+    by_document = queryset.filter(Q(cpf_digits=number) | Q(pis_digits=number)) if number else None
+    backend = search_backend()
+    # Celular com DDD também tem 11 dígitos: sem CPF/PIS igual, segue pelo índice de texto.
+    matched_document = by_document is not None and by_document.exists()
+    fts_ids = _fts_ids(queryset, terms) if backend == 'fts5' and not matched_document else None
+
+    if matched_document:
+        queryset = by_document
+        if ranked:
+            queryset = queryset.annotate(search_rank=Value(1.0, output_field=FloatField()))
+    elif fts_ids is not None:
+        match = _fts_match(terms)
+        if ranked:
+            # bm25() só pode ser chamado na consulta que faz o MATCH, então a
+            # tabela FTS entra no FROM (uma subconsulta correlacionada por linha
+            # refaria a busca inteira para cada funcionário).
+            queryset = queryset.extra(
+                tables=[FTS_TABLE],
+                where=[f"{FTS_TABLE}.rowid = rhcontrol_employee.id", f"{FTS_TABLE} MATCH %s"],
+                params=[match],
+            ).annotate(search_rank=RawSQL(f"-bm25({FTS_TABLE})", (), output_field=FloatField()))
+        else:
+            queryset = queryset.filter(pk__in=fts_ids)
+    else:
+        for term in terms:
+            queryset = queryset.filter(search_document__contains=term)
+        if ranked:
+            if backend == 'trigram':
+                from django.contrib.postgres.search import TrigramWordSimilarity
+                rank = TrigramWordSimilarity(Value(' '.join(terms)), 'search_document')
+            else:
+                rank = Value(0.0, output_field=FloatField())
+            queryset = queryset.annotate(search_rank=rank)
+
+    if ranked:
+        queryset = queryset.order_by(F('search_rank').desc(), 'name', 'pk')
+    return queryset
+
+
+def autocomplete_employees(query: str, limit: int = 10) -> list[dict]:
+    """Sugestões para o campo de busca: ativos primeiro, depois por relevância."""
+    from .models import Employee
+
+    if len(normalize_search_text(query)) < 2:
+        return []
+    queryset = search_employees(Employee.objects.select_related('department'), query, ranked=True)
+    queryset = queryset.annotate(
+        is_active=ExpressionWrapper(Q(termination_date__isnull=True), output_field=BooleanField()),
+    ).order_by('-is_active', F('search_rank').desc(), 'name', 'pk')
+    return [
+        {
+            'id': employee.pk,
+            'name': employee.name,
+            'cpf': employee.cpf,
+            'department': employee.department.name if employee.department_id else '',
+            'active': employee.termination_date is None,
+        }
+        for employee in queryset[:limit]
+    ]
@@ -3,81 +3,130 @@ from datetime import date, timedelta
 from tokenize import String
 from django.core import mail
 from django.utils import timezone
-from .models import Employee, EventTypes, NotificationRule, Vacation, Training, NotificationRecipient, NotificationLog, CareerPlan
-from django.db.models import Q, QuerySet
-from django.core.mail import send_mail
+from .models import Employee, EventTypes, NotificationRule, Vacation, Training, NotificationRecipient, NotificationLog, NotificationOutbox, CareerPlan, UpcomingEvent, EventCalendarState
+from django.db.models import Count, F, Max, Q, QuerySet
+from django.db.models.lookups import Exact, Range
+from django.core.mail import EmailMessage
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.db import transaction, IntegrityError
+from .db_functions import MonthDay, month_day
+from .mailer import MailDispatcher
 
-def get_events_for_notification() -> list[dict]:
+def get_events_for_notification(since: date | None = None) -> list[dict]:
     """
     Iterates through active notification rules, calculates the target date based on
     the advance notice of each rule, and returns a standardized list of events.
+    Rules that share an event type are answered by a single query (all their
+    target dates OR'ed together) and the rows are mapped back to each rule in memory.
+
+    `since` (catch-up): treats every day in [since, today] as a run day, so each
+    rule covers [since + advance, today + advance] with one range query per event
+    type. Events already notified are dropped by exclude_already_notified and the
+    NotificationLog unique key, so replaying a window is idempotent.
     """
     today = timezone.localdate()
     events_to_notify = []
+    first_day = since if since and since < today else today
 
-    active_rules = NotificationRule.objects.filter(is_active=True)
+    active_rules = list(NotificationRule.objects.filter(is_active=True))
+    run_days = [first_day + timedelta(days=offset) for offset in range((today - first_day).days + 1)]
+    targets = {rule.pk: [day + timedelta(days=rule.days_in_advance) for day in run_days] for rule in active_rules}
+    windows = {pk: (dates[0], dates[-1]) for pk, dates in targets.items()}
 
-    for rule in active_rules:
+    def windows_for(event_type):
+        return {windows[rule.pk] for rule in active_rules if rule.event_type == event_type}
 
-        target_date = today + timedelta(days=rule.days_in_advance)
-        
-        if rule.event_type == EventTypes.BIRTHDAY:
-            employees = Employee.objects.filter(
-                birth_date__month=target_date.month,
-                birth_date__day=target_date.day,
-                termination_date__isnull=True
-            )
-            for emp in employees:
-                events_to_notify.append({
-                    'event_type': rule.event_type,
-                    'rule': rule,
-                    'employee': emp,
-                    'related_object': emp,
-                    'event_date': date(target_date.year, target_date.month, target_date.day),
-                    'reference_year': target_date.year
-                })
-
-        elif rule.event_type == EventTypes.COMPANY_ANNIVERSARY:
-            employees = Employee.objects.filter(
-                hire_date__month=target_date.month,
-                hire_date__day=target_date.day,
-                termination_date__isnull=True
-            )
-            for emp in employees:
-                events_to_notify.append({
-                    'event_type': rule.event_type,
-                    'rule': rule,
-                    'employee': emp,
-                    'related_object': emp,
-                    'event_date': date(target_date.year, target_date.month, target_date.day),
-                    'reference_year': target_date.year
-                })
-
-        elif rule.event_type == EventTypes.VACATION_START:
-            vacations = Vacation.objects.filter(
-                start_date=target_date
-            ).select_related('employee')
-            
-            for vacation in vacations:
-                events_to_notify.append({
-                    'event_type': rule.event_type,
-                    'rule': rule,
-                    'employee': vacation.employee,
-                    'related_object': vacation,
-                    'event_date': vacation.start_date,
-                    'reference_year': vacation.start_date.year
-                })
-
-        elif rule.event_type == EventTypes.TRAINING_DUE:
-            # NOTE: Training model does not have a 'due_date' or per-employee FK.
-            # This handler is intentionally left as a no-op until those fields are added.
-            pass
+    employees_by_annual_date = {}
+    for event_type, field_name in ((EventTypes.BIRTHDAY, 'birth_date'), (EventTypes.COMPANY_ANNIVERSARY, 'hire_date')):
+        event_windows = windows_for(event_type)
+        if not event_windows:
+            continue
+        matches = Q()
+        for lo, hi in event_windows:
+            if lo == hi:
+                matches |= Q(Exact(MonthDay(field_name), month_day(lo)))
+            else:
+                matches |= _ue_annual_window_q(field_name, lo, hi)
+        by_month_day = {}
+        for emp in Employee.objects.filter(matches, termination_date__isnull=True).order_by('pk'):
+            value = getattr(emp, field_name)
+            by_month_day.setdefault((value.month, value.day), []).append(emp)
+        employees_by_annual_date[event_type] = by_month_day
+
+    vacations_by_start = {}
+    vacation_windows = windows_for(EventTypes.VACATION_START)
+    if vacation_windows:
+        matches = Q()
+        for lo, hi in vacation_windows:
+            matches |= Q(start_date__range=(lo, hi))
+        for vacation in Vacation.objects.filter(matches).select_related('employee').order_by('pk'):
+            vacations_by_start.setdefault(vacation.start_date, []).append(vacation)
+
+    for rule in active_rules:
+        for target_date in targets[rule.pk]:
+
+            if rule.event_type in (EventTypes.BIRTHDAY, EventTypes.COMPANY_ANNIVERSARY):
+                employees = employees_by_annual_date[rule.event_type].get((target_date.month, target_date.day), [])
+                for emp in employees:
+                    events_to_notify.append({
+                        'event_type': rule.event_type,
+                        'rule': rule,
+                        'employee': emp,
+                        'related_object': emp,
+                        'event_date': date(target_date.year, target_date.month, target_date.day),
+                        'reference_year': target_date.year
+                    })
+
+            elif rule.event_type == EventTypes.VACATION_START:
+                for vacation in vacations_by_start.get(target_date, []):
+                    events_to_notify.append({
+                        'event_type': rule.event_type,
+                        'rule': rule,
+                        'employee': vacation.employee,
+                        'related_object': vacation,
+                        'event_date': vacation.start_date,
+                        'reference_year': vacation.start_date.year
+                    })
+
+            elif rule.event_type == EventTypes.TRAINING_DUE:
+                # NOTE: Training model does not have a 'due_date' or per-employee FK.
+                # This handler is intentionally left as a no-op until those fields are added.
+                pass
 
     return events_to_notify
 
+
+def exclude_already_notified(events: list[dict]) -> list[dict]:
+    """
+    Drops the events that already have a NotificationLog (same rule, object and
+    reference year) with one lookup per content type, before any per-event work.
+    The unique constraint in send_notification_for_event still guards races.
+    """
+    keys = []
+    keys_by_ct = {}
+    for event in events:
+        ct = ContentType.objects.get_for_model(event['related_object'], for_concrete_model=True)
+        key = (event['rule'].pk, ct.pk, event['related_object'].pk, event['reference_year'])
+        keys.append(key)
+        keys_by_ct.setdefault(ct.pk, []).append(key)
+
+    sent = set()
+    for ct_id, ct_keys in keys_by_ct.items():
+        sent.update(
+            NotificationLog.objects.filter(
+                content_type_id=ct_id,
+                rule_id__in={k[0] for k in ct_keys},
+                object_id__in={k[2] for k in ct_keys},
+                reference_year__in={k[3] for k in ct_keys},
+            ).values_list('rule_id', 'content_type_id', 'object_id', 'reference_year')
+        )
+
+    pending = [event for event, key in zip(events, keys) if key not in sent]
+    if len(pending) < len(events):
+        logger.debug(f"Pré-filtro: {len(events) - len(pending)} evento(s) já notificado(s) descartado(s).")
+    return pending
+
 def get_active_recipients_queryset_for_rule(rule) -> QuerySet:
     """
     Returns the QuerySet of active recipients who should receive a specific rule.
@@ -90,16 +139,44 @@ def get_active_recipients_queryset_for_rule(rule) -> QuerySet:
     ).distinct()
 
 
-def get_recipients_for_event(event: dict) -> list[str]:
+def resolve_recipients_by_rule(rules) -> dict[int, list[str]]:
+    """
+    Resolves the recipient list of every rule at once: one query for the active
+    recipients plus one for their subscriptions. Returns {rule_id: sorted unique
+    emails}, with the same criteria as get_active_recipients_queryset_for_rule().
+    """
+    rule_ids = {rule.pk for rule in rules}
+    emails_by_rule = {rule_id: set() for rule_id in rule_ids}
+
+    recipients = NotificationRecipient.objects.filter(is_active=True).prefetch_related('subscribed_rules')
+    for recipient in recipients:
+        email = (recipient.email or '').strip().lower()
+        if not email:
+            continue
+        if recipient.receive_all_events:
+            targets = rule_ids
+        else:
+            targets = rule_ids.intersection(r.pk for r in recipient.subscribed_rules.all())
+        for rule_id in targets:
+            emails_by_rule[rule_id].add(email)
+
+    return {rule_id: sorted(emails) for rule_id, emails in emails_by_rule.items()}
+
+
+def get_recipients_for_event(event: dict, recipients_by_rule: dict[int, list[str]] | None = None) -> list[str]:
     """
     Processes the event dictionary (generated in Step 2) and returns a flat,
     unique list of emails that should receive the notification.
+    `recipients_by_rule` (see resolve_recipients_by_rule) avoids a query per event.
     """
     rule = event.get('rule')
 
     if not rule:
         return []
 
+    if recipients_by_rule is not None and rule.pk in recipients_by_rule:
+        return list(recipients_by_rule[rule.pk])
+
     recipients_qs = get_active_recipients_queryset_for_rule(rule)
 
     raw_emails = recipients_qs.values_list('email', flat=True)
@@ -110,29 +187,55 @@ def get_recipients_for_event(event: dict) -> list[str]:
 
 logger = logging.getLogger(__name__)
 
-def process_notifications(dry_run: bool = False) -> None:
+def process_notifications(dry_run: bool = False, since: date | None = None) -> dict:
     """
     Função orquestradora: Busca todos os eventos pendentes e processa individualmente.
     Resiliente: O erro de um evento não interrompe o fluxo dos demais.
+    `since`: recupera também os dias em que a rotina não rodou (ver get_events_for_notification).
+    Retorna as métricas do Hub: eventos encontrados, processados e com erro.
     """
-    events = get_events_for_notification()
+    if since:
+        logger.info(f"Modo catch-up: recuperando eventos desde {since}.")
+    collected = get_events_for_notification(since=since)
+    events = exclude_already_notified(collected)
+    stats = {'rows_scanned': len(collected), 'events_produced': 0, 'errors': 0}
     
     if not events:
         logger.info("Nenhum evento pendente para notificação hoje.")
-        return
+        return stats
+
+    # Destinatários resolvidos uma vez por regra, não por evento.
+    recipients_by_rule = resolve_recipients_by_rule({event['rule'] for event in events})
+
+    # Destinatários em modo resumo (ou regras marcadas como resumo) recebem um
+    # único e-mail com todos os eventos do dia, montado no final.
+    digest = {'emails': get_digest_recipient_emails(), 'entries': []}
 
+    # Cada evento grava log + e-mail na fila (NotificationOutbox) na mesma transação;
+    # o envio é feito pela rotina notification_outbox (drain_notification_outbox).
     for event in events:
         try:
-            send_notification_for_event(event, dry_run=dry_run)
+            send_notification_for_event(event, dry_run=dry_run, recipients_by_rule=recipients_by_rule, digest=digest)
+            stats['events_produced'] += 1
         except Exception as e:
+            stats['errors'] += 1
             event_name = event.get('rule').get_event_type_display() if event.get('rule') else 'Desconhecido'
             emp_name = event.get('employee').name if event.get('employee') else 'Desconhecido'
             logger.error(f"Falha ao processar evento [{event_name}] para [{emp_name}]: {str(e)}")
 
-def send_notification_for_event(event: dict, dry_run: bool = False) -> None:
+    if not dry_run:
+        commit_notification_digest(digest)
+    return stats
+
+def send_notification_for_event(event: dict, dry_run: bool = False, recipients_by_rule: dict[int, list[str]] | None = None,
+                                digest: dict | None = None) -> None:
     """
-    Tenta registrar o log atomicamente. Se conseguir, envia o e-mail.
-    Se falhar por concorrência (IntegrityError), aborta em silêncio (já foi enviado).
+    Registra o log e o e-mail na fila (NotificationOutbox) atomicamente; o envio
+    fica com drain_notification_outbox, fora da transação.
+    Se falhar por concorrência (IntegrityError), aborta em silêncio (já foi registrado).
+    `recipients_by_rule` vem de process_notifications (resolvido uma vez por execução).
+    Com `digest`, eventos com destinatários em modo resumo são adiados para
+    commit_notification_digest().
     """
     rule = event['rule']
     employee = event['employee']
@@ -143,7 +246,7 @@ def send_notification_for_event(event: dict, dry_run: bool = False) -> None:
     event_date = event['event_date']
     reference_year = event['reference_year']
 
-    recipients_list = get_recipients_for_event(event)
+    recipients_list = get_recipients_for_event(event, recipients_by_rule)
     
     if not recipients_list:
         logger.info(f"Ignorado: Sem destinatários ativos para a regra [{rule.get_event_type_display()}].")
@@ -167,6 +270,11 @@ def send_notification_for_event(event: dict, dry_run: bool = False) -> None:
         f"Por favor, tome as providências necessárias."
     )
 
+    digest_recipients = []
+    if digest is not None:
+        digest_recipients = list(snapshot_ordenado) if rule.send_as_digest else [e for e in snapshot_ordenado if e in digest['emails']]
+    immediate_recipients = [e for e in snapshot_ordenado if e not in digest_recipients]
+
     if dry_run:
         already_sent = NotificationLog.objects.filter(
             rule=rule,
@@ -178,28 +286,45 @@ def send_notification_for_event(event: dict, dry_run: bool = False) -> None:
         if already_sent:
             logger.debug(f"[DRY-RUN] Já enviado anteriormente para [{employee.name}] - Ano {reference_year}, ignorado.")
         else:
-            logger.info(f"[DRY-RUN] Simulação: Enviaria [{event_name_display}] para {len(snapshot_ordenado)} e-mail(s): {snapshot_ordenado}")
+            if immediate_recipients:
+                logger.info(f"[DRY-RUN] Simulação: Enviaria [{event_name_display}] para {len(immediate_recipients)} e-mail(s): {immediate_recipients}")
+            if digest_recipients:
+                logger.info(f"[DRY-RUN] Simulação: Incluiria [{event_name_display}] no resumo diário de {len(digest_recipients)} e-mail(s): {digest_recipients}")
         
         return
 
+    log_fields = {
+        'rule': rule,
+        'employee': employee,
+        'content_type': content_type,
+        'object_id': object_id,
+        'reference_year': reference_year,
+        'recipients_snapshot': snapshot_ordenado,
+    }
+
+    if digest_recipients:
+        digest['entries'].append({
+            'log_fields': log_fields,
+            'subject': subject,
+            'body': body,
+            'immediate': immediate_recipients,
+            'digest': digest_recipients,
+            'event_name': event_name_display,
+            'employee_name': employee.name,
+            'event_date': event_date,
+        })
+        return
+
     try:
         with transaction.atomic():
-            NotificationLog.objects.create(
-                rule=rule,
-                employee=employee,
-                content_type=content_type,
-                object_id=object_id,
-                reference_year=reference_year,
-                recipients_snapshot=snapshot_ordenado
-            )
-            
-            send_mail(
+            log = NotificationLog.objects.create(**log_fields)
+            outbox = NotificationOutbox.objects.create(
                 subject=subject,
-                message=body,
+                body=body,
                 from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=snapshot_ordenado,
-                fail_silently=False, 
+                recipients=snapshot_ordenado,
             )
+            outbox.logs.add(log)
             
     except IntegrityError:
         logger.debug(f"Idempotência: Outro processo já enviou/está enviando [{event_name_display}] para [{employee.name}] - Ano {reference_year}.")
@@ -208,20 +333,194 @@ def send_notification_for_event(event: dict, dry_run: bool = False) -> None:
     except Exception:
         raise
 
-    logger.info(f"Sucesso: Notificação de [{event_name_display}] enviada e registrada para {len(snapshot_ordenado)} e-mail(s) sobre [{employee.name}].")
+    logger.info(f"Sucesso: Notificação de [{event_name_display}] registrada na fila de envio para {len(snapshot_ordenado)} e-mail(s) sobre [{employee.name}].")
 
 
-def notify_career_plan_event(plan: CareerPlan, event_type: str, dry_run: bool = False) -> None:
+# ── Resumo diário (digest) ──────────────────────────────────────
+
+def get_digest_recipient_emails() -> set[str]:
+    return {
+        email.strip().lower()
+        for email in NotificationRecipient.objects.filter(is_active=True, digest_mode=True).values_list('email', flat=True)
+        if email
+    }
+
+
+def render_notification_digest(entries: list[dict], today: date) -> tuple[str, str]:
+    """Assunto e corpo do resumo diário: eventos agrupados por tipo, em ordem de data."""
+    by_type: dict[str, list[dict]] = {}
+    for entry in sorted(entries, key=lambda e: (e['event_date'], e['employee_name'])):
+        by_type.setdefault(entry['event_name'], []).append(entry)
+
+    subject = f"Resumo RH: {len(entries)} aviso(s) - {today.strftime('%d/%m/%Y')}"
+    lines = [
+        "Olá,",
+        "",
+        f"Este é o resumo diário dos avisos do sistema de RH ({today.strftime('%d/%m/%Y')}).",
+        "",
+    ]
+    for event_name, items in by_type.items():
+        lines.append(f"{event_name} ({len(items)})")
+        lines.extend(f"  - {item['event_date'].strftime('%d/%m/%Y')}: {item['employee_name']}" for item in items)
+        lines.append("")
+    lines.append("Por favor, tome as providências necessárias.")
+    return subject, "\n".join(lines)
+
+
+def commit_notification_digest(digest: dict, today: date | None = None) -> int:
     """
-    Constrói o dicionário padrão de evento e dispara o e-mail usando a infraestrutura existente.
-    Fail-safe: Se a regra não existir, apenas loga e aborta.
+    Grava, em uma única transação, um NotificationLog por evento adiado (mesma
+    idempotência do envio avulso), o e-mail avulso dos destinatários que não
+    estão em modo resumo e um e-mail de resumo por destinatário.
+    Retorna quantos resumos foram colocados na fila.
     """
-    rule = NotificationRule.objects.filter(event_type=event_type, is_active=True).first()
-    
-    if not rule:
-        logger.warning(f"Sem regra ativa configurada para [{event_type}]. E-mail não enviado para {plan.employee.name}.")
-        return
-    
+    entries = digest['entries']
+    if not entries:
+        return 0
+
+    today = today or timezone.localdate()
+    Through = NotificationOutbox.logs.through
+    per_recipient: dict[str, list[tuple[dict, NotificationLog]]] = {}
+
+    with transaction.atomic():
+        for entry in entries:
+            try:
+                with transaction.atomic():
+                    log = NotificationLog.objects.create(**entry['log_fields'])
+            except IntegrityError:
+                logger.debug(f"Idempotência: [{entry['event_name']}] de [{entry['employee_name']}] já registrado, fora do resumo.")
+                continue
+
+            if entry['immediate']:
+                outbox = NotificationOutbox.objects.create(
+                    subject=entry['subject'], body=entry['body'],
+                    from_email=settings.DEFAULT_FROM_EMAIL, recipients=entry['immediate'],
+                )
+                outbox.logs.add(log)
+            for email in entry['digest']:
+                per_recipient.setdefault(email, []).append((entry, log))
+
+        for email, items in per_recipient.items():
+            subject, body = render_notification_digest([entry for entry, _ in items], today)
+            outbox = NotificationOutbox.objects.create(
+                subject=subject, body=body, from_email=settings.DEFAULT_FROM_EMAIL, recipients=[email],
+            )
+            Through.objects.bulk_create([Through(notificationoutbox_id=outbox.pk, notificationlog_id=log.pk) for _, log in items])
+
+    logger.info(f"Resumo diário: {len(per_recipient)} e-mail(s) na fila cobrindo {len(entries)} evento(s).")
+    digest['entries'] = []
+    return len(per_recipient)
+
+
+# ── Fila de e-mails (NotificationOutbox) ────────────────────────
+
+def _outbox_backoff(attempts: int) -> timedelta:
+    base = getattr(settings, 'NOTIFICATION_OUTBOX_BACKOFF', 60)
+    cap = getattr(settings, 'NOTIFICATION_OUTBOX_BACKOFF_MAX', 6 * 3600)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), cap))
+
+
+def claim_outbox_messages(limit: int) -> list[NotificationOutbox]:
+    """
+    Reserva até `limit` e-mails vencidos (ou presos em SENDING além do lease)
+    para este worker; mesmo esquema de claim_pdf_jobs.
+    """
+    now = timezone.now()
+    lease = timedelta(seconds=getattr(settings, 'NOTIFICATION_OUTBOX_LEASE', 600))
+    Status = NotificationOutbox.OutboxStatus
+    claimable = Q(status=Status.PENDING, next_attempt_at__lte=now) | Q(status=Status.SENDING, next_attempt_at__lt=now)
+
+    with transaction.atomic():
+        ids = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(claimable)
+            .order_by('next_attempt_at', 'pk')
+            .values_list('pk', flat=True)[:limit]
+        )
+        claimed = NotificationOutbox.objects.filter(claimable, pk__in=ids).update(
+            status=Status.SENDING, next_attempt_at=now + lease, attempts=F('attempts') + 1,
+        )
+    if not claimed:
+        return []
+    return list(NotificationOutbox.objects.filter(pk__in=ids, status=Status.SENDING).order_by('pk'))
+
+
+def _send_outbox_chunk(messages: list[NotificationOutbox]) -> list:
+    # Só I/O de e-mail: roda em thread, sem tocar no banco.
+    with MailDispatcher() as dispatcher:
+        for item in messages:
+            dispatcher.add(
+                EmailMessage(subject=item.subject, body=item.body, from_email=item.from_email, to=item.recipients),
+                key=item.pk,
+            )
+    return dispatcher.outcomes
+
+
+def drain_notification_outbox(dry_run: bool = False) -> dict:
+    """
+    Envia os e-mails pendentes da fila. Os lotes são divididos entre
+    NOTIFICATION_OUTBOX_WORKERS threads (uma conexão SMTP cada). Falhas voltam
+    para a fila com backoff exponencial; após NOTIFICATION_OUTBOX_MAX_ATTEMPTS
+    tentativas a mensagem vai para DEAD. Roda via Hub (run_automations).
+    Retorna sent/retry/dead mais as métricas padrão do Hub (rows_scanned,
+    emails_sent, errors).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    Status = NotificationOutbox.OutboxStatus
+    stats = {'sent': 0, 'retry': 0, 'dead': 0}
+    scanned = 0
+
+    if dry_run:
+        due = NotificationOutbox.objects.filter(status=Status.PENDING, next_attempt_at__lte=timezone.now()).count()
+        logger.info(f"[DRY-RUN] Simulação: Enviaria {due} e-mail(s) da fila de notificações.")
+        return {**stats, 'rows_scanned': due, 'emails_sent': 0, 'errors': 0}
+
+    workers = max(getattr(settings, 'NOTIFICATION_OUTBOX_WORKERS', 4), 1)
+    batch_size = getattr(settings, 'NOTIFICATION_OUTBOX_BATCH', 100)
+    max_attempts = getattr(settings, 'NOTIFICATION_OUTBOX_MAX_ATTEMPTS', 5)
+
+    while True:
+        claimed = claim_outbox_messages(limit=batch_size)
+        if not claimed:
+            break
+        scanned += len(claimed)
+
+        chunks = [claimed[i::workers] for i in range(workers) if claimed[i::workers]]
+        if len(chunks) == 1:
+            outcomes = _send_outbox_chunk(chunks[0])
+        else:
+            with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+                outcomes = [o for chunk in pool.map(_send_outbox_chunk, chunks) for o in chunk]
+
+        by_pk = {item.pk: item for item in claimed}
+        now = timezone.now()
+        sent_ids = [o.key for o in outcomes if o.sent]
+        NotificationOutbox.objects.filter(pk__in=sent_ids).update(status=Status.SENT, sent_at=now, last_error='')
+        stats['sent'] += len(sent_ids)
+
+        for outcome in outcomes:
+            if outcome.sent:
+                continue
+            item = by_pk[outcome.key]
+            error = outcome.error or 'Mensagem não enviada'
+            if item.attempts >= max_attempts:
+                NotificationOutbox.objects.filter(pk=item.pk).update(status=Status.DEAD, last_error=error)
+                stats['dead'] += 1
+                logger.error(f"Fila de e-mails: desistindo do #{item.pk} após {item.attempts} tentativa(s): {error}")
+            else:
+                NotificationOutbox.objects.filter(pk=item.pk).update(
+                    status=Status.PENDING, last_error=error, next_attempt_at=now + _outbox_backoff(item.attempts),
+                )
+                stats['retry'] += 1
+                logger.warning(f"Fila de e-mails: falha no #{item.pk} (tentativa {item.attempts}), nova tentativa agendada: {error}")
+
+    logger.info(f"Fila de e-mails: {stats['sent']} enviado(s), {stats['retry']} reagendado(s), {stats['dead']} descartado(s).")
+    return {**stats, 'rows_scanned': scanned, 'emails_sent': stats['sent'], 'errors': stats['retry'] + stats['dead']}
+
+
+def _career_plan_event(plan: CareerPlan, event_type: str, rule: NotificationRule) -> dict:
+    """Dicionário padrão de evento (com assunto/corpo próprios) para um plano de carreira."""
     subject = f"Aviso RH: {rule.get_event_type_display()} - {plan.employee.name}"
     body = (
         f"Olá,\n\n"
@@ -236,7 +535,7 @@ def notify_career_plan_event(plan: CareerPlan, event_type: str, dry_run: bool =
         
     body += "\nPor favor, acesse o sistema para mais detalhes."
 
-    event_dict = {
+    return {
         'event_type': event_type,
         'rule': rule,
         'employee': plan.employee,
@@ -247,128 +546,281 @@ def notify_career_plan_event(plan: CareerPlan, event_type: str, dry_run: bool =
         'custom_body': body,
     }
 
-    send_notification_for_event(event_dict, dry_run=dry_run)
 
+def notify_career_plan_event(plan: CareerPlan, event_type: str, dry_run: bool = False) -> None:
+    """
+    Constrói o dicionário padrão de evento e dispara o e-mail usando a infraestrutura existente.
+    Fail-safe: Se a regra não existir, apenas loga e aborta.
+    """
+    rule = NotificationRule.objects.filter(event_type=event_type, is_active=True).first()
+    
+    if not rule:
+        logger.warning(f"Sem regra ativa configurada para [{event_type}]. E-mail não enviado para {plan.employee.name}.")
+        return
 
-def process_career_plans(dry_run: bool = False) -> None:
+    send_notification_for_event(_career_plan_event(plan, event_type, rule), dry_run=dry_run)
+
+
+def queue_career_plan_notifications(transitions: list[dict]) -> None:
     """
-    Motor diário de transições de status do Plano de Carreira.
-    Roda via Hub (run_automations).
+    Enfileira as notificações de um lote de transições: regras e destinatários
+    são resolvidos uma vez para o lote, não por plano.
     """
-    from rhcontrol.models import EmployeeHistory  # Importação local para garantir acesso ao histórico
+    event_types = {t['event_type'] for t in transitions}
+    rules = {}
+    for rule in NotificationRule.objects.filter(event_type__in=event_types, is_active=True).order_by('pk'):
+        rules.setdefault(rule.event_type, rule)
+    recipients_by_rule = resolve_recipients_by_rule(rules.values())
+
+    for transition in transitions:
+        plan = transition['plan']
+        rule = rules.get(transition['event_type'])
+        if not rule:
+            logger.warning(f"Sem regra ativa configurada para [{transition['event_type']}]. E-mail não enviado para {plan.employee.name}.")
+            continue
+        try:
+            send_notification_for_event(_career_plan_event(plan, transition['event_type'], rule), recipients_by_rule=recipients_by_rule)
+        except Exception as e:
+            logger.error(f"Falha ao enfileirar aviso do plano {plan.pk} [{plan.employee.name}]: {str(e)}")
 
-    today = timezone.localdate()
-    if dry_run:
-        logger.info(f"=== [DRY-RUN] Iniciando simulação de Planos de Carreira para {today} ===")
-    else:
-        logger.info(f"=== Iniciando processamento de Planos de Carreira para {today} ===")
 
-    plans_to_cancel_dismissed = CareerPlan.objects.filter(
-        status__in=[CareerPlan.PlanStatus.SCHEDULED, CareerPlan.PlanStatus.AWAITING_CONFIRMATION, CareerPlan.PlanStatus.CONFIRMED],
-        employee__termination_date__isnull=False,
-        employee__termination_date__lte=today
-    )
-    for plan in plans_to_cancel_dismissed:
-        if dry_run:
-            logger.info(f"[DRY-RUN] Cancelaria plano de [{plan.employee.name}] (Motivo: Funcionário desligado).")
-        else:
-            plan.status = CareerPlan.PlanStatus.CANCELLED
-            plan.cancellation_reason = 'Funcionário desligado'
-            plan.save(update_fields=['status', 'cancellation_reason', 'updated_at'])
-            notify_career_plan_event(plan, EventTypes.CAREER_PLAN_CANCELLED)
-
-    scheduled_plans = CareerPlan.objects.filter(status=CareerPlan.PlanStatus.SCHEDULED)
-    for plan in scheduled_plans:
-        window_start = plan.promotion_date - timedelta(days=30)
-
-        if today >= plan.promotion_date:
-            if dry_run:
-                logger.info(f"[DRY-RUN] Cancelaria plano de [{plan.employee.name}] (Motivo: Janela perdida/cron inativo).")
-            else:
-                plan.status = CareerPlan.PlanStatus.CANCELLED
-                plan.cancellation_reason = 'Janela perdida/cron inativo'
-                plan.save(update_fields=['status', 'cancellation_reason', 'updated_at'])
-                notify_career_plan_event(plan, EventTypes.CAREER_PLAN_CANCELLED)
-
-        elif today >= window_start and plan.reminder_sent_at is None:
-            if dry_run:
-                logger.info(f"[DRY-RUN] Mudaria status de [{plan.employee.name}] para AWAITING_CONFIRMATION e enviaria aviso.")
-            else:
-                plan.status = CareerPlan.PlanStatus.AWAITING_CONFIRMATION
-                plan.reminder_sent_at = timezone.now()
-                plan.save(update_fields=['status', 'reminder_sent_at', 'updated_at'])
-                notify_career_plan_event(plan, EventTypes.CAREER_PLAN_REMINDER)
-
-    expired_plans = CareerPlan.objects.filter(
-        status=CareerPlan.PlanStatus.AWAITING_CONFIRMATION,
-        promotion_date__lte=today
-    )
-    for plan in expired_plans:
-        if dry_run:
-            logger.info(f"[DRY-RUN] Cancelaria plano de [{plan.employee.name}] (Motivo: Prazo expirado sem confirmação do RH).")
-        else:
-            plan.status = CareerPlan.PlanStatus.CANCELLED
-            plan.cancellation_reason = 'Prazo de confirmação expirado'
-            plan.save(update_fields=['status', 'cancellation_reason', 'updated_at'])
-            notify_career_plan_event(plan, EventTypes.CAREER_PLAN_CANCELLED)
-
-    dia_d_plans = CareerPlan.objects.filter(
-        status=CareerPlan.PlanStatus.CONFIRMED,
-        promotion_date__lte=today,
-        effective_applied_at__isnull=True
-    )
-    for plan in dia_d_plans:
+# ── Plano de Carreira: motor de transições ──────────────────────
+# As transições do dia são calculadas em memória (plan_career_plan_transitions)
+# e gravadas com um UPDATE por grupo (status + motivo); dry-run usa o mesmo plano.
+
+def _career_plan_late_grace(plan: CareerPlan, today: date) -> bool:
+    """Aviso enviado no dia da promoção ou depois (catch-up) ainda dentro do prazo de confirmação."""
+    if plan.reminder_sent_at is None:
+        return False
+    reminded_on = timezone.localdate(plan.reminder_sent_at)
+    late_grace = getattr(settings, 'CAREER_PLAN_LATE_CONFIRMATION_DAYS', 3)
+    return reminded_on >= plan.promotion_date and reminded_on > today - timedelta(days=late_grace)
+
+
+def plan_career_plan_transitions(today: date, since: date | None = None, shard: tuple[int, int] | None = None) -> list[dict]:
+    """
+    Calcula, sem gravar nada, as transições de status do dia, na mesma prioridade
+    do motor diário: desligamento, janela de aviso (ou perdida), confirmação
+    expirada e Dia D. Cada plano aparece no máximo uma vez.
+
+    `since` (catch-up): planos cuja janela de aviso abriu enquanto o cron estava
+    parado (promotion_date - 30 >= since) recebem o aviso atrasado em vez de serem
+    cancelados por janela perdida, e ganham CAREER_PLAN_LATE_CONFIRMATION_DAYS
+    para o RH confirmar antes de expirar.
+
+    `shard` = (índice, total): só os planos de funcionários com
+    employee_id % total == índice (um worker por fatia no run_automations).
+    """
+    Status = CareerPlan.PlanStatus
+    plans = CareerPlan.objects.filter(
+        Q(status__in=[Status.SCHEDULED, Status.AWAITING_CONFIRMATION])
+        | Q(status=Status.CONFIRMED, promotion_date__lte=today, effective_applied_at__isnull=True)
+        | Q(status=Status.CONFIRMED, employee__termination_date__lte=today)
+    ).select_related('employee__job_title', 'employee__department', 'proposed_job__department').order_by('pk')
+    if shard is not None:
+        index, total = shard
+        plans = plans.annotate(shard_key=F('employee_id') % total).filter(shard_key=index)
+
+    transitions = []
+
+    def add(plan, status, event_type, reason=''):
+        transitions.append({'plan': plan, 'from_status': plan.status, 'status': status, 'event_type': event_type, 'reason': reason})
+
+    for plan in plans:
         employee = plan.employee
+        if employee.termination_date and employee.termination_date <= today:
+            add(plan, Status.CANCELLED, EventTypes.CAREER_PLAN_CANCELLED, 'Funcionário desligado')
+
+        elif plan.status == Status.SCHEDULED:
+            window_start = plan.promotion_date - timedelta(days=30)
+            missed_during_outage = since is not None and window_start >= since
+
+            if today >= plan.promotion_date and not missed_during_outage:
+                add(plan, Status.CANCELLED, EventTypes.CAREER_PLAN_CANCELLED, 'Janela perdida/cron inativo')
+            elif today >= window_start and plan.reminder_sent_at is None:
+                add(plan, Status.AWAITING_CONFIRMATION, EventTypes.CAREER_PLAN_REMINDER)
+
+        elif plan.status == Status.AWAITING_CONFIRMATION:
+            if plan.promotion_date <= today and not _career_plan_late_grace(plan, today):
+                add(plan, Status.CANCELLED, EventTypes.CAREER_PLAN_CANCELLED, 'Prazo de confirmação expirado')
+
+        elif plan.proposed_job.department_id != employee.department_id:
+            add(plan, Status.CANCELLED, EventTypes.CAREER_PLAN_CANCELLED, 'Conflito: Setor alterado manualmente antes da promoção')
 
-        if plan.proposed_job.department != employee.department:
-            if dry_run:
-                logger.info(f"[DRY-RUN] Cancelaria plano de [{employee.name}] (Conflito: Setor alterado manualmente).")
-            else:
-                plan.status = CareerPlan.PlanStatus.CANCELLED
-                plan.cancellation_reason = 'Conflito: Setor alterado manualmente antes da promoção'
-                plan.save(update_fields=['status', 'cancellation_reason', 'updated_at'])
-                notify_career_plan_event(plan, EventTypes.CAREER_PLAN_CANCELLED)
-            continue
-            
-        if dry_run:
-            logger.info(f"[DRY-RUN] Efetivaria promoção de [{employee.name}] para o cargo [{plan.proposed_job.name}]. Salvaria histórico.")
         else:
-            try:
-                # 1. Guarda os valores antigos antes de atualizar o funcionário
-                old_job_title = str(employee.job_title) if employee.job_title else None
-                old_salary = employee.current_salary
+            add(plan, Status.EFFECTIVE, EventTypes.CAREER_PLAN_EFFECTIVE)
+
+    return transitions
 
-                with transaction.atomic():
-                    # 2. Atualiza os dados do funcionário
-                    employee.job_title = plan.proposed_job
-                    employee.department = plan.proposed_job.department
-                    employee.current_salary = plan.proposed_salary
-                    # Correção bônus: Adicionado 'department' no update_fields para não dar erro
-                    employee.save(update_fields=['job_title', 'department', 'current_salary']) 
-                    
-                    # 3. Atualiza os dados do plano
-                    plan.status = CareerPlan.PlanStatus.EFFECTIVE
-                    plan.effective_applied_at = timezone.now()
-                    plan.save(update_fields=['status', 'effective_applied_at', 'updated_at'])
-
-                    # 4. REGISTRA O HISTÓRICO PARA APARECER NO PAINEL DO FUNCIONÁRIO
-                    EmployeeHistory.objects.create(
-                        employee=employee,
-                        date_changed=today,
-                        old_job_title=old_job_title,
-                        new_job_title=str(plan.proposed_job),
-                        old_salary=old_salary,
-                        new_salary=plan.proposed_salary,
-                        reason="Plano de Carreira"
-                    )
-
-                notify_career_plan_event(plan, EventTypes.CAREER_PLAN_EFFECTIVE)
-                logger.info(f"Promoção de [{employee.name}] efetivada com sucesso e histórico registrado.")
-            except Exception as e:
-                logger.error(f"Falha crítica ao efetivar promoção do plano {plan.id}: {str(e)}")
+
+def _describe_career_plan_transition(transition: dict) -> str:
+    plan = transition['plan']
+    from_label = CareerPlan.PlanStatus(transition['from_status']).label
+    line = f"Plano {plan.pk} de [{plan.employee.name}]: {from_label} -> {CareerPlan.PlanStatus(transition['status']).label}"
+    if transition['status'] == CareerPlan.PlanStatus.EFFECTIVE:
+        line += f" (novo cargo: {plan.proposed_job.name})"
+    if transition['reason']:
+        line += f" (Motivo: {transition['reason']})"
+    return line
+
+
+def apply_career_plan_transitions(transitions: list[dict], today: date) -> list[dict]:
+    """
+    Grava as transições com um UPDATE por (status, motivo), promove os funcionários
+    com bulk_update e cria o histórico com bulk_create, tudo numa transação.
+    Cada UPDATE confere o status de origem e pula linhas travadas (skip_locked):
+    um plano alterado ou em uso por outro worker entre o cálculo e a gravação
+    fica de fora. Retorna as transições aplicadas.
+    """
+    from rhcontrol.models import EmployeeHistory
+    from rhcontrol.cache import dashboard_cache
+    from rhcontrol.pdf import invalidate_pdf_cache
+
+    Status = CareerPlan.PlanStatus
+    now = timezone.now()
+    groups = {}
+    for transition in transitions:
+        groups.setdefault((transition['status'], transition['reason']), []).append(transition)
+
+    applied = []
+    with transaction.atomic():
+        for (status, reason), group in groups.items():
+            by_pk = {t['plan'].pk: t for t in group}
+            fields = {'status': status, 'updated_at': now}
+            if status == Status.CANCELLED:
+                fields['cancellation_reason'] = reason
+            elif status == Status.AWAITING_CONFIRMATION:
+                fields['reminder_sent_at'] = now
+            elif status == Status.EFFECTIVE:
+                fields['effective_applied_at'] = now
+
+            pks_by_from_status = {}
+            for transition in group:
+                pks_by_from_status.setdefault(transition['from_status'], []).append(transition['plan'].pk)
+            from_status = Q()
+            for previous, pks in pks_by_from_status.items():
+                from_status |= Q(status=previous, pk__in=pks)
+            locked = list(CareerPlan.objects.select_for_update(skip_locked=True).filter(from_status).values_list('pk', flat=True))
+            CareerPlan.objects.filter(pk__in=locked).update(**fields)
+
+            for pk in locked:
+                transition = by_pk[pk]
+                for field, value in fields.items():
+                    setattr(transition['plan'], field, value)
+                applied.append(transition)
+
+        promotions = [t['plan'] for t in applied if t['status'] == Status.EFFECTIVE]
+        if promotions:
+            history = []
+            for plan in promotions:
+                employee = plan.employee
+                history.append(EmployeeHistory(
+                    employee=employee,
+                    date_changed=today,
+                    old_job_title=str(employee.job_title) if employee.job_title_id else None,
+                    new_job_title=str(plan.proposed_job),
+                    old_salary=employee.current_salary,
+                    new_salary=plan.proposed_salary,
+                    reason="Plano de Carreira",
+                ))
+                employee.job_title = plan.proposed_job
+                employee.department = plan.proposed_job.department
+                employee.current_salary = plan.proposed_salary
+                employee.search_document = employee.build_search_document()
+            Employee.objects.bulk_update(
+                [plan.employee for plan in promotions],
+                ['job_title', 'department', 'current_salary', 'search_document'],
+            )
+            EmployeeHistory.objects.bulk_create(history)
+
+        if applied:
+            # .update()/bulk_update/bulk_create não disparam os signals de cache e calendário.
+            categories = _UE_CAREER_PLAN_CATEGORIES | (_UE_EMPLOYEE_CATEGORIES if promotions else frozenset())
+            refresh_event_calendar(categories, employee_ids=sorted({t['plan'].employee_id for t in applied}))
+            transaction.on_commit(dashboard_cache.invalidate)
+            transaction.on_commit(invalidate_pdf_cache)
+
+    return applied
+
+
+def process_career_plans(dry_run: bool = False, since: date | None = None, shard: tuple[int, int] | None = None) -> dict:
+    """
+    Motor diário de transições de status do Plano de Carreira.
+    Roda via Hub (run_automations). As transições são calculadas em lote
+    (plan_career_plan_transitions), gravadas com UPDATEs em massa e as
+    notificações enfileiradas de uma vez; dry-run emite o mesmo relatório.
+    `shard`: fatia de planos deste worker (ver plan_career_plan_transitions).
+    Retorna as métricas do Hub e a contagem de transições por status de destino.
+    """
+    today = timezone.localdate()
+    prefix = "[DRY-RUN] " if dry_run else ""
+    logger.info(f"=== {prefix}Iniciando processamento de Planos de Carreira para {today} ===")
+
+    transitions = plan_career_plan_transitions(today, since=since, shard=shard)
+    if not dry_run:
+        transitions = apply_career_plan_transitions(transitions, today)
+        queue_career_plan_notifications(transitions)
+
+    summary = {}
+    for transition in transitions:
+        logger.info(f"{prefix}{_describe_career_plan_transition(transition)}")
+        summary[transition['status']] = summary.get(transition['status'], 0) + 1
+
+    logger.info(f"=== {prefix}Planos de Carreira: {len(transitions)} transição(ões) ===")
+    return {'events_produced': len(transitions), 'transitions': summary}
+
+
+CIPA_STABILITY_DAYS = 365
+
+
+def expire_cipa_mandates(dry_run: bool = False, today: date | None = None) -> int:
+    """
+    Encerra os mandatos de CIPA cuja estabilidade (mandato + 1 ano) já acabou,
+    com um único UPDATE e o histórico em bulk_create. Mesma regra de
+    Employee.check_cipa_expiration(). Roda via Hub (run_automations).
+    Retorna quantos funcionários foram (ou seriam, em dry-run) atualizados.
+    """
+    from rhcontrol.models import EmployeeHistory
+    from rhcontrol.pdf import invalidate_pdf_cache
+
+    today = today or timezone.localdate()
+    expired = Employee.objects.filter(
+        is_cipa_member=True,
+        cipa_mandate_end_date__lt=today - timedelta(days=CIPA_STABILITY_DAYS),
+    )
 
     if dry_run:
-        logger.info("=== [DRY-RUN] Finalizado ===")
+        count = expired.count()
+        logger.info(f"[DRY-RUN] Simulação: Encerraria {count} mandato(s) de CIPA expirado(s).")
+        return count
+
+    with transaction.atomic():
+        rows = list(expired.select_for_update().values_list('pk', 'cipa_role'))
+        if not rows:
+            logger.info("CIPA: nenhum mandato expirado.")
+            return 0
+
+        Employee.objects.filter(pk__in=[pk for pk, _ in rows]).update(
+            is_cipa_member=False,
+            cipa_role=None,
+            cipa_mandate_start_date=None,
+            cipa_mandate_end_date=None,
+        )
+        EmployeeHistory.objects.bulk_create([
+            EmployeeHistory(
+                employee_id=pk,
+                date_changed=today,
+                old_cipa_role=cipa_role,
+                new_cipa_role=None,
+                reason="Fim de CIPA",
+            )
+            for pk, cipa_role in rows
+        ])
+        # .update()/bulk_create não disparam os signals de cache.
+        transaction.on_commit(invalidate_pdf_cache)
+
+    logger.info(f"CIPA: {len(rows)} mandato(s) expirado(s) encerrado(s).")
+    return len(rows)
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -396,6 +848,8 @@ _UE_MAX_RANGE    = 180
 _UE_DEFAULT_DAYS = 30
 _UE_MAX_LIMIT    = 500
 _UE_REMINDER_DAYS = 30   # days before promotion_date to generate CAREER_PLAN_REMINDER_WINDOW
+_UE_CONTRACT_END_WARNING_DAYS = 15   # CONTRACT_END_WARNING shows up this many days before contract_end_date
+_UE_TRIAL_WARNING_DAYS = 5           # TRIAL_*_WARNING shows up this many days before the trial ends
 
 _UE_ACTIVE_CAREER_STATUSES = {
     CareerPlan.PlanStatus.SCHEDULED,
@@ -492,15 +946,48 @@ def _ue_next_annual(ref: date, start: date, end: date) -> _Optional[date]:
     return None
 
 
+def _ue_annual_window_q(field: str, start: date, end: date) -> Q:
+    """
+    Build a Q matching rows whose recurring annual `field` (month/day) has an
+    occurrence inside [start, end], so the month/day test runs in the database.
+
+    Mirrors _ue_next_annual(): ranges that cross New Year are split per year,
+    and Feb-29 dates match Feb-28 in non-leap years.
+    """
+    if end < start:
+        return Q(pk__in=[])
+    if (end - start).days >= 365:
+        return Q(**{f"{field}__isnull": False})
+
+    # One MonthDay (MMDD) range per calendar year, answered by the partial
+    # functional indexes in Employee.Meta.indexes.
+    month_day_expr = MonthDay(field)
+    q = Q(pk__in=[])
+    for year in range(start.year, end.year + 1):
+        seg_start = max(start, date(year, 1, 1))
+        seg_end   = min(end, date(year, 12, 31))
+        if seg_start > seg_end:
+            continue
+        q |= Q(Range(month_day_expr, (month_day(seg_start), month_day(seg_end))))
+
+        feb_28 = date(year, 2, 28)
+        if not _calendar.isleap(year) and seg_start <= feb_28 <= seg_end:
+            q |= Q(Exact(month_day_expr, 229))
+    return q
+
+
 # ── Event generators ────────────────────────────────────────────
 
 def _ue_generate_birthday(start: date, end: date, filters: dict) -> list[dict]:
     events: list[dict] = []
     qs = Employee.objects.select_related("department").filter(
-        termination_date__isnull=True, birth_date__isnull=False
+        _ue_annual_window_q("birth_date", start, end),
+        termination_date__isnull=True, birth_date__isnull=False,
     )
     if filters.get("employee_id"):
         qs = qs.filter(pk=filters["employee_id"])
+    if filters.get("employee_ids"):
+        qs = qs.filter(pk__in=filters["employee_ids"])
     if filters.get("department_id"):
         qs = qs.filter(department_id=filters["department_id"])
 
@@ -524,10 +1011,13 @@ def _ue_generate_birthday(start: date, end: date, filters: dict) -> list[dict]:
 def _ue_generate_company_anniversary(start: date, end: date, filters: dict) -> list[dict]:
     events: list[dict] = []
     qs = Employee.objects.select_related("department").filter(
-        termination_date__isnull=True, hire_date__isnull=False
+        _ue_annual_window_q("hire_date", start, end),
+        termination_date__isnull=True, hire_date__isnull=False,
     )
     if filters.get("employee_id"):
         qs = qs.filter(pk=filters["employee_id"])
+    if filters.get("employee_ids"):
+        qs = qs.filter(pk__in=filters["employee_ids"])
     if filters.get("department_id"):
         qs = qs.filter(department_id=filters["department_id"])
 
@@ -561,6 +1051,8 @@ def _ue_generate_vacations(start: date, end: date, filters: dict) -> list[dict]:
 
     if filters.get("employee_id"):
         qs = qs.filter(employee_id=filters["employee_id"])
+    if filters.get("employee_ids"):
+        qs = qs.filter(employee_id__in=filters["employee_ids"])
     if filters.get("department_id"):
         qs = qs.filter(employee__department_id=filters["department_id"])
 
@@ -636,15 +1128,19 @@ def _ue_generate_career_plans(start: date, end: date, filters: dict) -> list[dic
         )
     )
 
-    for qs, extra_filter in ((promo_qs, True), (reminder_qs, True)):
+    # Flag explícita: depois de .filter() o queryset é outro objeto, então
+    # "qs is promo_qs" não serve para distinguir os dois laços.
+    for is_promotion, qs in ((True, promo_qs), (False, reminder_qs)):
         if filters.get("employee_id"):
             qs = qs.filter(employee_id=filters["employee_id"])
+        if filters.get("employee_ids"):
+            qs = qs.filter(employee_id__in=filters["employee_ids"])
         if filters.get("department_id"):
             qs = qs.filter(employee__department_id=filters["department_id"])
         if filters.get("status"):
             qs = qs.filter(status=filters["status"])
 
-        if qs is promo_qs:
+        if is_promotion:
             for plan in qs:
                 emp  = plan.employee
                 dept = emp.department.name if emp.department_id else None
@@ -677,9 +1173,8 @@ def _ue_generate_career_plans(start: date, end: date, filters: dict) -> list[dic
     return events
 
 def _ue_generate_contract_end(start: date, end: date, filters: dict) -> list[dict]:
-    from datetime import timedelta
     events: list[dict] = []
-    WARNING_OFFSET = 15 
+    WARNING_OFFSET = _UE_CONTRACT_END_WARNING_DAYS
     
     qs = Employee.objects.select_related("department").filter(
         contract_end_date__isnull=False,
@@ -688,6 +1183,8 @@ def _ue_generate_contract_end(start: date, end: date, filters: dict) -> list[dic
     
     if filters.get("employee_id"):
         qs = qs.filter(pk=filters["employee_id"])
+    if filters.get("employee_ids"):
+        qs = qs.filter(pk__in=filters["employee_ids"])
     if filters.get("department_id"):
         qs = qs.filter(department_id=filters["department_id"])
 
@@ -710,9 +1207,8 @@ def _ue_generate_contract_end(start: date, end: date, filters: dict) -> list[dic
     return events
 
 def _ue_generate_trial(start: date, end: date, filters: dict) -> list[dict]:
-    from datetime import timedelta
     events: list[dict] = []
-    WARNING_OFFSET = 5
+    WARNING_OFFSET = _UE_TRIAL_WARNING_DAYS
 
     milestones = [
         (60, "TRIAL_60_WARNING",  "Aviso (60 dias): Experiência de {name} encerra dia {data_fim}"),
@@ -727,6 +1223,8 @@ def _ue_generate_trial(start: date, end: date, filters: dict) -> list[dict]:
         
         if filters.get("employee_id"):
             qs = qs.filter(pk=filters["employee_id"])
+        if filters.get("employee_ids"):
+            qs = qs.filter(pk__in=filters["employee_ids"])
         if filters.get("department_id"):
             qs = qs.filter(department_id=filters["department_id"])
 
@@ -817,6 +1315,13 @@ def get_upcoming_events(
     }
 
     requested = set(categories) if categories else None
+
+    # Read-through: a tabela materializada responde quando cobre o período;
+    # durante um rebuild (ou antes do primeiro) caímos nos geradores ao vivo.
+    cached = _ue_calendar_lookup(start, end, requested, only_email_events, filters, limit)
+    if cached is not None:
+        return cached
+
     events: list[dict] = []
 
     for category_set, generator_fn in _UE_GENERATORS.items():
@@ -833,6 +1338,183 @@ def get_upcoming_events(
     events.sort(key=lambda e: (e["date"], e["category"]))
     return events[:limit]
 
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#
+#  UPCOMING EVENTS CALENDAR (materialized)
+#  ───────────────────────────────────────
+#  UpcomingEvent stores the output of the generators above for a fixed horizon
+#  around today, so the dashboard and the events page read an indexed table
+#  instead of re-running every generator on each request.
+#
+#  - rebuild_event_calendar()  : nightly full rebuild (run_automations --only event_calendar)
+#  - refresh_event_calendar()  : incremental refresh, called from signals.py on
+#                                Employee / Vacation / Training / CareerPlan writes
+#  - _ue_calendar_lookup()     : read path used by get_upcoming_events(); returns
+#                                None when the table can't answer the query
+#
+#  Names of departments/job titles are denormalized and only refreshed when the
+#  owning row is saved or on the nightly rebuild.
+#
+# ═══════════════════════════════════════════════════════════════════════════════
+
+_UE_CALENDAR_PAST_DAYS   = _UE_DEFAULT_DAYS
+_UE_CALENDAR_FUTURE_DAYS = _UE_MAX_RANGE + _UE_DEFAULT_DAYS   # < 365: annual events occur at most once
+
+# Offset between the event date and the date it shows up in a range filter.
+_UE_MATCH_OFFSETS = {
+    "CONTRACT_END_WARNING": _UE_CONTRACT_END_WARNING_DAYS,
+    "TRIAL_60_WARNING":     _UE_TRIAL_WARNING_DAYS,
+    "TRIAL_90_WARNING":     _UE_TRIAL_WARNING_DAYS,
+}
+
+_UE_EMPLOYEE_CATEGORIES = frozenset().union(
+    *(cats for cats in _UE_GENERATORS if cats != frozenset({"TRAINING_DATE"}))
+)
+_UE_VACATION_CATEGORIES    = frozenset({"VACATION_START", "VACATION_RETURN"})
+_UE_TRAINING_CATEGORIES    = frozenset({"TRAINING_DATE"})
+_UE_CAREER_PLAN_CATEGORIES = frozenset({"CAREER_PLAN_PROMOTION_DATE", "CAREER_PLAN_REMINDER_WINDOW"})
+
+_UE_ROW_FIELDS = (
+    "date", "category", "title", "employee_id", "employee_name", "department_name",
+    "object_type", "object_id", "status", "email_event", "requires_action",
+)
+
+
+def _ue_calendar_horizon() -> tuple[date, date]:
+    today = timezone.localdate()
+    return today - timedelta(days=_UE_CALENDAR_PAST_DAYS), today + timedelta(days=_UE_CALENDAR_FUTURE_DAYS)
+
+
+def _ue_calendar_rows(events: list[dict]) -> list[UpcomingEvent]:
+    return [
+        UpcomingEvent(
+            match_date=e["date"] - timedelta(days=_UE_MATCH_OFFSETS.get(e["category"], 0)),
+            **{name: e[name] for name in _UE_ROW_FIELDS},
+        )
+        for e in events
+    ]
+
+
+def _ue_calendar_generate(start: date, end: date, categories: frozenset, filters: dict) -> list[UpcomingEvent]:
+    rows: list[UpcomingEvent] = []
+    for category_set, generator_fn in _UE_GENERATORS.items():
+        if category_set.isdisjoint(categories):
+            continue
+        events = [e for e in generator_fn(start, end, filters) if e["category"] in categories]
+        rows.extend(_ue_calendar_rows(events))
+    return rows
+
+
+def rebuild_event_calendar(dry_run: bool = False) -> dict:
+    """
+    Reconstrói a tabela UpcomingEvent para o horizonte [hoje - 30d, hoje + 210d].
+    Enquanto o rebuild roda, get_upcoming_events() usa os geradores ao vivo.
+    """
+    start, end = _ue_calendar_horizon()
+    all_categories = frozenset().union(*_UE_GENERATORS)
+
+    if dry_run:
+        rows = _ue_calendar_generate(start, end, all_categories, {})
+        logger.info(f"[DRY-RUN] Simulação: Calendário de eventos seria reconstruído com {len(rows)} evento(s) ({start} → {end}).")
+        return {'events_produced': len(rows)}
+
+    state, _ = EventCalendarState.objects.get_or_create(pk=1)
+    EventCalendarState.objects.filter(pk=state.pk).update(is_rebuilding=True)
+    try:
+        with transaction.atomic():
+            rows = _ue_calendar_generate(start, end, all_categories, {})
+            UpcomingEvent.objects.all().delete()
+            UpcomingEvent.objects.bulk_create(rows, batch_size=1000)
+            EventCalendarState.objects.filter(pk=state.pk).update(
+                horizon_start=start, horizon_end=end, rebuilt_at=timezone.now(), is_rebuilding=False,
+            )
+    finally:
+        # Falha no meio do rebuild: a transação restaura as linhas antigas (e o horizonte antigo).
+        EventCalendarState.objects.filter(pk=state.pk, is_rebuilding=True).update(is_rebuilding=False)
+
+    logger.info(f"Calendário de eventos reconstruído: {len(rows)} evento(s) ({start} → {end}).")
+    return {'events_produced': len(rows)}
+
+
+def refresh_event_calendar(
+    categories:   frozenset,
+    employee_id:  _Optional[int] = None,
+    object_type:  _Optional[str] = None,
+    object_id:    _Optional[int] = None,
+    employee_ids: _Optional[list[int]] = None,
+) -> None:
+    """
+    Regenera as linhas de `categories` do calendário — apenas de um colaborador
+    quando `employee_id` é informado, ou dos colaboradores de `employee_ids`
+    (rotinas em lote). `object_type`/`object_id` removem também as linhas
+    antigas do objeto salvo (ex.: férias que trocaram de colaborador).
+    Não faz nada se o calendário nunca foi construído ou está em rebuild.
+    """
+    if employee_ids is not None and not employee_ids:
+        return
+    state = EventCalendarState.objects.filter(horizon_start__isnull=False, is_rebuilding=False).first()
+    if state is None:
+        return
+
+    stale = Q(category__in=categories)
+    if employee_id is not None:
+        owner = Q(employee_id=employee_id)
+        if object_type is not None:
+            owner |= Q(object_type=object_type, object_id=object_id)
+        stale &= owner
+    elif employee_ids is not None:
+        stale &= Q(employee_id__in=employee_ids)
+
+    if employee_id is not None:
+        filters = {"employee_id": employee_id}
+    elif employee_ids is not None:
+        filters = {"employee_ids": employee_ids}
+    else:
+        filters = {}
+    with transaction.atomic():
+        UpcomingEvent.objects.filter(stale).delete()
+        rows = _ue_calendar_generate(state.horizon_start, state.horizon_end, categories, filters)
+        UpcomingEvent.objects.bulk_create(rows, batch_size=1000)
+
+
+def _ue_calendar_lookup(
+    start:             date,
+    end:               date,
+    requested:         _Optional[set],
+    only_email_events: bool,
+    filters:           dict,
+    limit:             int,
+) -> _Optional[list[dict]]:
+    """Answers get_upcoming_events() from UpcomingEvent, or returns None to fall back."""
+    state = EventCalendarState.objects.first()
+    if state is None or state.is_rebuilding or state.horizon_start is None:
+        return None
+    if start < state.horizon_start or end > state.horizon_end:
+        return None
+
+    qs = UpcomingEvent.objects.filter(match_date__range=(start, end))
+    if requested:
+        qs = qs.filter(category__in=requested)
+    if only_email_events:
+        qs = qs.filter(email_event=True)
+
+    # Same semantics as the generators: trainings are matched through the
+    # training itself, everything else through the employee.
+    if filters.get("employee_id"):
+        trainings = Training.objects.filter(scheduled_employees__pk=filters["employee_id"]).values("pk")
+        qs = qs.filter(Q(employee_id=filters["employee_id"]) | Q(object_type="training", object_id__in=trainings))
+    if filters.get("department_id"):
+        trainings = Training.objects.filter(target_department_id=filters["department_id"]).values("pk")
+        qs = qs.filter(Q(employee__department_id=filters["department_id"]) | Q(object_type="training", object_id__in=trainings))
+    if filters.get("status"):
+        qs = qs.filter(Q(status=filters["status"]) | ~Q(object_type="careerplan"))
+
+    events: list[dict] = []
+    for row in qs.order_by("date", "category", "id").values(*_UE_ROW_FIELDS)[:limit]:
+        _ue_append(events, **row)
+    return events
+
 def get_historical_minimum_wage(year: int) -> float:
     """
     Retorna o valor do salário mínimo brasileiro para o ano solicitado.
@@ -851,4 +1533,164 @@ def get_historical_minimum_wage(year: int) -> float:
         2025: 1518.00, 2026: 1621.00,
     }
 
-    return MIN_WAGE_HISTORY.get(year, 1621.00)
\ No newline at end of file
+    return MIN_WAGE_HISTORY.get(year, 1621.00)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#
+#  TENURE DISTRIBUTION
+#  ───────────────────
+#  Histogram of active employees by years of service, computed in a single
+#  aggregate (one conditional COUNT per bucket). Edges are whole years and
+#  are applied on calendar dates, so leap years don't shift the buckets.
+#
+# ═══════════════════════════════════════════════════════════════════════════════
+
+TENURE_DEFAULT_EDGES = (1, 3, 5, 10, 15)
+
+
+def _years_before(ref: date, years: int) -> date:
+    """Same day/month `years` earlier; Feb-29 falls back to Feb-28."""
+    try:
+        return ref.replace(year=ref.year - years)
+    except ValueError:
+        return ref.replace(year=ref.year - years, day=28)
+
+
+def _tenure_label(low: _Optional[int], high: _Optional[int]) -> str:
+    if low is None:
+        return f"< {high} ano{'s' if high > 1 else ''}"
+    if high is None:
+        return f"{low}+ anos"
+    return f"{low} a {high} anos"
+
+
+def get_tenure_distribution(
+    edges:         _Optional[list[int]] = None,
+    department_id: _Optional[int] = None,
+    today:         _Optional[date] = None,
+    queryset:      _Optional[QuerySet] = None,
+) -> list[dict]:
+    """
+    Retorna os buckets de tempo de empresa com a contagem de funcionários ativos.
+
+    edges         : limites em anos (default: settings.TENURE_BUCKET_EDGES ou 1, 3, 5, 10, 15).
+    department_id : restringe a um setor.
+    queryset      : base alternativa de funcionários (ex.: filtros de um relatório).
+
+    Cada item: {'label', 'min_years', 'max_years', 'count'}. O bucket [min, max)
+    contém quem tem pelo menos `min_years` e menos de `max_years` completos.
+    """
+    today = today or timezone.localdate()
+    edges = sorted({int(e) for e in (edges or getattr(settings, 'TENURE_BUCKET_EDGES', TENURE_DEFAULT_EDGES)) if int(e) > 0})
+
+    qs = queryset if queryset is not None else Employee.objects.filter(termination_date__isnull=True)
+    if department_id:
+        qs = qs.filter(department_id=department_id)
+    if not edges:
+        raise ValueError("Informe ao menos um limite (em anos) para o histograma.")
+
+    bounds = [None, *edges, None]
+    buckets = []
+    aggregates = {}
+    for i, (low, high) in enumerate(zip(bounds, bounds[1:])):
+        condition = Q(hire_date__isnull=False)
+        if low is not None:
+            condition &= Q(hire_date__lte=_years_before(today, low))
+        if high is not None:
+            condition &= Q(hire_date__gt=_years_before(today, high))
+        aggregates[f"bucket_{i}"] = Count("pk", filter=condition)
+        buckets.append({"label": _tenure_label(low, high), "min_years": low or 0, "max_years": high})
+
+    counts = qs.aggregate(**aggregates)
+    for i, bucket in enumerate(buckets):
+        bucket["count"] = counts[f"bucket_{i}"]
+    return buckets
+
+
+# ── Histórico do run_automations ────────────────────────────────
+
+def purge_automation_history(dry_run: bool = False) -> int:
+    """
+    Remove as execuções (e os steps, em cascata) mais antigas que
+    AUTOMATION_RUN_RETENTION_DAYS. O run_scheduler grava uma execução por
+    disparo (a fila de e-mails sozinha dá ~1.440 por dia), então sem isto a
+    tabela só cresce. Roda via Hub (run_automations / run_scheduler).
+    Retorna quantas execuções foram (ou seriam, em dry-run) removidas.
+    """
+    from rhcontrol.models import AutomationRun
+
+    days = getattr(settings, 'AUTOMATION_RUN_RETENTION_DAYS', 30)
+    cutoff = timezone.now() - timedelta(days=days)
+    expired = AutomationRun.objects.filter(started_at__lt=cutoff).exclude(status=AutomationRun.RunStatus.RUNNING)
+
+    if dry_run:
+        count = expired.count()
+        logger.info(f"[DRY-RUN] Simulação: Removeria {count} execução(ões) de automação com mais de {days} dia(s).")
+        return count
+
+    count = expired.delete()[1].get(AutomationRun._meta.label, 0)
+    logger.info(f"Histórico de automações: {count} execução(ões) com mais de {days} dia(s) removida(s).")
+    return count
+
+
+# ── Métricas do run_automations (Prometheus) ────────────────────
+
+_AUTOMATION_STEP_GAUGES = (
+    ('duration', 'rh_automation_step_duration_seconds', 'Duração da última execução da rotina (s).'),
+    ('rows_scanned', 'rh_automation_step_rows_scanned', 'Linhas lidas na última execução da rotina.'),
+    ('events_produced', 'rh_automation_step_events_produced', 'Eventos gerados na última execução da rotina.'),
+    ('emails_sent', 'rh_automation_step_emails_sent', 'E-mails enviados na última execução da rotina.'),
+    ('errors', 'rh_automation_step_errors', 'Erros na última execução da rotina.'),
+)
+
+
+def _prometheus_labels(labels: dict) -> str:
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def render_automation_metrics() -> str:
+    """
+    Última execução real (não simulada) de cada rotina do run_automations, o total
+    de execuções por status e os contadores do cache do dashboard (deste processo),
+    no formato texto do Prometheus.
+    """
+    from rhcontrol.cache import dashboard_cache
+    from rhcontrol.models import AutomationRun, AutomationStep
+
+    latest = (
+        AutomationStep.objects.filter(run__dry_run=False)
+        .values('name').annotate(last=Max('pk')).values('last')
+    )
+    steps = list(AutomationStep.objects.filter(pk__in=latest).order_by('name'))
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{name}{_prometheus_labels(labels)} {value}")
+
+    for field, name, help_text in _AUTOMATION_STEP_GAUGES:
+        family(name, 'gauge', help_text, [({'routine': step.name}, getattr(step, field)) for step in steps])
+    family('rh_automation_step_success', 'gauge', 'Última execução da rotina terminou com sucesso (1) ou falhou (0).',
+           [({'routine': step.name}, int(step.status == AutomationRun.RunStatus.SUCCESS)) for step in steps])
+    family('rh_automation_step_last_run_timestamp_seconds', 'gauge', 'Início da última execução da rotina (epoch).',
+           [({'routine': step.name}, int(step.started_at.timestamp())) for step in steps])
+
+    runs = AutomationRun.objects.filter(dry_run=False).values('status').annotate(total=Count('pk')).order_by('status')
+    # Gauge, não counter: purge_automation_history remove as execuções antigas.
+    family('rh_automation_runs_retained', 'gauge', 'Execuções de automação no histórico (dentro da retenção) por status.',
+           [({'status': row['status'].lower()}, row['total']) for row in runs])
+
+    cache_stats = dashboard_cache.stats()
+    family('rh_dashboard_cache_hits_total', 'counter', 'Acertos do cache do dashboard neste processo.', [({}, cache_stats['hits'])])
+    family('rh_dashboard_cache_misses_total', 'counter', 'Faltas do cache do dashboard neste processo.', [({}, cache_stats['misses'])])
+
+    return '\n'.join(lines) + '\n'
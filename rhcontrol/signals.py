@@ -1,4 +1,105 @@
-from django.db.models.signals import pre_save
+from django.db.models.signals import m2m_changed, pre_save, post_save, post_delete
+from django.db import transaction
 from django.dispatch import receiver
-from .models import Employee, EmployeeHistory
+from .cache import dashboard_cache
+from .cid_index import cid_index
+from .models import CID, CareerPlan, Department, Dependent, Employee, EmployeeHistory, JobTitle, Occurrence, Training, Vacation
+from .pdf import invalidate_pdf_cache
+from .services import (
+    refresh_event_calendar,
+    _UE_EMPLOYEE_CATEGORIES,
+    _UE_VACATION_CATEGORIES,
+    _UE_TRAINING_CATEGORIES,
+    _UE_CAREER_PLAN_CATEGORIES,
+)
 
+
+# ── Calendário de eventos (UpcomingEvent) ───────────────────────
+# Cada escrita regenera apenas as linhas afetadas; o rebuild noturno
+# (run_automations --only event_calendar) cobre o restante.
+
+@receiver([post_save, post_delete], sender=Employee)
+def refresh_employee_events(sender, instance, **kwargs):
+    refresh_event_calendar(_UE_EMPLOYEE_CATEGORIES, employee_id=instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Vacation)
+def refresh_vacation_events(sender, instance, **kwargs):
+    refresh_event_calendar(
+        _UE_VACATION_CATEGORIES, employee_id=instance.employee_id,
+        object_type='vacation', object_id=instance.pk,
+    )
+
+
+@receiver([post_save, post_delete], sender=Training)
+def refresh_training_events(sender, instance, **kwargs):
+    refresh_event_calendar(_UE_TRAINING_CATEGORIES)
+
+
+@receiver([post_save, post_delete], sender=CareerPlan)
+def refresh_career_plan_events(sender, instance, **kwargs):
+    refresh_event_calendar(
+        _UE_CAREER_PLAN_CATEGORIES, employee_id=instance.employee_id,
+        object_type='careerplan', object_id=instance.pk,
+    )
+
+
+# ── Índice de busca ─────────────────────────────────────────────
+# O nome do setor faz parte de Employee.search_document; renomear o setor
+# recalcula o documento dos seus funcionários. Salvar sem mudar o nome não
+# toca nos funcionários.
+
+@receiver(pre_save, sender=Department)
+def remember_department_name(sender, instance, update_fields=None, **kwargs):
+    if instance.pk is None or (update_fields is not None and 'name' not in update_fields):
+        instance._previous_name = instance.name
+    else:
+        instance._previous_name = sender.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=Department)
+def refresh_department_search_documents(sender, instance, created, **kwargs):
+    if created or getattr(instance, '_previous_name', None) == instance.name:
+        return
+    employees = list(instance.funcionarios_setor.all())
+    for employee in employees:
+        employee.department = instance
+        employee.search_document = employee.build_search_document()
+    Employee.objects.bulk_update(employees, ['search_document'], batch_size=1000)
+
+
+# ── Índice de CID em memória ────────────────────────────────────
+
+@receiver([post_save, post_delete], sender=CID)
+def invalidate_cid_index(sender, **kwargs):
+    transaction.on_commit(cid_index.invalidate)
+
+
+# ── Cache do dashboard ──────────────────────────────────────────
+# Invalida só após o commit, para que uma requisição concorrente não
+# recoloque no cache dados da transação ainda não confirmada.
+
+@receiver([post_save, post_delete], sender=Employee)
+@receiver([post_save, post_delete], sender=Vacation)
+@receiver([post_save, post_delete], sender=Training)
+@receiver([post_save, post_delete], sender=CareerPlan)
+def invalidate_dashboard_cache(sender, **kwargs):
+    transaction.on_commit(dashboard_cache.invalidate)
+
+
+# ── Cache de PDFs ───────────────────────────────────────────────
+# Qualquer escrita nos modelos que alimentam os relatórios incrementa a
+# versão do cache de PDFs: os prontos deixam de ser reaproveitados (mas
+# continuam baixáveis pelo id do job), sem UPDATE na tabela de jobs.
+
+_PDF_SOURCE_MODELS = (Employee, EmployeeHistory, Dependent, Vacation, Training, Department, JobTitle, CareerPlan, Occurrence, CID)
+
+def invalidate_pdf_cache_on_write(sender, **kwargs):
+    transaction.on_commit(invalidate_pdf_cache)
+
+for _model in _PDF_SOURCE_MODELS:
+    post_save.connect(invalidate_pdf_cache_on_write, sender=_model, dispatch_uid=f'pdf_cache_{_model.__name__}')
+    post_delete.connect(invalidate_pdf_cache_on_write, sender=_model, dispatch_uid=f'pdf_cache_delete_{_model.__name__}')
+
+for _through in (Training.scheduled_employees.through, Training.attended_employees.through):
+    m2m_changed.connect(invalidate_pdf_cache_on_write, sender=_through, dispatch_uid=f'pdf_cache_{_through.__name__}')
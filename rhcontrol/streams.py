@@ -0,0 +1,42 @@
+"""
+streams.py — Destinos de escrita para respostas em streaming.
+
+ZipStream é usado pelo ZIP do kit de admissão (pdf.py) e pelo XLSX das
+exportações (exports.py): o zipfile escreve nele e o gerador da view drena
+os bytes a cada entrada, sem montar o arquivo inteiro em memória.
+"""
+
+
+class ZipStream:
+    """
+    Destino não-seekable para zipfile: acumula os bytes até serem drenados.
+
+    >>> import zipfile
+    >>> stream = ZipStream()
+    >>> with zipfile.ZipFile(stream, mode='w') as archive:
+    ...     archive.writestr('a.txt', 'oi')
+    >>> stream.drain()[:2]
+    b'PK'
+    >>> stream.drain()
+    b''
+    """
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._offset = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
@@ -10,7 +10,7 @@ from rhcontrol.forms import EmployeeForm
 from datetime import datetime, timedelta
 from django.utils import timezone
 from django.core import mail
-from rhcontrol.services import get_upcoming_events, process_career_plans
+from rhcontrol.services import drain_notification_outbox, get_upcoming_events, process_career_plans
 
 
 class RhcontrolTests(TestCase):
@@ -522,6 +522,7 @@ class CareerPlanAutomationsTest(TestCase):
         )
 
         process_career_plans(dry_run=False)
+        drain_notification_outbox()
         plan.refresh_from_db()
 
         self.assertEqual(plan.status, CareerPlan.PlanStatus.AWAITING_CONFIRMATION)
@@ -539,6 +540,7 @@ class CareerPlanAutomationsTest(TestCase):
         )
 
         process_career_plans(dry_run=False)
+        drain_notification_outbox()
         plan.refresh_from_db()
         self.employee.refresh_from_db()
 
@@ -549,6 +551,7 @@ class CareerPlanAutomationsTest(TestCase):
         CareerPlan.objects.filter(pk=plan.pk).update(promotion_date=self.today)
 
         process_career_plans(dry_run=False)
+        drain_notification_outbox()
         plan.refresh_from_db()
         self.employee.refresh_from_db()
 
@@ -595,6 +598,7 @@ class CareerPlanIdempotencyTests(TestCase):
         )
 
         process_career_plans(dry_run=False)
+        drain_notification_outbox()
         plan.refresh_from_db()
         self.assertEqual(plan.status, CareerPlan.PlanStatus.AWAITING_CONFIRMATION)
         self.assertIsNotNone(plan.reminder_sent_at)
@@ -603,6 +607,7 @@ class CareerPlanIdempotencyTests(TestCase):
         logs_count_1 = NotificationLog.objects.count()
 
         process_career_plans(dry_run=False)
+        drain_notification_outbox()
         plan.refresh_from_db()
         self.assertEqual(len(mail.outbox), 1)
         self.assertEqual(NotificationLog.objects.count(), logs_count_1)
@@ -725,6 +730,7 @@ class CareerPlanExpiryTests(TestCase):
         CareerPlan.objects.filter(pk=plan.pk).update(promotion_date=self.today)
 
         process_career_plans(dry_run=False)
+        drain_notification_outbox()
 
         plan.refresh_from_db()
         self.assertEqual(plan.status, CareerPlan.PlanStatus.CANCELLED)
@@ -770,6 +776,7 @@ class CareerPlanComaTests(TestCase):
         CareerPlan.objects.filter(pk=plan.pk).update(promotion_date=self.today - timedelta(days=1))
 
         process_career_plans(dry_run=False)
+        drain_notification_outbox()
 
         plan.refresh_from_db()
         self.assertEqual(plan.status, CareerPlan.PlanStatus.CANCELLED)
@@ -817,6 +824,7 @@ class CareerPlanDismissalTests(TestCase):
         self.employee.save(update_fields=["termination_date"])
 
         process_career_plans(dry_run=False)
+        drain_notification_outbox()
 
         plan.refresh_from_db()
         self.assertEqual(plan.status, CareerPlan.PlanStatus.CANCELLED)
@@ -875,6 +883,7 @@ class CareerPlanEffectiveTests(TestCase):
         CareerPlan.objects.filter(pk=plan.pk).update(promotion_date=self.today)
 
         process_career_plans(dry_run=False)
+        drain_notification_outbox()
 
         plan.refresh_from_db()
         self.employee.refresh_from_db()
@@ -889,6 +898,7 @@ class CareerPlanEffectiveTests(TestCase):
         self.assertIn(self.employee.name, mail.outbox[0].subject)
 
         process_career_plans(dry_run=False)
+        drain_notification_outbox()
         self.assertEqual(len(mail.outbox), 1)
     
     def test_effective_promotion_creates_history_record(self):
@@ -913,6 +923,7 @@ class CareerPlanEffectiveTests(TestCase):
 
         # 3. Roda a automação diária
         process_career_plans(dry_run=False)
+        drain_notification_outbox()
 
         plan.refresh_from_db()
         self.employee.refresh_from_db()
@@ -1079,4 +1090,1731 @@ class ContractEndEventTests(TestCase):
         eventos_fim_contrato = [e for e in eventos if e['category'] == 'CONTRACT_END_WARNING' and e['employee_id'] == emp.pk]
 
         # A lista de eventos para essa funcionária deve estar vazia
-        self.assertEqual(len(eventos_fim_contrato), 0, "Nenhum evento deve ser gerado se o funcionário já foi desligado.")
\ No newline at end of file
+        self.assertEqual(len(eventos_fim_contrato), 0, "Nenhum evento deve ser gerado se o funcionário já foi desligado.")
+class UpcomingAnnualEventsQueryTests(TestCase):
+    def setUp(self):
+        self.dept = Department.objects.create(name="Financeiro")
+        self.job = JobTitle.objects.create(name="Analista", department=self.dept, base_salary=3000.00)
+
+    def _employee(self, cpf, birth_date, hire_date=None, **extra):
+        return Employee.objects.create(
+            name=f"Colaborador {cpf}",
+            cpf=cpf,
+            birth_date=birth_date,
+            hire_date=hire_date,
+            department=self.dept,
+            job_title=self.job,
+            **extra
+        )
+
+    def test_birthday_window_crossing_new_year(self):
+        from datetime import date
+        from rhcontrol.services import _ue_generate_birthday
+
+        emp = self._employee("10000000001", date(1990, 1, 3))
+        self._employee("10000000002", date(1990, 6, 15))
+
+        events = _ue_generate_birthday(date(2025, 12, 20), date(2026, 1, 10), {})
+
+        self.assertEqual([(e['object_id'], e['date']) for e in events], [(emp.pk, date(2026, 1, 3))])
+
+    def test_feb_29_birthday_matches_feb_28_in_non_leap_year(self):
+        from datetime import date
+        from rhcontrol.services import _ue_generate_birthday
+
+        emp = self._employee("10000000003", date(2000, 2, 29))
+
+        events = _ue_generate_birthday(date(2025, 2, 28), date(2025, 2, 28), {})
+        self.assertEqual([(e['object_id'], e['date']) for e in events], [(emp.pk, date(2025, 2, 28))])
+
+        self.assertEqual(_ue_generate_birthday(date(2025, 3, 1), date(2025, 3, 31), {}), [])
+
+    def test_set_based_generators_match_python_scan(self):
+        from datetime import date
+        from rhcontrol.benchmarks import _legacy_annual_scan
+        from rhcontrol.services import _ue_generate_birthday, _ue_generate_company_anniversary
+
+        samples = [date(1980, 1, 1), date(1985, 2, 28), date(1992, 2, 29), date(1975, 3, 31),
+                   date(1999, 7, 15), date(2001, 11, 30), date(1970, 12, 31)]
+        for i, d in enumerate(samples):
+            self._employee(f"2000000000{i}", d, hire_date=d.replace(year=2015) if d.day != 29 else date(2016, 2, 29))
+        self._employee("30000000000", date(1990, 5, 5), termination_date=date(2024, 1, 1))
+
+        windows = [
+            (date(2025, 1, 1), date(2025, 1, 31)),
+            (date(2025, 2, 10), date(2025, 3, 15)),
+            (date(2024, 2, 29), date(2024, 3, 1)),
+            (date(2025, 11, 15), date(2026, 2, 28)),
+            (date(2025, 6, 1), date(2025, 11, 28)),
+        ]
+        for start, end in windows:
+            for field_name, generator in (('birth_date', _ue_generate_birthday),
+                                          ('hire_date', _ue_generate_company_anniversary)):
+                expected = sorted(_legacy_annual_scan(field_name, start, end))
+                produced = sorted((e['object_id'], e['date']) for e in generator(start, end, {}))
+                self.assertEqual(produced, expected, f"{field_name} {start}..{end}")
+
+
+class EventCalendarTests(TestCase):
+    def setUp(self):
+        from datetime import date
+        self.today = timezone.localdate()
+        self.dept = Department.objects.create(name="Logística")
+        self.other_dept = Department.objects.create(name="Compras")
+        self.job = JobTitle.objects.create(name="Conferente", department=self.dept, base_salary=2500.00)
+        self.next_job = JobTitle.objects.create(name="Líder", department=self.dept, base_salary=4000.00)
+        soon = self.today + timedelta(days=10)
+        self.employee = Employee.objects.create(
+            name="Carla Calendário", cpf="40000000001",
+            birth_date=date(1990, soon.month, min(soon.day, 28)),
+            hire_date=self.today - timedelta(days=50), is_trial_contract=True,
+            department=self.dept, job_title=self.job,
+        )
+        self.other = Employee.objects.create(
+            name="Otávio Outro", cpf="40000000002", birth_date=date(1985, 1, 1),
+            hire_date=date(2015, soon.month, min(soon.day, 28)),
+            department=self.other_dept, job_title=self.job,
+        )
+        Vacation.objects.create(employee=self.employee, start_date=self.today + timedelta(days=5), vacation_duration=10)
+        training = Training.objects.create(training_name="NR-11", start_date=self.today + timedelta(days=3),
+                                           training_total_hours=8, target_department=self.other_dept)
+        training.scheduled_employees.add(self.employee)
+        CareerPlan.objects.create(employee=self.employee, proposed_job=self.next_job, proposed_salary=Decimal("4000.00"),
+                                  promotion_date=self.today + timedelta(days=40))
+
+    def _live(self, **kwargs):
+        from rhcontrol.models import EventCalendarState
+        EventCalendarState.objects.update(is_rebuilding=True)
+        try:
+            return get_upcoming_events(**kwargs)
+        finally:
+            EventCalendarState.objects.update(is_rebuilding=False)
+
+    def _keys(self, events):
+        return sorted((e['date'], e['category'], e['object_type'], e['object_id'], e['title']) for e in events)
+
+    def test_calendar_matches_live_generators(self):
+        from rhcontrol.services import rebuild_event_calendar
+        rebuild_event_calendar()
+
+        scenarios = [
+            {},
+            {'start_date': self.today, 'end_date': self.today + timedelta(days=60)},
+            {'employee_id': self.employee.pk, 'end_date': self.today + timedelta(days=60)},
+            {'department_id': self.other_dept.pk},
+            {'only_email_events': True},
+            {'categories': ['TRAINING_DATE', 'VACATION_START']},
+            {'status': CareerPlan.PlanStatus.CONFIRMED, 'end_date': self.today + timedelta(days=60)},
+        ]
+        for kwargs in scenarios:
+            self.assertEqual(self._keys(get_upcoming_events(**kwargs)), self._keys(self._live(**kwargs)), kwargs)
+        self.assertTrue(get_upcoming_events())
+
+    def test_writes_refresh_calendar_incrementally(self):
+        from rhcontrol.models import UpcomingEvent
+        from rhcontrol.services import rebuild_event_calendar
+        rebuild_event_calendar()
+
+        vacation = Vacation.objects.create(employee=self.other, start_date=self.today + timedelta(days=20), vacation_duration=5)
+        self.assertTrue(UpcomingEvent.objects.filter(object_type='vacation', object_id=vacation.pk).exists())
+
+        vacation.employee = self.employee
+        vacation.save()
+        self.assertEqual(
+            set(UpcomingEvent.objects.filter(object_type='vacation', object_id=vacation.pk).values_list('employee_id', flat=True)),
+            {self.employee.pk},
+        )
+
+        vacation.delete()
+        self.assertFalse(UpcomingEvent.objects.filter(object_type='vacation', object_id=vacation.pk).exists())
+
+        self.other.termination_date = self.today
+        self.other.save()
+        self.assertFalse(UpcomingEvent.objects.filter(employee=self.other).exists())
+
+        self.assertEqual(self._keys(get_upcoming_events()), self._keys(self._live()))
+
+    def test_career_plan_batch_refreshes_only_affected_employees(self):
+        from unittest import mock
+        from rhcontrol.models import UpcomingEvent
+        from rhcontrol.services import (
+            _UE_CAREER_PLAN_CATEGORIES, _UE_EMPLOYEE_CATEGORIES, apply_career_plan_transitions,
+            rebuild_event_calendar, refresh_event_calendar,
+        )
+        rebuild_event_calendar()
+        other_rows = set(UpcomingEvent.objects.filter(employee=self.other).values_list('pk', flat=True))
+
+        refresh_event_calendar(_UE_CAREER_PLAN_CATEGORIES | _UE_EMPLOYEE_CATEGORIES, employee_ids=[self.employee.pk])
+        self.assertEqual(set(UpcomingEvent.objects.filter(employee=self.other).values_list('pk', flat=True)), other_rows)
+        self.assertEqual(self._keys(get_upcoming_events()), self._keys(self._live()))
+
+        plan = CareerPlan.objects.get()
+        transition = {'plan': plan, 'status': CareerPlan.PlanStatus.CANCELLED, 'from_status': plan.status, 'reason': 'Teste'}
+        with mock.patch('rhcontrol.services.refresh_event_calendar') as refresh:
+            apply_career_plan_transitions([transition], self.today)
+        self.assertEqual(refresh.call_args.kwargs['employee_ids'], [self.employee.pk])
+
+    def test_falls_back_outside_horizon_or_before_first_build(self):
+        from rhcontrol.models import UpcomingEvent
+        from rhcontrol.services import rebuild_event_calendar
+
+        self.assertFalse(UpcomingEvent.objects.exists())
+        self.assertTrue(get_upcoming_events())
+
+        rebuild_event_calendar()
+        far = self.today + timedelta(days=300)
+        self.assertEqual(self._keys(get_upcoming_events(start_date=far)), self._keys(self._live(start_date=far)))
+
+
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        from rhcontrol.cache import dashboard_cache
+        self.cache = dashboard_cache
+        self.cache.reset()
+        self.addCleanup(self.cache.reset)
+        self.user = User.objects.create_user(username='dash', password='testpass123')
+        self.client.login(username='dash', password='testpass123')
+        self.dept = Department.objects.create(name="RH")
+        self.job = JobTitle.objects.create(name="Assistente", department=self.dept, base_salary=2000.00)
+
+    def _employee(self, cpf):
+        return Employee.objects.create(name=f"Colaborador {cpf}", cpf=cpf, birth_date=datetime(1990, 1, 1).date(),
+                                       hire_date=datetime(2020, 1, 1).date(), department=self.dept, job_title=self.job)
+
+    def test_repeated_hits_are_served_from_cache(self):
+        self._employee("50000000001")
+        self.client.get(reverse('rhcontrol:dashboard'))
+
+        with self.assertNumQueries(4):  # sessão, usuário e 2 de permissões; nenhum COUNT
+            response = self.client.get(reverse('rhcontrol:dashboard'))
+
+        self.assertEqual(response.context['active_employees_count'], 1)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_employee_write_invalidates_after_commit(self):
+        self.client.get(reverse('rhcontrol:dashboard'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._employee("50000000002")
+
+        response = self.client.get(reverse('rhcontrol:dashboard'))
+        self.assertEqual(response.context['active_employees_count'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 2)
+
+    def test_shared_backend_hit_is_a_single_read(self):
+        from datetime import date
+        from unittest import mock
+        from django.test import override_settings
+
+        caches = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                  'dashboard': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'dashboard-tests'}}
+        with override_settings(CACHES=caches, DASHBOARD_CACHE_ALIAS='dashboard'):
+            self.cache.reset()
+            self.cache.backend.clear()
+            key = self.cache.make_key(date(2026, 1, 1))
+            self.assertEqual(self.cache.get_or_compute(key, lambda: {'n': 1}), {'n': 1})
+
+            backend = self.cache.backend
+            with mock.patch.object(backend, 'get_many', wraps=backend.get_many) as get_many, \
+                    mock.patch.object(backend, 'get_or_set') as get_or_set, \
+                    mock.patch.object(backend, 'set') as set_:
+                self.assertEqual(self.cache.get_or_compute(key, lambda: {'n': 2}), {'n': 1})
+            # LocMemCache implementa get_many com get(); Redis/Memcached fazem uma ida só.
+            self.assertEqual(get_many.call_count, 1)
+            get_or_set.assert_not_called()
+            set_.assert_not_called()
+
+            self.cache.invalidate()
+            self.assertEqual(self.cache.get_or_compute(key, lambda: {'n': 3}), {'n': 3})
+            self.assertEqual((self.cache.stats()['hits'], self.cache.stats()['misses']), (1, 2))
+            self.cache.reset()
+
+    def test_day_is_part_of_key(self):
+        from datetime import date
+        self.assertEqual(self.cache.make_key(date(2026, 1, 1)), self.cache.make_key(date(2026, 1, 1)))
+        self.assertNotEqual(self.cache.make_key(date(2026, 1, 1)), self.cache.make_key(date(2026, 1, 2)))
+
+    def test_users_with_different_permissions_share_the_entry(self):
+        from django.contrib.auth.models import Permission
+        self.client.get(reverse('rhcontrol:dashboard'))
+
+        other = User.objects.create_user(username='dash2', password='testpass123')
+        other.user_permissions.add(Permission.objects.get(codename='view_employee'))
+        self.client.login(username='dash2', password='testpass123')
+        self.client.get(reverse('rhcontrol:dashboard'))
+
+        self.assertEqual((self.cache.stats()['hits'], self.cache.stats()['misses']), (1, 1))
+
+    def test_lru_evicts_least_recently_used(self):
+        from rhcontrol.cache import LRUCache
+        lru = LRUCache(maxsize=2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual(lru.get('a'), 1)
+        self.assertIsNone(lru.get('b'))
+
+
+class TenureDistributionTests(TestCase):
+    def setUp(self):
+        from datetime import date
+        self.today = date(2028, 2, 29)
+        self.dept = Department.objects.create(name="Produção")
+        self.other_dept = Department.objects.create(name="Vendas")
+        self.job = JobTitle.objects.create(name="Operador", department=self.dept, base_salary=2200.00)
+        hires = [
+            ("60000000001", date(2027, 3, 1), self.dept),    # < 1 ano
+            ("60000000002", date(2027, 2, 28), self.dept),   # 1 ano completo (2028-02-29 → 2027-02-28)
+            ("60000000003", date(2023, 2, 28), self.dept),   # 5 anos completos
+            ("60000000004", date(2010, 1, 1), self.other_dept),
+        ]
+        for cpf, hire_date, dept in hires:
+            Employee.objects.create(name=f"Colaborador {cpf}", cpf=cpf, birth_date=date(1990, 1, 1),
+                                    hire_date=hire_date, department=dept, job_title=self.job)
+        Employee.objects.create(name="Desligado", cpf="60000000009", birth_date=date(1990, 1, 1),
+                                hire_date=date(2027, 6, 1), termination_date=date(2027, 12, 1),
+                                department=self.dept, job_title=self.job)
+
+    def test_buckets_use_calendar_years_in_one_query(self):
+        from rhcontrol.services import get_tenure_distribution
+
+        with self.assertNumQueries(1):
+            buckets = get_tenure_distribution(today=self.today)
+
+        self.assertEqual([b['label'] for b in buckets],
+                         ["< 1 ano", "1 a 3 anos", "3 a 5 anos", "5 a 10 anos", "10 a 15 anos", "15+ anos"])
+        self.assertEqual([b['count'] for b in buckets], [1, 1, 0, 1, 0, 1])
+
+    def test_custom_edges_and_department(self):
+        from rhcontrol.services import get_tenure_distribution
+
+        buckets = get_tenure_distribution(edges=[2], department_id=self.dept.pk, today=self.today)
+        self.assertEqual([(b['label'], b['count']) for b in buckets], [("< 2 anos", 2), ("2+ anos", 1)])
+
+    def test_json_endpoint(self):
+        User.objects.create_user(username='tenure', password='testpass123')
+        self.client.login(username='tenure', password='testpass123')
+
+        response = self.client.get(reverse('rhcontrol:tenure_distribution'), {'edges': '5', 'department_id': self.other_dept.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data'], [0, 1])
+
+        response = self.client.get(reverse('rhcontrol:tenure_distribution'), {'edges': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PdfRenderQueueTests(TestCase):
+    def setUp(self):
+        from unittest import mock
+        self.user = User.objects.create_superuser(username='pdfadmin', password='testpass123')
+        self.client.login(username='pdfadmin', password='testpass123')
+        dept = Department.objects.create(name="Qualidade")
+        job = JobTitle.objects.create(name="Inspetor", department=dept, base_salary=3000.00)
+        Employee.objects.create(name="Paula PDF", cpf="70000000001", birth_date=datetime(1990, 1, 1).date(),
+                                hire_date=datetime(2020, 1, 1).date(), department=dept, job_title=job)
+
+        patcher = mock.patch('rhcontrol.pdf.render_html_to_pdf', return_value=b'%PDF-teste')
+        self.render = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_identical_requests_are_served_from_cache(self):
+        url = reverse('rhcontrol:employee_list_pdf')
+        first = self.client.get(url, {'status': 'ativo'})
+        second = self.client.get(url, {'status': 'ativo'})
+        other = self.client.get(url, {'status': 'demitido'})
+
+        self.assertEqual(first.content, b'%PDF-teste')
+        self.assertEqual(second.content, b'%PDF-teste')
+        self.assertEqual(other.status_code, 200)
+        self.assertEqual(self.render.call_count, 2)
+
+    def test_writes_invalidate_cached_pdfs(self):
+        url = reverse('rhcontrol:employee_list_pdf')
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Department.objects.create(name="Novo Setor")
+        self.client.get(url)
+        self.assertEqual(self.render.call_count, 2)
+
+    def test_invalidation_bumps_version_without_touching_jobs(self):
+        from rhcontrol.models import PdfRenderJob
+        from rhcontrol.pdf import invalidate_pdf_cache, pdf_cache_version
+
+        self.client.get(reverse('rhcontrol:employee_list_pdf'))
+        cache_key = PdfRenderJob.objects.get().cache_key
+        version = pdf_cache_version()
+
+        with self.assertNumQueries(1):
+            invalidate_pdf_cache()
+
+        self.assertEqual(pdf_cache_version(), version + 1)
+        self.assertEqual(PdfRenderJob.objects.get().cache_key, cache_key)
+
+    def test_async_job_is_queued_processed_and_downloaded(self):
+        from rhcontrol.models import PdfRenderJob
+        from rhcontrol.pdf import claim_pdf_jobs, complete_pdf_job
+
+        response = self.client.get(reverse('rhcontrol:employee_list_pdf'), {'async': '1'})
+        self.assertEqual(response.status_code, 202)
+        payload = response.json()
+        self.assertEqual(payload['status'], PdfRenderJob.JobStatus.PENDING)
+        self.assertEqual(self.client.get(payload['status_url']).json()['download_url'], None)
+
+        job_download = reverse('rhcontrol:pdf_job_download', args=[payload['id']])
+        self.assertEqual(self.client.get(job_download).status_code, 409)
+
+        jobs = claim_pdf_jobs(limit=5)
+        self.assertEqual([j.pk for j in jobs], [payload['id']])
+        self.assertEqual(claim_pdf_jobs(limit=5), [])
+        complete_pdf_job(jobs[0], pdf=b'%PDF-worker')
+
+        status = self.client.get(payload['status_url']).json()
+        self.assertEqual(status['status'], PdfRenderJob.JobStatus.DONE)
+        self.assertEqual(self.client.get(status['download_url']).content, b'%PDF-worker')
+
+        # Mesmo pedido de novo: sai direto do cache, sem fila.
+        response = self.client.get(reverse('rhcontrol:employee_list_pdf'))
+        self.assertEqual(response.content, b'%PDF-worker')
+
+    def test_jobs_are_private_to_requester(self):
+        from rhcontrol.models import PdfRenderJob
+        job = PdfRenderJob.objects.create(template_name='x.html', filename='x.pdf', requested_by=self.user)
+        User.objects.create_user(username='curioso', password='testpass123')
+        self.client.login(username='curioso', password='testpass123')
+        self.assertEqual(self.client.get(reverse('rhcontrol:pdf_job_status', args=[job.pk])).status_code, 404)
+
+    def test_render_time_is_reported_and_stored(self):
+        from rhcontrol.models import PdfRenderJob
+        response = self.client.get(reverse('rhcontrol:employee_list_pdf'))
+        self.assertTrue(response['Server-Timing'].startswith('pdf;dur='))
+        self.assertIsNotNone(PdfRenderJob.objects.get().render_ms)
+
+
+class PdfAssetsTests(TestCase):
+    def test_static_fetcher_reads_from_disk(self):
+        from django.conf import settings
+        from rhcontrol.pdf import PDF_ASSETS_BASE_URL, static_url_fetcher
+        result = static_url_fetcher(PDF_ASSETS_BASE_URL + settings.STATIC_URL.lstrip('/') + 'global/css/pdf_fonts.css')
+        self.assertIn(b'@font-face', result['string'])
+        self.assertEqual(result['mime_type'], 'text/css')
+
+    def test_static_fetcher_rejects_missing_file(self):
+        from django.conf import settings
+        from rhcontrol.pdf import PDF_ASSETS_BASE_URL, static_url_fetcher
+        with self.assertRaises(ValueError):
+            static_url_fetcher(PDF_ASSETS_BASE_URL + settings.STATIC_URL.lstrip('/') + 'global/css/nao_existe.css')
+
+
+class AdmissionPackTests(TestCase):
+    def setUp(self):
+        from unittest import mock
+        self.user = User.objects.create_superuser(username='kitadmin', password='testpass123')
+        self.client.login(username='kitadmin', password='testpass123')
+        dept = Department.objects.create(name="Expedição")
+        job = JobTitle.objects.create(name="Auxiliar", department=dept, base_salary=1800.00)
+        self.employees = [
+            Employee.objects.create(name=f"Novo {i}", cpf=f"8000000000{i}", birth_date=datetime(1995, 1, 1).date(),
+                                    hire_date=datetime(2026, 1, 5).date(), department=dept, job_title=job)
+            for i in range(2)
+        ]
+        patcher = mock.patch('rhcontrol.pdf.render_html_to_pdf', return_value=b'%PDF-kit')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _ids(self):
+        return ','.join(str(e.pk) for e in self.employees)
+
+    def test_zip_pack_contains_every_document(self):
+        import io
+        import zipfile
+        from django.test import override_settings
+
+        with override_settings(PDF_WORKER_PROCESSES=1):
+            response = self.client.get(reverse('rhcontrol:admission_pack_pdf'),
+                                       {'employees': self._ids(), 'documents': 'registration_form,bank_presentation'})
+            content = b''.join(response.streaming_content)
+
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        names = sorted(zipfile.ZipFile(io.BytesIO(content)).namelist())
+        self.assertEqual(len(names), 4)
+        self.assertIn(f"ficha_cadastral_{self.employees[0].pk}_Novo_0.pdf", names)
+
+    def test_merged_pdf_renders_all_documents_in_order(self):
+        from unittest import mock
+        from rhcontrol.pdf import ADMISSION_DOCUMENTS
+
+        with mock.patch('rhcontrol.pdf.merge_html_to_pdf', return_value=b'%PDF-merged') as merge:
+            response = self.client.get(reverse('rhcontrol:admission_pack_pdf'), {'employees': self._ids(), 'format': 'pdf'})
+
+        self.assertEqual(response.content, b'%PDF-merged')
+        self.assertEqual(len(merge.call_args.args[0]), 2 * len(ADMISSION_DOCUMENTS))
+
+    def test_failed_document_becomes_error_entry(self):
+        import io
+        import zipfile
+        from unittest import mock
+
+        with mock.patch('rhcontrol.pdf.render_html_to_pdf', side_effect=[b'%PDF-kit', RuntimeError('fonte ausente')]):
+            response = self.client.get(reverse('rhcontrol:admission_pack_pdf'),
+                                       {'employees': self._ids(), 'documents': 'registration_form'})
+            content = b''.join(response.streaming_content)
+
+        archive = zipfile.ZipFile(io.BytesIO(content))
+        self.assertEqual(archive.namelist(), [
+            f"ficha_cadastral_{self.employees[0].pk}_Novo_0.pdf",
+            f"ERRO_ficha_cadastral_{self.employees[1].pk}.txt",
+        ])
+        self.assertIn('fonte ausente', archive.read(f"ERRO_ficha_cadastral_{self.employees[1].pk}.txt").decode())
+
+    def test_merged_pdf_keeps_requested_employee_order(self):
+        from unittest import mock
+
+        ids = f"{self.employees[1].pk},{self.employees[0].pk}"
+        with mock.patch('rhcontrol.pdf.merge_html_to_pdf', return_value=b'%PDF-merged') as merge, \
+                mock.patch('rhcontrol.pdf.render_admission_html', side_effect=lambda employee, *a: employee.name):
+            self.client.get(reverse('rhcontrol:admission_pack_pdf'),
+                            {'employees': ids, 'documents': 'registration_form', 'format': 'pdf'})
+
+        self.assertEqual(merge.call_args.args[0], ["Novo 1", "Novo 0"])
+
+    def test_large_pack_is_queued_and_rendered_by_worker(self):
+        import io
+        import zipfile
+        from concurrent.futures import Future
+        from django.test import override_settings
+        from rhcontrol.models import PdfRenderJob
+        from rhcontrol.pdf import claim_pdf_jobs, complete_pdf_job, render_admission_pack_job
+
+        class InlinePool:
+            def submit(self, fn, *args):
+                future = Future()
+                try:
+                    future.set_result(fn(*args))
+                except Exception as e:
+                    future.set_exception(e)
+                return future
+
+        params = {'employees': self._ids(), 'documents': 'registration_form'}
+        with override_settings(PDF_PACK_INLINE_MAX_EMPLOYEES=1):
+            response = self.client.get(reverse('rhcontrol:admission_pack_pdf'), params)
+            again = self.client.get(reverse('rhcontrol:admission_pack_pdf'), params)
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(again.json()['id'], response.json()['id'])  # mesmo kit ainda na fila: mesmo job
+
+        job = claim_pdf_jobs(limit=5)[0]
+        self.assertEqual(job.pack['employees'], [e.pk for e in self.employees])
+        content, render_ms = render_admission_pack_job(job, InlinePool())
+        complete_pdf_job(job, pdf=content, render_ms=render_ms)
+
+        download = self.client.get(self.client.get(response.json()['status_url']).json()['download_url'])
+        self.assertEqual(download['Content-Type'], 'application/zip')
+        self.assertEqual(len(zipfile.ZipFile(io.BytesIO(download.content)).namelist()), 2)
+        self.assertEqual(PdfRenderJob.objects.get().status, PdfRenderJob.JobStatus.DONE)
+
+    def test_invalid_requests(self):
+        url = reverse('rhcontrol:admission_pack_pdf')
+        self.assertEqual(self.client.get(url, {'employees': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'employees': self._ids(), 'documents': 'nope'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'employees': '999999'}).status_code, 404)
+
+    def test_single_document_view_uses_registry(self):
+        response = self.client.get(reverse('rhcontrol:personal_data_consent_pdf', args=[self.employees[0].pk]))
+        self.assertIn('termo_de_consentimento_dados_pessoais', response['Content-Disposition'])
+
+
+class ListExportTests(TestCase):
+    def setUp(self):
+        User.objects.create_superuser(username='exportadmin', password='testpass123')
+        self.client.login(username='exportadmin', password='testpass123')
+        dept = Department.objects.create(name="Logística")
+        job = JobTitle.objects.create(name="Conferente", department=dept, base_salary=2000.00)
+        self.active = Employee.objects.create(name="Ana Exporta", cpf="90000000001", birth_date=datetime(1990, 1, 1).date(),
+                                              hire_date=datetime(2020, 3, 2).date(), department=dept, job_title=job)
+        Employee.objects.create(name="Bruno Saiu", cpf="90000000002", birth_date=datetime(1990, 1, 1).date(),
+                                hire_date=datetime(2019, 1, 1).date(), termination_date=datetime(2024, 1, 1).date(),
+                                department=dept, job_title=job)
+
+    def _content(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_csv_uses_list_filters(self):
+        response = self.client.get(reverse('rhcontrol:employee_list_export'), {'status': 'ativo', 'format': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('lista_de_funcionarios.csv', response['Content-Disposition'])
+        lines = self._content(response).decode('utf-8-sig').splitlines()
+        self.assertEqual(lines[0].split(';')[:2], ['Nome', 'CPF'])
+        self.assertEqual(len(lines), 2)
+        self.assertIn('Ana Exporta;90000000001', lines[1])
+        self.assertIn('02/03/2020', lines[1])
+
+    def test_xlsx_is_a_valid_workbook(self):
+        import io
+        import zipfile
+        response = self.client.get(reverse('rhcontrol:employee_list_export'), {'format': 'xlsx'})
+        archive = zipfile.ZipFile(io.BytesIO(self._content(response)))
+        self.assertIsNone(archive.testzip())
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertEqual(sheet.count('<row>'), 3)
+        self.assertIn('Bruno Saiu', sheet)
+
+    def test_vacation_and_training_exports(self):
+        Vacation.objects.create(employee=self.active, start_date=timezone.now().date(), vacation_duration=10)
+        Training.objects.create(training_name="NR-35", start_date=timezone.now().date(), end_date=timezone.now().date(),
+                                training_total_hours=8)
+        vacation = self._content(self.client.get(reverse('rhcontrol:vacation_list_export'))).decode('utf-8-sig')
+        training = self._content(self.client.get(reverse('rhcontrol:training_list_export'))).decode('utf-8-sig')
+        self.assertIn('Ana Exporta', vacation)
+        self.assertIn('NR-35', training)
+
+    def test_formula_values_are_escaped_in_csv_only(self):
+        import io
+        import zipfile
+        self.active.name = '=HYPERLINK("http://x","y")'
+        self.active.save()
+
+        csv_content = self._content(self.client.get(reverse('rhcontrol:employee_list_export'), {'format': 'csv'})).decode('utf-8-sig')
+        response = self.client.get(reverse('rhcontrol:employee_list_export'), {'format': 'xlsx'})
+        sheet = zipfile.ZipFile(io.BytesIO(self._content(response))).read('xl/worksheets/sheet1.xml').decode('utf-8')
+
+        self.assertIn('''"'=HYPERLINK(""http://x"",""y"")"''', csv_content)
+        self.assertIn('''<t xml:space="preserve">=HYPERLINK("http://x","y")</t>''', sheet)  # inlineStr não é fórmula
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.get(reverse('rhcontrol:employee_list_export'), {'format': 'ods'})
+        self.assertEqual(response.status_code, 400)
+
+
+class EmployeeListStatusFlagsTests(TestCase):
+    def setUp(self):
+        User.objects.create_superuser(username='listadmin', password='testpass123')
+        self.client.login(username='listadmin', password='testpass123')
+        self.dept = Department.objects.create(name="Produção")
+        self.job = JobTitle.objects.create(name="Operador", department=self.dept, base_salary=2000.00)
+        self.today = timezone.localdate()
+
+    def _create(self, count, start=0):
+        employees = []
+        for i in range(start, start + count):
+            employees.append(Employee.objects.create(
+                name=f"Operador {i:03d}", cpf=f"5{i:010d}", birth_date=datetime(1990, 1, 1).date(),
+                hire_date=datetime(2020, 1, 1).date(), department=self.dept, job_title=self.job,
+            ))
+        return employees
+
+    def _list_queries(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('rhcontrol:employee_list'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        on_leave, cipa = self._create(2)
+        Occurrence.objects.create(employee=on_leave, title='Atestado', description='Afastamento', occurrence_date=self.today,
+                                  is_absence=True)
+        cipa.is_cipa_member = True
+        cipa.cipa_mandate_end_date = self.today + timedelta(days=30)
+        cipa.save()
+
+        small = self._list_queries()
+        self._create(38, start=2)
+        self.assertEqual(self._list_queries(), small)
+
+    def test_annotations_match_properties(self):
+        employees = self._create(5)
+        Occurrence.objects.create(employee=employees[0], title='Atestado', description='Afastamento',
+                                  occurrence_date=self.today - timedelta(days=3), is_absence=True)
+        Occurrence.objects.create(employee=employees[1], title='Atestado', description='Afastamento',
+                                  occurrence_date=self.today - timedelta(days=10),
+                                  end_date=self.today - timedelta(days=1), is_absence=True)
+        mandates = [
+            (None, self.today + timedelta(days=10)),                              # ativo (início implícito)
+            (self.today + timedelta(days=5), self.today + timedelta(days=300)),   # ainda não começou
+            (None, self.today - timedelta(days=100)),                             # estabilidade
+        ]
+        for employee, (start, end) in zip(employees[2:], mandates):
+            employee.is_cipa_member = True
+            employee.cipa_mandate_start_date = start
+            employee.cipa_mandate_end_date = end
+            employee.save()
+
+        plain = {e.pk: (e.is_on_leave, e.cipa_status) for e in Employee.objects.all()}
+        annotated = {e.pk: (e.is_on_leave, e.cipa_status) for e in Employee.objects.with_status_flags()}
+        self.assertEqual(annotated, plain)
+        self.assertEqual(plain[employees[0].pk], (True, None))
+        self.assertEqual(plain[employees[2].pk], (False, 'active'))
+        self.assertEqual(plain[employees[4].pk], (False, 'stability'))
+
+
+class CipaExpiryAutomationTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        dept = Department.objects.create(name="Segurança")
+        job = JobTitle.objects.create(name="Técnico", department=dept, base_salary=3500.00)
+        self.employees = []
+        for i, end_offset in enumerate((400, 367, 300)):
+            self.employees.append(Employee.objects.create(
+                name=f"Cipeiro {i}", cpf=f"6100000000{i}", birth_date=datetime(1985, 1, 1).date(),
+                department=dept, job_title=job, is_cipa_member=True, cipa_role='Titular',
+                cipa_mandate_end_date=self.today - timedelta(days=end_offset),
+            ))
+
+    def test_expired_mandates_are_cleared_in_bulk(self):
+        from rhcontrol.models import EmployeeHistory
+        from rhcontrol.services import expire_cipa_mandates
+
+        with self.assertNumQueries(5):  # savepoint, SELECT FOR UPDATE, UPDATE, INSERT, release
+            self.assertEqual(expire_cipa_mandates(), 2)
+
+        expired, still_stable = self.employees[0], self.employees[2]
+        expired.refresh_from_db()
+        still_stable.refresh_from_db()
+        self.assertFalse(expired.is_cipa_member)
+        self.assertIsNone(expired.cipa_role)
+        self.assertIsNone(expired.cipa_mandate_end_date)
+        self.assertTrue(still_stable.is_cipa_member)
+
+        history = EmployeeHistory.objects.filter(reason="Fim de CIPA")
+        self.assertEqual(history.count(), 2)
+        self.assertEqual(set(history.values_list('old_cipa_role', flat=True)), {'Titular'})
+        self.assertEqual(expire_cipa_mandates(), 0)
+
+    def test_dry_run_and_list_view_do_not_write(self):
+        from rhcontrol.services import expire_cipa_mandates
+
+        self.assertEqual(expire_cipa_mandates(dry_run=True), 2)
+        User.objects.create_superuser(username='cipaadmin', password='testpass123')
+        self.client.login(username='cipaadmin', password='testpass123')
+        self.client.get(reverse('rhcontrol:employee_list'))
+        self.assertEqual(Employee.objects.filter(is_cipa_member=True).count(), 3)
+
+
+class NotificationRecipientBatchTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.dept = Department.objects.create(name="Comercial")
+        self.job = JobTitle.objects.create(name="Vendedor", department=self.dept, base_salary=2500.00)
+        self.birthday = NotificationRule.objects.create(event_type=EventTypes.BIRTHDAY, days_in_advance=0)
+        self.anniversary = NotificationRule.objects.create(event_type=EventTypes.COMPANY_ANNIVERSARY, days_in_advance=0)
+        NotificationRecipient.objects.create(name="RH", email="RH@empresa.com", receive_all_events=True)
+        gestor = NotificationRecipient.objects.create(name="Gestor", email="gestor@empresa.com")
+        gestor.subscribed_rules.add(self.birthday)
+        NotificationRecipient.objects.create(name="Inativo", email="inativo@empresa.com", receive_all_events=True, is_active=False)
+
+    def _create_birthdays(self, count, start=0):
+        for i in range(start, start + count):
+            Employee.objects.create(
+                name=f"Aniversariante {i}", cpf=f"7{i:010d}", department=self.dept, job_title=self.job,
+                birth_date=self.today.replace(year=1992), hire_date=self.today.replace(year=2020),
+            )
+
+    def _recipient_queries(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from rhcontrol.services import process_notifications
+        with CaptureQueriesContext(connection) as ctx:
+            process_notifications()
+        drain_notification_outbox()
+        return sum('notificationrecipient' in q['sql'] for q in ctx.captured_queries)
+
+    def test_recipients_resolved_once_per_run(self):
+        self._create_birthdays(3)
+        few = self._recipient_queries()
+        NotificationLog.objects.all().delete()
+        self._create_birthdays(30, start=3)
+        self.assertEqual(self._recipient_queries(), few)
+        self.assertEqual(len(mail.outbox), 3 * 2 + 33 * 2)
+
+    def test_resolution_matches_per_rule_queryset(self):
+        from rhcontrol.services import get_active_recipients_queryset_for_rule, resolve_recipients_by_rule
+        resolved = resolve_recipients_by_rule([self.birthday, self.anniversary])
+        for rule in (self.birthday, self.anniversary):
+            expected = sorted({e.lower() for e in get_active_recipients_queryset_for_rule(rule).values_list('email', flat=True)})
+            self.assertEqual(resolved[rule.pk], expected)
+        self.assertEqual(resolved[self.birthday.pk], ['gestor@empresa.com', 'rh@empresa.com'])
+
+
+class MailDispatcherTests(TestCase):
+    def _message(self, to):
+        from django.core.mail import EmailMessage
+        return EmailMessage(subject='Aviso', body='Teste', from_email='rh@localhost', to=[to])
+
+    def test_sends_batches_over_one_connection(self):
+        from unittest import mock
+        from django.core.mail import get_connection
+        from rhcontrol.mailer import MailDispatcher
+
+        connection = get_connection()
+        with mock.patch.object(connection, 'open', wraps=connection.open) as opened:
+            with MailDispatcher(connection=connection, batch_size=2, rate=0) as dispatcher:
+                for i in range(5):
+                    dispatcher.add(self._message(f'p{i}@empresa.com'), key=i)
+        self.assertEqual(opened.call_count, 1)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual([o.key for o in dispatcher.sent], [0, 1, 2, 3, 4])
+
+    def test_failures_are_recorded_per_message(self):
+        from django.core.mail.backends.locmem import EmailBackend
+        from rhcontrol.mailer import MailDispatcher
+
+        class FlakyBackend(EmailBackend):
+            def send_messages(self, messages):
+                if 'falha@empresa.com' in messages[0].to:
+                    raise ConnectionError('550 mailbox unavailable')
+                return super().send_messages(messages)
+
+        with MailDispatcher(connection=FlakyBackend(), rate=0) as dispatcher:
+            for i, to in enumerate(['a@empresa.com', 'falha@empresa.com', 'b@empresa.com']):
+                dispatcher.add(self._message(to), key=i)
+
+        self.assertEqual([o.key for o in dispatcher.sent], [0, 2])
+        self.assertEqual([(o.key, o.error) for o in dispatcher.failed], [(1, '550 mailbox unavailable')])
+
+    def test_throttle_spaces_messages(self):
+        from unittest import mock
+        from rhcontrol.mailer import MailDispatcher
+
+        with mock.patch('rhcontrol.mailer.time.sleep') as sleep:
+            with MailDispatcher(rate=10) as dispatcher:
+                for i in range(3):
+                    dispatcher.add(self._message(f'p{i}@empresa.com'))
+        self.assertEqual(sleep.call_count, 2)
+        self.assertTrue(all(0 < call.args[0] <= 0.1 for call in sleep.call_args_list))
+
+
+class NotificationOutboxTests(TestCase):
+    def setUp(self):
+        from rhcontrol.services import process_notifications
+        dept = Department.objects.create(name="Financeiro")
+        job = JobTitle.objects.create(name="Analista", department=dept, base_salary=4000.00)
+        today = timezone.localdate()
+        for i in range(3):
+            Employee.objects.create(name=f"Fulano {i}", cpf=f"7200000000{i}", department=dept, job_title=job,
+                                    birth_date=today.replace(year=1992))
+        NotificationRule.objects.create(event_type=EventTypes.BIRTHDAY, days_in_advance=0)
+        NotificationRecipient.objects.create(name="RH", email="rh@empresa.com", receive_all_events=True)
+        process_notifications()
+
+    def _outbox(self):
+        from rhcontrol.models import NotificationOutbox
+        return NotificationOutbox.objects.order_by('pk')
+
+    def test_log_and_outbox_are_written_without_sending(self):
+        self.assertEqual(NotificationLog.objects.count(), 3)
+        self.assertEqual(self._outbox().count(), 3)
+        self.assertEqual(len(mail.outbox), 0)
+
+        stats = drain_notification_outbox()
+        self.assertEqual(stats['sent'], 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(set(self._outbox().values_list('status', flat=True)), {'SENT'})
+        self.assertEqual(drain_notification_outbox()['sent'], 0)
+
+    def test_failures_back_off_and_end_in_dead_letter(self):
+        from unittest import mock
+        from django.test import override_settings
+        from rhcontrol.models import NotificationOutbox
+
+        with override_settings(NOTIFICATION_OUTBOX_MAX_ATTEMPTS=2, NOTIFICATION_OUTBOX_BACKOFF=60), \
+                mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('SMTP fora')):
+            stats = drain_notification_outbox()
+            self.assertEqual(stats['retry'], 3)
+            first = self._outbox().first()
+            self.assertEqual((first.status, first.attempts, first.last_error), ('PENDING', 1, 'SMTP fora'))
+            self.assertGreater(first.next_attempt_at, timezone.now() + timedelta(seconds=50))
+
+            # Ainda dentro do backoff: nada é reenviado.
+            stats = drain_notification_outbox()
+            self.assertEqual((stats['sent'], stats['retry'], stats['dead']), (0, 0, 0))
+
+            NotificationOutbox.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(drain_notification_outbox()['dead'], 3)
+        self.assertEqual(set(self._outbox().values_list('status', flat=True)), {'DEAD'})
+
+    def test_stale_sending_rows_are_reclaimed(self):
+        from rhcontrol.models import NotificationOutbox
+        from rhcontrol.services import claim_outbox_messages
+
+        self.assertEqual(len(claim_outbox_messages(limit=10)), 3)
+        self.assertEqual(claim_outbox_messages(limit=10), [])
+        NotificationOutbox.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual([m.attempts for m in claim_outbox_messages(limit=10)], [2, 2, 2])
+
+
+class NotificationDigestTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        dept = Department.objects.create(name="Atendimento")
+        job = JobTitle.objects.create(name="Atendente", department=dept, base_salary=2000.00)
+        for i in range(6):
+            Employee.objects.create(name=f"Festejado {i}", cpf=f"7300000000{i}", department=dept, job_title=job,
+                                    birth_date=self.today.replace(year=1992), hire_date=self.today.replace(year=2020))
+        self.birthday = NotificationRule.objects.create(event_type=EventTypes.BIRTHDAY, days_in_advance=0)
+        self.anniversary = NotificationRule.objects.create(event_type=EventTypes.COMPANY_ANNIVERSARY, days_in_advance=0)
+        NotificationRecipient.objects.create(name="Diretoria", email="diretoria@empresa.com", receive_all_events=True,
+                                             digest_mode=True)
+        NotificationRecipient.objects.create(name="RH", email="rh@empresa.com", receive_all_events=True)
+
+    def _run(self):
+        from rhcontrol.services import process_notifications
+        process_notifications()
+        drain_notification_outbox()
+
+    def test_digest_recipient_gets_one_message(self):
+        self._run()
+        digest = [m for m in mail.outbox if m.to == ['diretoria@empresa.com']]
+        individual = [m for m in mail.outbox if m.to == ['rh@empresa.com']]
+        self.assertEqual(len(digest), 1)
+        self.assertEqual(len(individual), 12)
+        self.assertIn('12 aviso(s)', digest[0].subject)
+        self.assertEqual(digest[0].body.count('Festejado 0'), 2)
+
+        # Um log por evento, ligado tanto ao e-mail avulso quanto ao resumo.
+        self.assertEqual(NotificationLog.objects.count(), 12)
+        log = NotificationLog.objects.first()
+        self.assertEqual(log.recipients_snapshot, ['diretoria@empresa.com', 'rh@empresa.com'])
+        self.assertEqual(log.outbox_messages.count(), 2)
+
+        self._run()
+        self.assertEqual(len(mail.outbox), 13)
+
+    def test_rule_level_digest(self):
+        self.anniversary.send_as_digest = True
+        self.anniversary.save()
+        self._run()
+        rh_messages = [m for m in mail.outbox if m.to == ['rh@empresa.com']]
+        # 6 avisos avulsos de aniversário + 1 resumo com os 6 aniversários de empresa.
+        self.assertEqual(len(rh_messages), 7)
+        self.assertEqual(sum(m.subject.startswith('Resumo RH') for m in rh_messages), 1)
+
+
+class NotificationEventCollectionTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        dept = Department.objects.create(name="Compras")
+        job = JobTitle.objects.create(name="Comprador", department=dept, base_salary=3000.00)
+        self.employees = []
+        for i, offset in enumerate((0, 7, 15, 20)):
+            day = self.today + timedelta(days=offset)
+            self.employees.append(Employee.objects.create(
+                name=f"Colecionado {i}", cpf=f"7400000000{i}", department=dept, job_title=job,
+                birth_date=day.replace(year=1992),
+            ))
+        for days in (0, 7, 15):
+            NotificationRule.objects.create(event_type=EventTypes.BIRTHDAY, days_in_advance=days)
+        NotificationRule.objects.create(event_type=EventTypes.VACATION_START, days_in_advance=7)
+        Vacation.objects.create(employee=self.employees[0], start_date=self.today + timedelta(days=7), vacation_duration=10)
+
+    def test_one_query_per_event_type(self):
+        from rhcontrol.services import get_events_for_notification
+        with self.assertNumQueries(3):  # regras, funcionários, férias
+            events = get_events_for_notification()
+        birthdays = sorted((e['rule'].days_in_advance, e['employee'].name) for e in events if e['event_type'] == EventTypes.BIRTHDAY)
+        self.assertEqual(birthdays, [(0, 'Colecionado 0'), (7, 'Colecionado 1'), (15, 'Colecionado 2')])
+        self.assertEqual([e['related_object'].employee_id for e in events if e['event_type'] == EventTypes.VACATION_START],
+                         [self.employees[0].pk])
+
+    def test_already_notified_events_are_dropped_in_bulk(self):
+        from django.contrib.contenttypes.models import ContentType
+        from rhcontrol.services import exclude_already_notified, get_events_for_notification
+
+        events = get_events_for_notification()
+        first = events[0]
+        NotificationLog.objects.create(
+            rule=first['rule'], employee=first['employee'], object_id=first['related_object'].pk,
+            content_type=ContentType.objects.get_for_model(first['related_object']),
+            reference_year=first['reference_year'],
+        )
+        ContentType.objects.get_for_model(Vacation)  # aquece o cache do ContentTypeManager
+        with self.assertNumQueries(2):  # um lookup por content type (Employee, Vacation)
+            pending = exclude_already_notified(events)
+        self.assertEqual(len(pending), len(events) - 1)
+        self.assertNotIn(first, pending)
+
+
+class AutomationCatchupTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.dept = Department.objects.create(name="Logística")
+        self.job = JobTitle.objects.create(name="Conferente", department=self.dept, base_salary=Decimal("2500.00"))
+        self.missed = Employee.objects.create(
+            name="Perdido", cpf="75000000001", department=self.dept, job_title=self.job,
+            birth_date=(self.today - timedelta(days=3)).replace(year=1992),
+        )
+        NotificationRule.objects.create(event_type=EventTypes.BIRTHDAY, days_in_advance=0)
+        NotificationRecipient.objects.create(name="RH", email="rh@teste.com", is_active=True, receive_all_events=True)
+
+    def test_since_replays_missed_days_idempotently(self):
+        from rhcontrol.services import get_events_for_notification, process_notifications
+
+        self.assertEqual(get_events_for_notification(), [])
+        since = self.today - timedelta(days=5)
+        with self.assertNumQueries(2):  # regras, funcionários (uma consulta por intervalo)
+            events = get_events_for_notification(since=since)
+        self.assertEqual([(e['employee'], e['event_date']) for e in events], [(self.missed, self.today - timedelta(days=3))])
+
+        process_notifications(since=since)
+        process_notifications(since=since)
+        self.assertEqual(NotificationLog.objects.filter(employee=self.missed).count(), 1)
+
+    def test_hub_catches_up_from_last_checkpoint(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from rhcontrol.models import AutomationCheckpoint
+
+        AutomationCheckpoint.objects.create(name='notifications', last_success_on=self.today - timedelta(days=5))
+        call_command('run_automations', only='notifications', stdout=StringIO())
+
+        self.assertEqual(NotificationLog.objects.filter(employee=self.missed).count(), 1)
+        self.assertEqual(AutomationCheckpoint.objects.get(name='notifications').last_success_on, self.today)
+
+    def test_hub_rejects_future_since(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        with self.assertRaises(SystemExit):
+            call_command('run_automations', only='notifications', since=self.today + timedelta(days=1),
+                         stdout=StringIO(), stderr=StringIO())
+
+    def test_plan_missed_during_outage_gets_late_reminder(self):
+        NotificationRule.objects.create(event_type=EventTypes.CAREER_PLAN_REMINDER, days_in_advance=0)
+        proposed = JobTitle.objects.create(name="Líder", department=self.dept, base_salary=Decimal("4000.00"))
+        plan = CareerPlan.objects.create(
+            employee=self.missed, proposed_job=proposed, proposed_salary=Decimal("4000.00"),
+            promotion_date=self.today + timedelta(days=5), status=CareerPlan.PlanStatus.SCHEDULED,
+        )
+        CareerPlan.objects.filter(pk=plan.pk).update(promotion_date=self.today - timedelta(days=1))
+
+        process_career_plans(dry_run=False, since=self.today - timedelta(days=40))
+        plan.refresh_from_db()
+        self.assertEqual(plan.status, CareerPlan.PlanStatus.AWAITING_CONFIRMATION)
+        self.assertIsNotNone(plan.reminder_sent_at)
+
+        # Rodada normal no dia seguinte: ainda dentro do prazo de confirmação atrasada.
+        process_career_plans(dry_run=False)
+        plan.refresh_from_db()
+        self.assertEqual(plan.status, CareerPlan.PlanStatus.AWAITING_CONFIRMATION)
+
+
+class CareerPlanBulkTransitionTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.dept = Department.objects.create(name="Produção")
+        self.current_job = JobTitle.objects.create(name="Operador", department=self.dept, base_salary=Decimal("3000.00"))
+        self.proposed_job = JobTitle.objects.create(name="Supervisor", department=self.dept, base_salary=Decimal("5000.00"))
+        for event_type in (EventTypes.CAREER_PLAN_REMINDER, EventTypes.CAREER_PLAN_CANCELLED, EventTypes.CAREER_PLAN_EFFECTIVE):
+            NotificationRule.objects.create(event_type=event_type, is_active=True, days_in_advance=0)
+        NotificationRecipient.objects.create(name="RH", email="rh@teste.com", is_active=True, receive_all_events=True)
+
+    def _plans(self, count, status, promotion_offset):
+        plans = []
+        for i in range(count):
+            employee = Employee.objects.create(
+                name=f"Lote {status} {i}", cpf=f"76{Employee.objects.count():09d}", birth_date="1990-01-01",
+                department=self.dept, job_title=self.current_job, current_salary=Decimal("3000.00"),
+            )
+            plan = CareerPlan.objects.create(
+                employee=employee, proposed_job=self.proposed_job, proposed_salary=Decimal("5000.00"),
+                promotion_date=self.today + timedelta(days=40), status=CareerPlan.PlanStatus.SCHEDULED,
+            )
+            CareerPlan.objects.filter(pk=plan.pk).update(status=status, promotion_date=self.today + timedelta(days=promotion_offset))
+            plans.append(plan)
+        return plans
+
+    def test_query_count_does_not_grow_with_plans(self):
+        from rhcontrol.services import apply_career_plan_transitions, plan_career_plan_transitions
+
+        def queries_for(count):
+            CareerPlan.objects.all().delete()
+            self._plans(count, CareerPlan.PlanStatus.SCHEDULED, 10)
+            self._plans(count, CareerPlan.PlanStatus.CONFIRMED, 0)
+            from django.db import connection
+            from django.test.utils import CaptureQueriesContext
+            with CaptureQueriesContext(connection) as ctx:
+                apply_career_plan_transitions(plan_career_plan_transitions(self.today), self.today)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(queries_for(2), queries_for(6))
+
+    def test_transitions_history_and_notifications(self):
+        from rhcontrol.models import EmployeeHistory
+
+        reminded = self._plans(2, CareerPlan.PlanStatus.SCHEDULED, 10)
+        missed = self._plans(1, CareerPlan.PlanStatus.SCHEDULED, -1)
+        promoted = self._plans(2, CareerPlan.PlanStatus.CONFIRMED, 0)
+
+        summary = process_career_plans(dry_run=False)
+        drain_notification_outbox()
+
+        self.assertEqual(summary['events_produced'], 5)
+        self.assertEqual(summary['transitions'], {
+            CareerPlan.PlanStatus.AWAITING_CONFIRMATION: 2,
+            CareerPlan.PlanStatus.CANCELLED: 1,
+            CareerPlan.PlanStatus.EFFECTIVE: 2,
+        })
+        self.assertTrue(all(p.reminder_sent_at for p in CareerPlan.objects.filter(pk__in=[p.pk for p in reminded])))
+        self.assertEqual(CareerPlan.objects.get(pk=missed[0].pk).cancellation_reason, 'Janela perdida/cron inativo')
+        for plan in promoted:
+            employee = Employee.objects.get(pk=plan.employee_id)
+            self.assertEqual(employee.job_title, self.proposed_job)
+            self.assertEqual(employee.current_salary, Decimal("5000.00"))
+        self.assertEqual(EmployeeHistory.objects.filter(reason="Plano de Carreira").count(), 2)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_dry_run_reports_the_same_transitions(self):
+        self._plans(1, CareerPlan.PlanStatus.SCHEDULED, 10)
+        self._plans(1, CareerPlan.PlanStatus.AWAITING_CONFIRMATION, 0)
+        self._plans(1, CareerPlan.PlanStatus.CONFIRMED, 0)
+
+        def report(dry_run):
+            with self.assertLogs('rhcontrol.services', level='INFO') as logs:
+                process_career_plans(dry_run=dry_run)
+            lines = [line.split(':', 2)[2].replace('[DRY-RUN] ', '') for line in logs.output]
+            return [line for line in lines if line.startswith('Plano ')]
+
+        simulated = report(True)
+        self.assertEqual(CareerPlan.objects.filter(status=CareerPlan.PlanStatus.SCHEDULED).count(), 1)
+        self.assertEqual(len(simulated), 3)
+        self.assertEqual(simulated, report(False))
+
+
+class AutomationWorkerTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        dept = Department.objects.create(name="Expedição")
+        job = JobTitle.objects.create(name="Auxiliar", department=dept, base_salary=Decimal("2000.00"))
+        self.proposed_job = JobTitle.objects.create(name="Encarregado", department=dept, base_salary=Decimal("3000.00"))
+        self.plans = []
+        for i in range(4):
+            employee = Employee.objects.create(
+                name=f"Fatia {i}", cpf=f"7700000000{i}", birth_date="1990-01-01",
+                department=dept, job_title=job, current_salary=Decimal("2000.00"),
+            )
+            self.plans.append(CareerPlan.objects.create(
+                employee=employee, proposed_job=self.proposed_job, proposed_salary=Decimal("3000.00"),
+                promotion_date=self.today + timedelta(days=10), status=CareerPlan.PlanStatus.SCHEDULED,
+            ))
+
+    def test_shards_partition_plans_by_employee(self):
+        from rhcontrol.services import plan_career_plan_transitions
+
+        shards = [
+            {t['plan'].pk for t in plan_career_plan_transitions(self.today, shard=(index, 2))}
+            for index in range(2)
+        ]
+        self.assertFalse(shards[0] & shards[1])
+        self.assertEqual(shards[0] | shards[1], {plan.pk for plan in self.plans})
+
+    def test_second_invocation_exits_when_all_slots_are_taken(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from rhcontrol.models import AutomationLease
+
+        AutomationLease.objects.create(name='run_automations:0', owner='outro:1', expires_at=timezone.now() + timedelta(hours=1))
+        out = StringIO()
+        call_command('run_automations', only='career_plans', workers=1, stdout=out)
+
+        self.assertIn('ocupadas', out.getvalue())
+        self.assertEqual(CareerPlan.objects.filter(status=CareerPlan.PlanStatus.SCHEDULED).count(), 4)
+        self.assertEqual(AutomationLease.objects.get().owner, 'outro:1')
+
+    def test_second_invocation_joins_as_worker_for_its_shard(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from rhcontrol.models import AutomationLease
+
+        AutomationLease.objects.create(name='run_automations:0', owner='outro:1', expires_at=timezone.now() + timedelta(hours=1))
+        out = StringIO()
+        call_command('run_automations', workers=2, stdout=out)
+
+        self.assertIn('[WORKER 2/2]', out.getvalue())
+        self.assertNotIn('notifications', out.getvalue())  # sem `shard`: só no primeiro worker
+        awaiting = set(CareerPlan.objects.filter(status=CareerPlan.PlanStatus.AWAITING_CONFIRMATION).values_list('employee_id', flat=True))
+        self.assertEqual(awaiting, {plan.employee_id for plan in self.plans if plan.employee_id % 2 == 1})
+        self.assertFalse(AutomationLease.objects.filter(name='run_automations:1').exists())
+
+    def test_expired_lease_is_taken_over(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from rhcontrol.models import AutomationLease
+
+        AutomationLease.objects.create(name='run_automations:0', owner='morto:1', expires_at=timezone.now() - timedelta(minutes=1))
+        call_command('run_automations', only='career_plans', workers=1, stdout=StringIO())
+
+        self.assertEqual(CareerPlan.objects.filter(status=CareerPlan.PlanStatus.AWAITING_CONFIRMATION).count(), 4)
+        self.assertFalse(AutomationLease.objects.exists())
+
+    def test_each_shard_records_its_own_checkpoint(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from rhcontrol.models import AutomationCheckpoint, AutomationLease
+
+        AutomationLease.objects.create(name='run_automations:0', owner='outro:1', expires_at=timezone.now() + timedelta(hours=1))
+        call_command('run_automations', workers=2, stdout=StringIO())
+
+        names = set(AutomationCheckpoint.objects.values_list('name', flat=True))
+        self.assertIn('career_plans:1/2', names)
+        self.assertNotIn('career_plans', names)
+        self.assertNotIn('career_plans:0/2', names)
+
+    def test_shard_without_checkpoint_falls_back_to_routine_checkpoint(self):
+        from rhcontrol.management.commands.run_automations import catchup_since
+        from rhcontrol.models import AutomationCheckpoint
+
+        AutomationCheckpoint.objects.create(name='career_plans', last_success_on=self.today - timedelta(days=5))
+        AutomationCheckpoint.objects.create(name='career_plans:0/2', last_success_on=self.today - timedelta(days=1))
+
+        self.assertIsNone(catchup_since('career_plans', self.today, (0, 2)))
+        self.assertEqual(catchup_since('career_plans', self.today, (1, 2)), self.today - timedelta(days=4))
+
+    def test_heartbeat_renews_lease_while_running(self):
+        import time
+        from unittest import mock
+        from rhcontrol.management.commands.run_automations import LeaseHeartbeat
+
+        with mock.patch('rhcontrol.management.commands.run_automations.renew_lease') as renew, \
+                mock.patch('rhcontrol.management.commands.run_automations.connection'):
+            with LeaseHeartbeat('run_automations:0', 'eu:1', interval=0.01):
+                time.sleep(0.1)
+            calls = renew.call_count
+            time.sleep(0.05)
+
+        self.assertGreater(calls, 1)
+        self.assertEqual(renew.call_count, calls)  # parou ao sair do bloco
+        renew.assert_called_with('run_automations:0', 'eu:1')
+
+
+class AutomationRunHistoryTests(TestCase):
+    def setUp(self):
+        dept = Department.objects.create(name="Qualidade")
+        job = JobTitle.objects.create(name="Inspetor", department=dept, base_salary=Decimal("2800.00"))
+        Employee.objects.create(
+            name="Aniversariante", cpf="78000000001", department=dept, job_title=job,
+            birth_date=timezone.localdate().replace(year=1992),
+        )
+        NotificationRule.objects.create(event_type=EventTypes.BIRTHDAY, days_in_advance=0)
+        NotificationRecipient.objects.create(name="RH", email="rh@teste.com", is_active=True, receive_all_events=True)
+
+    def _run(self, **options):
+        from io import StringIO
+        from django.core.management import call_command
+        call_command('run_automations', stdout=StringIO(), stderr=StringIO(), **options)
+
+    def test_run_and_steps_are_recorded_with_metrics(self):
+        from rhcontrol.models import AutomationRun
+
+        self._run()
+
+        run = AutomationRun.objects.get()
+        self.assertEqual(run.status, AutomationRun.RunStatus.SUCCESS)
+        self.assertFalse(run.dry_run)
+        self.assertIsNotNone(run.duration)
+        steps = {step.name: step for step in run.steps.all()}
+        self.assertEqual(set(steps), {'notifications', 'career_plans', 'notification_outbox', 'cipa_expiry', 'event_calendar', 'pdf_cleanup', 'automation_history'})
+        self.assertEqual((steps['notifications'].rows_scanned, steps['notifications'].events_produced), (1, 1))
+        self.assertEqual(steps['notification_outbox'].emails_sent, 1)
+
+    def test_failed_routine_is_recorded(self):
+        from unittest import mock
+        from rhcontrol.models import AutomationRun
+
+        with mock.patch.dict('rhcontrol.management.commands.run_automations.AUTOMATIONS_REGISTRY',
+                             {'notifications': mock.Mock(side_effect=RuntimeError('banco fora'))}):
+            with self.assertRaises(SystemExit):
+                self._run(only='notifications', dry_run=True)
+
+        run = AutomationRun.objects.get()
+        step = run.steps.get()
+        self.assertTrue(run.dry_run)
+        self.assertEqual((run.status, step.status, step.errors, step.error_message),
+                         (AutomationRun.RunStatus.FAILED, AutomationRun.RunStatus.FAILED, 1, 'banco fora'))
+
+    def test_history_older_than_retention_is_purged(self):
+        from django.test import override_settings
+        from rhcontrol.models import AutomationRun
+        from rhcontrol.services import purge_automation_history
+
+        old = AutomationRun.objects.create(status=AutomationRun.RunStatus.SUCCESS, started_at=timezone.now() - timedelta(days=40))
+        old.steps.create(name='notification_outbox', status=AutomationRun.RunStatus.SUCCESS)
+        recent = AutomationRun.objects.create(status=AutomationRun.RunStatus.SUCCESS, started_at=timezone.now() - timedelta(days=5))
+
+        with override_settings(AUTOMATION_RUN_RETENTION_DAYS=30):
+            self.assertEqual(purge_automation_history(dry_run=True), 1)
+            self.assertEqual(purge_automation_history(), 1)
+
+        self.assertEqual(list(AutomationRun.objects.values_list('pk', flat=True)), [recent.pk])
+
+    def test_cron_does_not_run_while_scheduler_holds_a_lease(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from rhcontrol.models import AutomationLease, AutomationRun
+
+        AutomationLease.objects.create(name='run_scheduler:notifications', owner='agendador:1', expires_at=timezone.now() + timedelta(hours=1))
+        out = StringIO()
+        call_command('run_automations', stdout=out)
+
+        self.assertIn('run_scheduler', out.getvalue())
+        self.assertFalse(AutomationRun.objects.exists())
+        self.assertEqual(list(AutomationLease.objects.values_list('name', flat=True)), ['run_scheduler:notifications'])
+
+    def test_metrics_endpoint_requires_token_or_permission(self):
+        from django.test import override_settings
+
+        self._run(only='notifications')
+        url = reverse('rhcontrol:automation_metrics')
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+        with override_settings(METRICS_TOKEN='segredo'):
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer errado').status_code, 401)
+            response = self.client.get(url, HTTP_AUTHORIZATION='Bearer segredo')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE rh_automation_step_duration_seconds gauge', body)
+        self.assertIn('rh_automation_step_events_produced{routine="notifications"} 1', body)
+        self.assertIn('rh_automation_runs_retained{status="success"} 1', body)
+        self.assertIn('rh_dashboard_cache_hits_total', body)
+
+    def test_history_page_lists_runs(self):
+        User.objects.create_superuser(username='ops', password='ops12345', email='ops@teste.com')
+        self.client.login(username='ops', password='ops12345')
+        self._run(only='notifications')
+
+        response = self.client.get(reverse('rhcontrol:automation_run_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'notifications')
+        self.assertEqual(len(response.context['trends']), 1)
+
+
+class AutomationSchedulerTests(TestCase):
+    def _scheduler(self, schedules, now):
+        from rhcontrol.management.commands.run_scheduler import Scheduler
+        scheduler = Scheduler(schedules, workers=1, jitter=0, now=now)
+        self.addCleanup(scheduler.shutdown)
+        return scheduler
+
+    def test_parse_and_next_run(self):
+        from rhcontrol.management.commands.run_scheduler import next_run_after, parse_schedule
+
+        self.assertEqual(parse_schedule(60), 60)
+        self.assertEqual(parse_schedule('06:30'), (6, 30))
+        for invalid in ('25:00', 'amanhã', 0):
+            with self.assertRaises(ValueError):
+                parse_schedule(invalid)
+
+        now = timezone.make_aware(datetime(2024, 5, 10, 7, 0))
+        self.assertEqual(next_run_after(60, now), now + timedelta(seconds=60))
+        self.assertEqual(timezone.localtime(next_run_after((6, 30), now)), timezone.make_aware(datetime(2024, 5, 11, 6, 30)))
+        jittered = next_run_after(60, now, jitter=10)
+        self.assertTrue(now + timedelta(seconds=60) <= jittered <= now + timedelta(seconds=70))
+
+    def test_missed_daily_routine_runs_at_startup(self):
+        from rhcontrol.models import AutomationCheckpoint
+
+        now = timezone.make_aware(datetime(2024, 5, 10, 12, 0))
+        AutomationCheckpoint.objects.create(name='cipa_expiry', last_success_on=timezone.localdate(now))
+        scheduler = self._scheduler({'notifications': '11:00', 'cipa_expiry': '11:00'}, now)
+
+        next_runs = {routine.name: routine.next_run for routine in scheduler.routines}
+        self.assertEqual(next_runs['notifications'], now)
+        self.assertGreater(next_runs['cipa_expiry'], now)
+
+    def test_tick_skips_overlaps_and_waits_for_dependencies(self):
+        from unittest import mock
+
+        now = timezone.now()
+        scheduler = self._scheduler({'notifications': 60, 'notification_outbox': 60, 'pdf_cleanup': 60}, now)
+        scheduler.running.add('notifications')
+
+        with mock.patch.object(scheduler.pool, 'submit') as submit:
+            scheduler.tick(now)
+
+        self.assertEqual([call.args[1].name for call in submit.call_args_list], ['pdf_cleanup'])
+        routines = {routine.name: routine for routine in scheduler.routines}
+        self.assertGreater(routines['notifications'].next_run, now)  # pulou este horário
+        self.assertEqual(routines['notification_outbox'].next_run, now)  # tenta de novo no próximo tick
+
+    def test_execute_records_run_and_respects_lease(self):
+        from rhcontrol.models import AutomationLease, AutomationRun
+
+        now = timezone.now()
+        scheduler = self._scheduler({'pdf_cleanup': 3600}, now)
+        routine = scheduler.routines[0]
+
+        AutomationLease.objects.create(name='run_scheduler:pdf_cleanup', owner='outro:1', expires_at=now + timedelta(hours=1))
+        scheduler._execute(routine)
+        self.assertFalse(AutomationRun.objects.exists())
+
+        AutomationLease.objects.all().delete()
+        scheduler.running.add('pdf_cleanup')
+        scheduler._execute(routine)
+        run = AutomationRun.objects.get()
+        self.assertEqual((run.status, run.steps.get().name), (AutomationRun.RunStatus.SUCCESS, 'pdf_cleanup'))
+        self.assertFalse(AutomationLease.objects.exists())
+        self.assertNotIn('pdf_cleanup', scheduler.running)
+
+    def test_execute_skips_while_cron_holds_a_lease(self):
+        from rhcontrol.models import AutomationLease, AutomationRun
+
+        now = timezone.now()
+        scheduler = self._scheduler({'pdf_cleanup': 3600}, now)
+        AutomationLease.objects.create(name='run_automations:0', owner='cron:1', expires_at=now + timedelta(hours=1))
+
+        scheduler._execute(scheduler.routines[0])
+
+        self.assertFalse(AutomationRun.objects.exists())
+        self.assertEqual(list(AutomationLease.objects.values_list('name', flat=True)), ['run_automations:0'])
+
+
+class EmployeeSearchTests(TestCase):
+    def setUp(self):
+        self.dept = Department.objects.create(name="Logística")
+        self.job = JobTitle.objects.create(name="Auxiliar", department=self.dept, base_salary=Decimal("2000.00"))
+        self.joao = self._employee("João da Conceição", "123.456.789-01", email="joao@empresa.com", mobile_phone="(11) 98765-4321")
+        self.maria = self._employee("Maria Joana Souza", "987.654.321-00", email="maria@empresa.com")
+
+        self.user = User.objects.create_user(username="rh", password="senha123")
+        from django.contrib.auth.models import Permission
+        self.user.user_permissions.add(Permission.objects.get(codename="view_employee"))
+        self.client.force_login(self.user)
+
+    def _employee(self, name, cpf, **extra):
+        return Employee.objects.create(
+            name=name, cpf=cpf, department=self.dept, job_title=self.job,
+            birth_date=datetime(1990, 1, 1).date(), **extra,
+        )
+
+    def _search(self, query, **kwargs):
+        from rhcontrol.search import search_employees
+        return list(search_employees(Employee.objects.all(), query, **kwargs))
+
+    def test_search_ignores_accents_and_case(self):
+        self.assertEqual(self._search("JOAO conceicao"), [self.joao])
+        self.assertEqual(self._search("joão"), [self.joao])
+        self.assertEqual(set(self._search("LOGISTICA")), {self.joao, self.maria})
+
+    def test_search_matches_formatted_and_digit_only_documents(self):
+        self.assertEqual(self._search("12345678901"), [self.joao])
+        self.assertEqual(self._search("123.456"), [self.joao])
+        self.assertEqual(self._search("11987654321"), [self.joao])
+        self.assertEqual(self._search("maria@empresa.com"), [self.maria])
+        self.assertEqual(self._search("inexistente"), [])
+
+    def test_substring_queries_fall_back_to_contains(self):
+        self.assertEqual(self._search("ceic"), [self.joao])  # meio do nome
+        self.assertEqual(set(self._search("@empresa")), {self.joao, self.maria})
+        self.assertEqual(self._search("5678"), [self.joao])  # parte do CPF
+        self.assertEqual(set(self._search("@")), {self.joao, self.maria})  # sem palavra para o FTS
+        self.assertEqual(self._search("zzz"), [])
+
+    def test_document_follows_employee_and_department_changes(self):
+        self.joao.name = "João Batista"
+        self.joao.save(update_fields=["name"])
+        self.assertEqual(self._search("batista"), [self.joao])
+        self.assertEqual(self._search("conceicao"), [])
+
+        self.dept.name = "Expedição"
+        self.dept.save()
+        self.assertEqual(set(self._search("expedicao")), {self.joao, self.maria})
+        self.assertEqual(self._search("logistica"), [])
+
+        self.maria.delete()
+        self.assertEqual(self._search("expedicao"), [self.joao])
+
+    def test_department_save_without_rename_skips_employees(self):
+        from unittest import mock
+
+        with mock.patch.object(Employee.objects, 'bulk_update') as bulk_update:
+            self.dept.save()
+            self.dept.save(update_fields=["name"])
+        bulk_update.assert_not_called()
+
+    def test_ranked_search_puts_best_match_first(self):
+        joana = self._employee("Joana Prado", "111.222.333-44")
+        ranked = self._search("joana", ranked=True)
+        self.assertEqual(ranked[0], joana)
+        self.assertEqual(set(ranked), {joana, self.maria})
+
+    def test_employee_list_uses_search_index(self):
+        response = self.client.get(reverse("rhcontrol:employee_list"), {"search": "joao"})
+        self.assertEqual(list(response.context["object_list"]), [self.joao])
+
+    def test_autocomplete_returns_active_employees_first(self):
+        self.joao.termination_date = timezone.localdate()
+        self.joao.save()
+        self._employee("Joaquim Alves", "555.666.777-88")
+
+        response = self.client.get(reverse("rhcontrol:employee_autocomplete"), {"q": "jo"})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data["success"])
+        names = [row["name"] for row in data["results"]]
+        self.assertEqual(set(names), {"João da Conceição", "Maria Joana Souza", "Joaquim Alves"})
+        self.assertEqual(names[-1], "João da Conceição")
+        self.assertFalse(data["results"][-1]["active"])
+
+        short = self.client.get(reverse("rhcontrol:employee_autocomplete"), {"q": "j"}).json()
+        self.assertEqual(short["results"], [])
+
+
+class CidSearchIndexTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import Permission
+        from rhcontrol.cid_index import cid_index
+        from rhcontrol.models import CID
+
+        CID.objects.bulk_create([
+            CID(code="F32", description="Episódios depressivos"),
+            CID(code="F320", description="Episódio depressivo leve"),
+            CID(code="F33", description="Transtorno depressivo recorrente"),
+            CID(code="S72", description="Fratura do fêmur"),
+            CID(code="A09", description="Diarreia e gastroenterite de origem infecciosa presumível"),
+        ])
+        cid_index.invalidate()
+        self.addCleanup(cid_index.invalidate)
+
+        user = User.objects.create_user(username="rh", password="senha123")
+        user.user_permissions.add(Permission.objects.get(codename="view_occurrence"))
+        self.client.force_login(user)
+
+    def _search(self, q, **headers):
+        return self.client.get(reverse("rhcontrol:ajax_search_cids"), {"q": q}, **headers)
+
+    def test_exact_code_comes_first(self):
+        results = self._search("f32").json()["results"]
+        self.assertEqual([r["text"].split(" - ")[0] for r in results], ["F32", "F320"])
+
+    def test_description_search_ignores_accents(self):
+        results = self._search("femur").json()["results"]
+        self.assertEqual([r["text"] for r in results], ["S72 - Fratura do fêmur"])
+        texts = [r["text"] for r in self._search("depress").json()["results"]]
+        self.assertEqual(texts[-1], "F33 - Transtorno depressivo recorrente")
+        self.assertEqual(len(texts), 3)
+
+    def test_search_does_not_query_cid_table(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self._search("f32")
+        with CaptureQueriesContext(connection) as ctx:
+            results = self._search("diarreia infec").json()["results"]
+        self.assertEqual(len(results), 1)
+        self.assertFalse([q for q in ctx.captured_queries if "rhcontrol_cid" in q["sql"]])
+
+    def test_etag_returns_not_modified_until_table_changes(self):
+        from rhcontrol.models import CID
+
+        first = self._search("fratura")
+        self.assertEqual(first.status_code, 200)
+        self.assertIn("ETag", first)
+        self.assertIn("private", first["Cache-Control"])
+
+        cached = self._search("fratura", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(cached.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CID.objects.create(code="S82", description="Fratura da perna")
+        refreshed = self._search("fratura", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertEqual(len(refreshed.json()["results"]), 2)
+
+    def test_other_process_changes_are_picked_up_after_refresh_interval(self):
+        from django.test import override_settings
+        from rhcontrol.models import CID
+
+        self._search("fratura")
+        CID.objects.filter(code="S72").delete()
+        CID.objects.bulk_create([CID(code="S720", description="Fratura do colo do fêmur")])
+        with override_settings(CID_INDEX_REFRESH_SECONDS=0.000001):
+            results = self._search("fratura").json()["results"]
+        self.assertEqual([r["text"].split(" - ")[0] for r in results], ["S720"])
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.dept = Department.objects.create(name="Operações")
+        self.job = JobTitle.objects.create(name="Operador", department=self.dept, base_salary=Decimal("2100.00"))
+        # Nomes repetidos: o pk desempata.
+        self.employees = [
+            Employee.objects.create(
+                name=f"Funcionário {i % 4}", cpf=f"79{i:09d}", department=self.dept, job_title=self.job,
+                birth_date=datetime(1990, 1, 1).date(),
+            )
+            for i in range(11)
+        ]
+
+    def _walk(self, paginator):
+        pages, page = [], paginator.get_page()
+        pages.append(page)
+        while page.has_next:
+            page = paginator.get_page(page.next_cursor)
+            pages.append(page)
+        return pages
+
+    def test_forward_and_backward_walks_cover_every_row_once(self):
+        from rhcontrol.pagination import KeysetPaginator
+
+        paginator = KeysetPaginator(Employee.objects.all(), 3, ['-name'])
+        pages = self._walk(paginator)
+        walked = [e.pk for page in pages for e in page]
+        expected = list(Employee.objects.order_by('-name', '-pk').values_list('pk', flat=True))
+        self.assertEqual(walked, expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 3, 2])
+        self.assertFalse(pages[0].has_previous)
+
+        back = paginator.get_page(pages[-1].previous_cursor)
+        self.assertEqual([e.pk for e in back], [e.pk for e in pages[-2]])
+        first = paginator.get_page(pages[1].previous_cursor)
+        self.assertEqual([e.pk for e in first], [e.pk for e in pages[0]])
+        self.assertFalse(first.has_previous)
+        self.assertTrue(first.has_next)
+
+    def test_nullable_sort_field_uses_sentinel(self):
+        from rhcontrol.pagination import KeysetPaginator
+
+        for i, employee in enumerate(self.employees[:6]):
+            Vacation.objects.create(employee=employee, start_date=datetime(2024, 1, 1 + i).date(), vacation_duration=10)
+        Vacation.objects.filter(employee__in=self.employees[:3]).update(return_date=None)
+
+        pages = self._walk(KeysetPaginator(Vacation.objects.all(), 2, ['return_date']))
+        walked = [v.return_date for page in pages for v in page]
+        self.assertEqual(len(walked), 6)
+        self.assertEqual(walked[3:], [None, None, None])
+        self.assertEqual(walked[:3], sorted(walked[:3]))
+
+    def test_invalid_cursor_returns_first_page(self):
+        from rhcontrol.pagination import KeysetPaginator
+
+        paginator = KeysetPaginator(Employee.objects.all(), 4, ['name'])
+        first = [e.pk for e in paginator.get_page()]
+        for cursor in ("lixo", "eyJ4Ijo", "WyJuIiwgWyJhIl1d"):
+            self.assertEqual([e.pk for e in paginator.get_page(cursor)], first)
+
+    def test_approximate_total_is_capped(self):
+        from rhcontrol.pagination import approximate_count
+
+        self.assertEqual(approximate_count(Employee.objects.all(), cap=20), (11, "11"))
+        self.assertEqual(approximate_count(Employee.objects.all(), cap=5), (5, "mais de 5"))
+
+    def test_list_view_cursor_keeps_filters(self):
+        from django.contrib.auth.models import Permission
+
+        user = User.objects.create_user(username="rh", password="senha123")
+        user.user_permissions.add(Permission.objects.get(codename="view_employee"))
+        self.client.force_login(user)
+        for i in range(45):
+            Employee.objects.create(
+                name=f"Extra {i:02d}", cpf=f"80{i:09d}", department=self.dept, job_title=self.job,
+                birth_date=datetime(1990, 1, 1).date(),
+            )
+
+        url = reverse("rhcontrol:employee_list")
+        response = self.client.get(url, {"status": "active", "sort": "name"})
+        page = response.context["page_obj"]
+        self.assertEqual(len(page), 40)
+        self.assertEqual(page.total_display, "56")
+        self.assertContains(response, f"cursor={page.next_cursor}")
+        self.assertContains(response, "status=active")
+
+        second = self.client.get(url, {"status": "active", "sort": "name", "cursor": page.next_cursor})
+        rows = list(second.context["object_list"])
+        self.assertEqual(len(rows), 16)
+        self.assertFalse({e.pk for e in rows} & {e.pk for e in page})
+        self.assertEqual(rows[-1].name, "Funcionário 3")
+
+
+class HotFilterIndexTests(TestCase):
+    def setUp(self):
+        self.dept = Department.objects.create(name="Compras")
+        self.job = JobTitle.objects.create(name="Comprador", department=self.dept, base_salary=Decimal("2800.00"))
+
+    def _employee(self, cpf, birth_date, **extra):
+        return Employee.objects.create(
+            name=f"Colaborador {cpf}", cpf=cpf, birth_date=birth_date,
+            department=self.dept, job_title=self.job, **extra
+        )
+
+    def test_month_day_expression(self):
+        from datetime import date
+        from rhcontrol.db_functions import MonthDay
+
+        self._employee("81000000001", date(1990, 1, 3))
+        self._employee("81000000002", date(1985, 12, 31), hire_date=date(2020, 2, 29))
+
+        rows = Employee.objects.annotate(birth=MonthDay('birth_date'), hire=MonthDay('hire_date')).order_by('cpf')
+        self.assertEqual([(e.birth, e.hire) for e in rows], [(103, None), (1231, 229)])
+
+    def test_annual_window_filters_on_the_partial_index(self):
+        from datetime import date
+        from rhcontrol.services import _ue_annual_window_q
+
+        inside = self._employee("81000000003", date(1990, 1, 3))
+        self._employee("81000000004", date(1991, 1, 3), termination_date=date(2024, 5, 1))
+        self._employee("81000000005", date(1992, 6, 15))
+
+        queryset = Employee.objects.filter(
+            _ue_annual_window_q("birth_date", date(2025, 12, 20), date(2026, 1, 10)),
+            termination_date__isnull=True,
+        )
+        self.assertEqual(list(queryset), [inside])
+        # Um intervalo de MonthDay por ano, sem EXTRACT parametrizado, para casar com o índice.
+        sql = str(queryset.query)
+        self.assertEqual(sql.count("BETWEEN"), 2)
+        self.assertNotIn("django_date_extract", sql)
+
+
+class DocumentDigitsTests(TestCase):
+    def setUp(self):
+        self.dept = Department.objects.create(name="Jurídico")
+        self.job = JobTitle.objects.create(name="Advogado", department=self.dept, base_salary=Decimal("6000.00"))
+        self.employee = self._employee("Ana Lima", "529.982.247-25", pis="120.5471.892-3", mobile_phone="(11) 98765-4321")
+
+    def _employee(self, name, cpf, **extra):
+        return Employee.objects.create(
+            name=name, cpf=cpf, department=self.dept, job_title=self.job,
+            birth_date=datetime(1990, 1, 1).date(), **extra,
+        )
+
+    def test_digits_are_kept_in_sync_on_save(self):
+        self.assertEqual((self.employee.cpf_digits, self.employee.pis_digits), ("52998224725", "12054718923"))
+
+        self.employee.cpf = "111.444.777-35"
+        self.employee.pis = ""
+        self.employee.save(update_fields=["cpf", "pis"])
+        self.employee.refresh_from_db()
+        self.assertEqual((self.employee.cpf_digits, self.employee.pis_digits), ("11144477735", None))
+
+    def test_same_document_with_other_formatting_is_rejected(self):
+        from django.db import IntegrityError, transaction
+        from rhcontrol.forms import DependentForm
+        from rhcontrol.models import Dependent
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self._employee("Outra Ana", "52998224725")
+
+        Dependent.objects.create(employee=self.employee, name="FILHO", cpf="11144477735",
+                                 birth_date=datetime(2015, 1, 1).date(), relationship_type="Filho(a)")
+        form = DependentForm(data={"name": "Outro", "cpf": "111.444.777-35", "birth_date": "2016-01-01",
+                                   "relationship_type": "Filho(a)"})
+        self.assertFalse(form.is_valid())
+        self.assertIn("Já existe um dependente cadastrado com este CPF.", form.errors["cpf"])
+
+    def test_full_document_search_uses_equality_lookup(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from rhcontrol.search import search_employees
+
+        self._employee("Bruno Reis", "111.444.777-35")
+        for query in ("529.982.247-25", "12054718923"):
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(list(search_employees(Employee.objects.all(), query, ranked=True)), [self.employee])
+            self.assertIn('"cpf_digits" =', ctx.captured_queries[-1]["sql"])
+
+        # Celular também tem 11 dígitos: sem CPF/PIS igual, cai na busca de texto.
+        self.assertEqual(list(search_employees(Employee.objects.all(), "11987654321")), [self.employee])
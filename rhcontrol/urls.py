@@ -8,6 +8,7 @@ app_name = 'rhcontrol'
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', views.dashboard_view, name='dashboard'),
+    path('dashboard/tenure/', views.tenure_distribution_json, name='tenure_distribution'),
     path('profile/', views.profile_view, name='profile'),
     path('profile/password/', views.change_password, name='change_password'),
 
@@ -35,6 +36,7 @@ urlpatterns = [
 
     #CAREER PLAN
     path('ajax/load-employee-data/', views.ajax_load_employee_data, name='ajax_load_employee_data'),
+    path('employees/autocomplete/', views.employee_autocomplete, name='employee_autocomplete'),
     path('ajax/load-jobs-by-department/', views.ajax_load_jobs_by_department, name='ajax_load_jobs_by_department'),
     path('career/', views.career_plan_list, name='career_plan_list'),
     path('career/create/', views.career_plan_create, name='career_plan_create'),
@@ -44,6 +46,10 @@ urlpatterns = [
     path('career/<int:pk>/delete/', views.career_plan_delete, name='career_plan_delete'),
     path('events/upcoming/', views.upcoming_events_view, name='upcoming_events'),
 
+    #AUTOMATIONS
+    path('automations/', views.automation_run_list, name='automation_run_list'),
+    path('automations/metrics/', views.automation_metrics, name='automation_metrics'),
+
     #VACATIONS
     path('vacations/', views.vacation_view, name='vacation_list'),
     path('vacations/create/', views.vacation_create, name='vacation_create'),
@@ -71,7 +77,11 @@ urlpatterns = [
     path('ajax/get-job-salary/', views.get_job_salary, name='ajax_get_job_salary'),
 
     #PDFs
+    path('pdf/jobs/<int:pk>/', views.pdf_job_status, name='pdf_job_status'),
+    path('pdf/jobs/<int:pk>/download/', views.pdf_job_download, name='pdf_job_download'),
     path('employees/pdf/', views.create_employee_list_pdf, name='employee_list_pdf'),
+    path('employees/export/', views.export_employee_list, name='employee_list_export'),
+    path('employees/admission-pack/', views.admission_pack_pdf, name='admission_pack_pdf'),
     path('employees/<int:pk>/registration-form/', views.create_employee_registration_pdf, name='employee_registration_pdf'),
     path('employees/<int:pk>/confidenciality-term/', views.create_confidenciality_pdf, name='confidenciality_term_pdf'),
     path('employees/<int:pk>/bank-presentation/', views.create_bank_presentation_pdf, name='bank_presentation_pdf'),
@@ -83,7 +93,9 @@ urlpatterns = [
     path('departments/pdf/department-and-jobtitles/', views.create_department_and_jobtitle_pdf, name='department_and_jobtitles_pdf'),
     path('departments/pdf/employees-department/', views.create_employees_department_pdf, name='employees_department_pdf'),
     path('vacation/pdf/', views.create_vacation_list_pdf, name='create_vacation_list_pdf'),
+    path('vacation/export/', views.export_vacation_list, name='vacation_list_export'),
     path('training/pdf/', views.create_training_list_pdf, name='training_list_pdf'),
+    path('training/export/', views.export_training_list, name='training_list_export'),
     path('employees/<int:employee_id>/occurrences/pdf/', views.create_occurrence_list_pdf, name='occurrence_list_pdf'),
     path('employees/<int:pk>/career-plan-pdf/', views.employee_career_plan_pdf, name='employee_career_plan_pdf'),
 
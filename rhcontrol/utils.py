@@ -1,3 +1,6 @@
+import re
+import unicodedata
+
 RH_PERMISSION_MATRIX = {
     'Funcionários': {
         'model': 'employee',
@@ -80,4 +83,31 @@ RH_PERMISSION_MATRIX = {
             'delete': 'delete_group',
         }
 }
-}
\ No newline at end of file
+}
+
+def normalize_search_text(value) -> str:
+    """
+    Minúsculas, sem acentos e com espaços colapsados, para a busca.
+
+    >>> normalize_search_text('  João   DA Conceição ')
+    'joao da conceicao'
+    >>> normalize_search_text(None)
+    ''
+    """
+    if not value:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', str(value))
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.lower().split())
+
+
+def only_digits(value) -> str:
+    """
+    Só os dígitos (0-9) de um documento ou telefone.
+
+    >>> only_digits('123.456.789-01')
+    '12345678901'
+    >>> only_digits(None)
+    ''
+    """
+    return re.sub(r'[^0-9]', '', str(value or ''))
@@ -1,11 +1,12 @@
+import json
 from pydoc import html
 from django.conf import settings
-from django.http import HttpResponse, Http404, JsonResponse
+from django.http import HttpResponse, Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.core.exceptions import PermissionDenied
-from rhcontrol.models import Employee, EmployeeHistory, Vacation, Training, JobTitle, Department, CareerPlan, Occurrence
-from django.db.models import Q, Prefetch, Count
+from rhcontrol.models import AutomationRun, AutomationStep, Employee, EmployeeHistory, Vacation, Training, JobTitle, Department, CareerPlan, Occurrence, PdfRenderJob
+from django.db.models import Avg, Q, Max, Prefetch, Count
 from django.core.paginator import Paginator
 from rhcontrol.forms import DependentFormSet, EmployeeHistoryForm, LoginForm, RoleGroupForm, SystemUserForm, SystemUserUpdateForm, UserUpdateForm, EmployeeForm, VacationForm, TrainingForm, DepartmentForm, JobTitleFormSet, CareerPlanForm
 from django.contrib.auth.forms import AuthenticationForm, PasswordChangeForm
@@ -15,12 +16,19 @@ from django.contrib.auth.decorators import login_required, permission_required,
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.decorators.http import require_POST
 from django.contrib import messages 
+from django.utils.crypto import constant_time_compare
 from datetime import date, timedelta, timezone
 from django.utils import timezone
-from django.template.loader import render_to_string
-from weasyprint import HTML
 
-from rhcontrol.services import get_historical_minimum_wage
+from rhcontrol.pdf import (
+    ADMISSION_DOCUMENTS, admission_context, admission_filename, enqueue_admission_pack, iter_admission_pack_zip,
+    pack_inline_limit, parse_admission_pack_request, pdf_file_response, pdf_job_file_response, pdf_job_payload,
+    render_admission_pack_pdf, render_pdf_response,
+)
+from rhcontrol.exports import EMPLOYEE_EXPORT_COLUMNS, TRAINING_EXPORT_COLUMNS, VACATION_EXPORT_COLUMNS, export_response
+from rhcontrol.pagination import KeysetPaginator
+from rhcontrol.search import autocomplete_employees, search_employees
+from rhcontrol.services import get_historical_minimum_wage, render_automation_metrics
 from rhcontrol.utils import RH_PERMISSION_MATRIX
 
 
@@ -78,58 +86,87 @@ def logout_view(request):
     logout(request)
     return redirect('rhcontrol:login')
         
-@login_required
-def dashboard_view(request):
+def _dashboard_data(today):
     from datetime import timedelta
-    from .services import get_upcoming_events
+    from .services import get_upcoming_events, get_tenure_distribution
 
-    today = timezone.localdate()
-    employees_count = Employee.objects.count()
-    active_employees = Employee.objects.filter(termination_date__isnull=True)
+    headcount = Employee.objects.aggregate(
+        total=Count('pk'),
+        active=Count('pk', filter=Q(termination_date__isnull=True)),
+    )
     vacations_count = Vacation.objects.filter(end_date__gte=today).count()
-    hire_date = Employee.hire_date
-    
-   
-    date_1_year = today - timedelta(days=365)
-    date_3_years = today - timedelta(days=365*3)
-    date_5_years = today - timedelta(days=365*5)
-    date_10_years = today - timedelta(days=365*10)
-    date_15_years = today - timedelta(days=365*15)
-
-    count_less_1 = Employee.objects.filter(hire_date__gte=date_1_year).count()
-    count_1_to_3 = Employee.objects.filter(hire_date__lt=date_1_year, hire_date__gte=date_3_years).count()
-    count_3_to_5 = Employee.objects.filter(hire_date__lt=date_3_years, hire_date__gte=date_5_years).count()
-    count_5_to_10 = Employee.objects.filter(hire_date__lt=date_5_years, hire_date__gte=date_10_years).count()
-    count_10_to_15 = Employee.objects.filter(hire_date__lt=date_10_years, hire_date__gte=date_15_years).count()
-    count_more_15 = Employee.objects.filter(hire_date__lt=date_15_years).count()
+
+    tenure = get_tenure_distribution(today=today)
 
     events = get_upcoming_events(
         start_date=today,
         end_date=today + timedelta(days=30),
         limit=200,
     )
+
+    return {
+        'employees_count':        headcount['total'],
+        'active_employees_count': headcount['active'],
+        'vacations_count':        vacations_count,
+        'events':                 events,
+        'chart_labels':           [bucket['label'] for bucket in tenure],
+        'chart_data':             [bucket['count'] for bucket in tenure],
+    }
+
+@login_required
+def dashboard_view(request):
+    from .cache import dashboard_cache
+
+    today = timezone.localdate()
+    # Os números do dashboard são os mesmos para todo usuário logado: uma entrada por dia.
+    data = dashboard_cache.get_or_compute(
+        dashboard_cache.make_key(today),
+        lambda: _dashboard_data(today),
+    )
+
+    events = data['events']
     _VISIBLE_LIMIT = 8
 
     context = {
-        'employees_count':            employees_count,
-        'active_employees':           active_employees,
-        'vacations_count':            vacations_count,
+        'employees_count':            data['employees_count'],
+        'active_employees_count':     data['active_employees_count'],
+        'vacations_count':            data['vacations_count'],
         'upcoming_events_count':      len(events),
         'upcoming_events_top':        events[:_VISIBLE_LIMIT],
         'upcoming_events_more_count': max(0, len(events) - _VISIBLE_LIMIT),
-
-        'chart_data': [
-            count_less_1,
-            count_1_to_3,
-            count_3_to_5,
-            count_5_to_10,
-            count_10_to_15,
-            count_more_15,  
-        ]
+        'chart_labels':               json.dumps(data['chart_labels']),
+        'chart_data':                 data['chart_data'],
     }
 
     return render(request, 'dashboard/pages/dashboard.html', context)
 
+@login_required
+def tenure_distribution_json(request):
+    """
+    Histograma de tempo de empresa em JSON (mesmo agregado do gráfico do dashboard).
+
+    Query params (opcionais):
+        department_id   int
+        edges           limites em anos separados por vírgula (ex.: 1,2,5,10)
+    """
+    from .services import get_tenure_distribution
+
+    department_id = request.GET.get('department_id') or None
+    raw_edges = request.GET.get('edges', '')
+    try:
+        department_id = int(department_id) if department_id else None
+        edges = [int(e) for e in raw_edges.split(',') if e.strip()] or None
+        buckets = get_tenure_distribution(edges=edges, department_id=department_id)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Parâmetros inválidos.'}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'labels': [bucket['label'] for bucket in buckets],
+        'data': [bucket['count'] for bucket in buckets],
+        'buckets': buckets,
+    })
+
 def is_rh_admin(user):
     if user.groups.filter(name='RhAdmin').exists() or user.is_superuser:
         return True
@@ -280,27 +317,14 @@ def employees(request):
 @permission_required('rhcontrol.view_employee', raise_exception=True)
 @login_required
 def employee_view(request):
-    limit_date = timezone.now().date() - timedelta(days=366)
-    
-    expired_employees = Employee.objects.filter(
-        is_cipa_member=True,
-        cipa_mandate_end_date__lt=limit_date
-    )
-    
-    for emp in expired_employees:
-        emp.check_cipa_expiration()
-
-    employee_list = Employee.objects.select_related('department').all().order_by('name')
+    # Mandatos de CIPA expirados são encerrados por run_automations (cipa_expiry).
+    employee_list = Employee.objects.select_related('department').with_status_flags()
 
     query = request.GET.get('search', '')
+    # Buscando sem ordenação escolhida, os resultados vêm por relevância.
+    sort_by = request.GET.get('sort') or ('relevance' if query else 'name')
     if query:
-        employee_list = employee_list.filter(
-            Q(name__icontains=query) | 
-            Q(cpf__icontains=query) |
-            Q(email__icontains=query) |
-            Q(department__name__icontains=query) |
-            Q(mobile_phone__icontains=query)
-        )
+        employee_list = search_employees(employee_list, query, ranked=sort_by == 'relevance')
     
     status_filter = request.GET.get('status')
     
@@ -310,19 +334,19 @@ def employee_view(request):
     elif status_filter == 'demitido':
         employee_list = employee_list.filter(termination_date__isnull=False)
 
-    sort_by = request.GET.get('sort', 'name')
     valid_sort_fields = ['name', 'cpf','department__name']
     if sort_by in valid_sort_fields:
-        employee_list = employee_list.order_by(sort_by)
+        ordering = [sort_by]
+    elif query and sort_by == 'relevance':
+        ordering = ['-search_rank', 'name']
     else:
-        employee_list = employee_list.order_by('name')
+        ordering = ['name']
 
-    paginator = Paginator(employee_list, 40)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = KeysetPaginator(employee_list, 40, ordering).get_page(request.GET.get('cursor'))
 
     context = {
         'object_list': page_obj,
+        'page_obj': page_obj,
     }
     return render(request, 'dashboard/pages/employee/list.html', context)
 
@@ -616,11 +640,7 @@ def vacation_view(request):
     sort_by = request.GET.get('sort', 'employee__name') 
 
     valid_sort_fields = ['employee__name', 'start_date', 'end_date', 'return_date', 'vacation_duration']
-    
-    if sort_by in valid_sort_fields:
-        vacation_list = vacation_list.order_by(sort_by)
-    else:
-        vacation_list = vacation_list.order_by('employee__name') 
+    ordering = [sort_by if sort_by in valid_sort_fields else 'employee__name']
 
     hoje = timezone.localdate()
     if status == 'historico':
@@ -637,12 +657,11 @@ def vacation_view(request):
     if date_to:
         vacation_list = vacation_list.filter(start_date__lte=date_to)
 
-    paginator = Paginator(vacation_list, 30)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = KeysetPaginator(vacation_list, 30, ordering).get_page(request.GET.get('cursor'))
 
     context = {
         'object_list': page_obj,
+        'page_obj': page_obj,
         'search_query': search_query,
         'date_from': date_from,
         'date_to': date_to,
@@ -728,7 +747,7 @@ def vacation_delete(request, pk):
 def training_view(request):
     training_list = Training.objects.annotate(
         num_attended=Count('attended_employees')
-    ).order_by('-start_date')
+    )
     
     search_query = request.GET.get('search', '')
     date_from = request.GET.get('date_from', '')
@@ -762,12 +781,11 @@ def training_view(request):
 
 
 
-    paginator = Paginator(training_list, 15)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = KeysetPaginator(training_list, 15, ['-start_date']).get_page(request.GET.get('cursor'))
 
     context = {
         'object_list': page_obj,
+        'page_obj': page_obj,
         'search_query': search_query,
         'date_from': date_from,
         'date_to': date_to,
@@ -926,18 +944,47 @@ def department_delete(request, pk):
 
 
 # ========= PDFs =========
+def _get_user_pdf_job(request, pk):
+    jobs = PdfRenderJob.objects.all()
+    if not request.user.is_superuser:
+        jobs = jobs.filter(requested_by=request.user)
+    return get_object_or_404(jobs, pk=pk)
+
+@login_required
+def pdf_job_status(request, pk):
+    """ Status de um PDF enfileirado com ?async=1 (consultado via polling). """
+    return JsonResponse(pdf_job_payload(_get_user_pdf_job(request, pk)))
+
+@login_required
+def pdf_job_download(request, pk):
+    job = _get_user_pdf_job(request, pk)
+    if job.status != PdfRenderJob.JobStatus.DONE:
+        return JsonResponse(pdf_job_payload(job), status=409)
+    return pdf_job_file_response(job)
+
 @login_required
 @permission_required('rhcontrol.view_employee', raise_exception=True)
 def create_employee_list_pdf(request):
+    employee_list, status_filter, query = _filter_employee_list(request)
+
+    context = {
+        'employees': employee_list,
+        'status_filter': status_filter,
+        'query': query,
+        'generated_at': timezone.now(),
+        'user': request.user,
+        'company_name_settings': settings.COMPANY_NAME,
+    }
+    
+    return render_pdf_response(request, 'dashboard/pages/employee/pdf/list.html', context, 'lista_de_funcionarios.pdf', with_request=False)
+
+def _filter_employee_list(request):
+    """Filtros e ordenação da lista de funcionários (PDF e exportação)."""
     employee_list = Employee.objects.select_related('department').all()
     
     query = request.GET.get('search', '')
     if query:
-        employee_list = employee_list.filter(
-            Q(name__icontains=query) | 
-            Q(cpf__icontains=query) | 
-            Q(email__icontains=query)
-        )
+        employee_list = search_employees(employee_list, query)
     
     status_filter = request.GET.get('status', 'todos')
     if status_filter == 'ativo':
@@ -953,207 +1000,109 @@ def create_employee_list_pdf(request):
     else:
         employee_list = employee_list.order_by('name')
 
-    context = {
-        'employees': employee_list,
-        'status_filter': status_filter,
-        'query': query,
-        'generated_at': timezone.now(),
-        'user': request.user,
-        'company_name_settings': settings.COMPANY_NAME,
-    }
-    
-    html_string = render_to_string('dashboard/pages/employee/pdf/list.html', context)
-    
-    html = HTML(string=html_string, base_url=request.build_absolute_uri())
-    
-    pdf = html.write_pdf()
-    
-    response = HttpResponse(pdf, content_type='application/pdf')
-    response['Content-Disposition'] = 'inline; filename="lista_de_funcionarios.pdf"'
-    return response 
+    return employee_list, status_filter, query
 
 @login_required
 @permission_required('rhcontrol.view_employee', raise_exception=True)
-def create_employee_registration_pdf(request, pk):
+def export_employee_list(request):
+    employee_list, _, _ = _filter_employee_list(request)
+    return _export_list_response(request, employee_list, EMPLOYEE_EXPORT_COLUMNS, 'lista_de_funcionarios')
+
+def _export_list_response(request, queryset, columns, filename):
+    try:
+        return export_response(queryset, columns, filename, request.GET.get('format', 'csv'))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+def _admission_document_response(request, pk, doc_type):
     employee = get_object_or_404(Employee, pk=pk)
-    
-    context = {
-        'employee': employee,
-        'user': request.user,
-        'generated_at': timezone.now(),
-        'company_name_settings': settings.COMPANY_NAME,
-    }
-    
-    html_string = render_to_string('dashboard/pages/employee/pdf/registration_form.html', context, request=request)
-    
-    html = HTML(string=html_string, base_url=request.build_absolute_uri())
-    pdf = html.write_pdf()
-    
-    response = HttpResponse(pdf, content_type='application/pdf')
-    
-    safe_name = employee.name.replace(' ', '_')
-    filename = f"ficha_cadastral_{employee.id}_{safe_name}.pdf"
-    response['Content-Disposition'] = f'inline; filename="{filename}"'
-    
-    return response
+    template_name, _ = ADMISSION_DOCUMENTS[doc_type]
+    context = admission_context(employee, request.user)
+    return render_pdf_response(request, template_name, context, admission_filename(employee, doc_type))
 
 @login_required
 @permission_required('rhcontrol.view_employee', raise_exception=True)
-def create_confidenciality_pdf(request, pk):
-    employee = get_object_or_404(Employee, pk=pk)
-    context = {'employee': employee,
-               'user': request.user,
-               'generated_at': timezone.now(),
-               'company_name_settings': settings.COMPANY_NAME,
-               }
-
-    html_string = render_to_string('dashboard/pages/employee/pdf/confidentiality_term.html', context, request=request)
-    html = HTML(string=html_string, base_url=request.build_absolute_uri())
-    pdf = html.write_pdf()
-
-    response = HttpResponse(pdf, content_type='application/pdf')
+def create_employee_registration_pdf(request, pk):
+    return _admission_document_response(request, pk, 'registration_form')
 
-    safe_name = employee.name.replace(' ', '_')
-    filename = f"termo_de_confidencialidade_{employee.id}_{safe_name}.pdf"
-    response['Content-Disposition'] = f'inline; filename="{filename}"'
-    
-    return response
+@login_required
+@permission_required('rhcontrol.view_employee', raise_exception=True)
+def create_confidenciality_pdf(request, pk):
+    return _admission_document_response(request, pk, 'confidentiality_term')
 
 @login_required
 @permission_required('rhcontrol.view_employee', raise_exception=True)
 def create_bank_presentation_pdf(request, pk):
-    employee = get_object_or_404(Employee, pk=pk)
-    context = {'employee': employee,
-               'user': request.user,
-               'generated_at': timezone.now(),
-               'company_name_settings': settings.COMPANY_NAME,
-               }
-
-    html_string = render_to_string('dashboard/pages/employee/pdf/bank_presentation.html', context, request=request)
-    html = HTML(string=html_string, base_url=request.build_absolute_uri())
-    pdf = html.write_pdf()
-
-    response = HttpResponse(pdf, content_type='application/pdf')
-
-    safe_name = employee.name.replace(' ', '_')
-    filename = f"apresentacao_bancaria_{employee.id}_{safe_name}.pdf"
-    response['Content-Disposition'] = f'inline; filename="{filename}"'
-    
-    return response
+    return _admission_document_response(request, pk, 'bank_presentation')
 
 @login_required
 @permission_required('rhcontrol.view_employee', raise_exception=True)
 def create_personal_data_consent_pdf(request, pk):
-    employee = get_object_or_404(Employee, pk=pk)
-    context = {
-        'employee': employee,
-        'user': request.user,
-        'generated_at': timezone.now(),
-        'company_name_settings': settings.COMPANY_NAME,
-    }
-
-    html_string = render_to_string('dashboard/pages/employee/pdf/personal_data_consent.html', context, request=request)
-    html = HTML(string=html_string, base_url=request.build_absolute_uri())
-    pdf = html.write_pdf()
-
-    response = HttpResponse(pdf, content_type='application/pdf')
-
-    safe_name = employee.name.replace(' ', '_')
-    filename = f"termo_de_compromisso_{employee.id}_{safe_name}.pdf"
-    response['Content-Disposition'] = f'inline; filename="{filename}"'
-    
-    return response
+    return _admission_document_response(request, pk, 'personal_data_consent')
 
 @login_required
 @permission_required('rhcontrol.view_employee', raise_exception=True)
 def create_commitment_term_pdf(request, pk):
-    employee = get_object_or_404(Employee, pk=pk)
-    context = {
-        'employee': employee,
-        'user': request.user,
-        'generated_at': timezone.now(),
-        'company_name_settings': settings.COMPANY_NAME,
-    }
-
-    html_string = render_to_string('dashboard/pages/employee/pdf/commitment_term.html', context, request=request)
-    html = HTML(string=html_string, base_url=request.build_absolute_uri())
-    pdf = html.write_pdf()
-
-    response = HttpResponse(pdf, content_type='application/pdf')
-
-    safe_name = employee.name.replace(' ', '_')
-    filename = f"termo_de_compromisso_{employee.id}_{safe_name}.pdf"
-    response['Content-Disposition'] = f'inline; filename="{filename}"'
-    
-    return response
+    return _admission_document_response(request, pk, 'commitment_term')
 
 @login_required
 @permission_required('rhcontrol.view_employee', raise_exception=True)
 def create_image_consent_pdf(request, pk):
-    employee = get_object_or_404(Employee, pk=pk)
-    context = {
-        'employee': employee,
-        'user': request.user,
-        'generated_at': timezone.now(),
-        'company_name_settings': settings.COMPANY_NAME,
-    }
-
-    html_string = render_to_string('dashboard/pages/employee/pdf/image_consent.html', context, request=request)
-    html = HTML(string=html_string, base_url=request.build_absolute_uri())
-    pdf = html.write_pdf()
-
-    response = HttpResponse(pdf, content_type='application/pdf')
-
-    safe_name = employee.name.replace(' ', '_')
-    filename = f"termo_de_consentimento_uso_imagem_{employee.id}_{safe_name}.pdf"
-    response['Content-Disposition'] = f'inline; filename="{filename}"'
-    
-    return response
+    return _admission_document_response(request, pk, 'image_consent')
 
 @login_required
 @permission_required('rhcontrol.view_employee', raise_exception=True)
 def create_benefits_acquisition_pdf(request, pk):
-    employee = get_object_or_404(Employee, pk=pk)
-    context = {
-        'employee': employee,
-        'user': request.user,
-        'generated_at': timezone.now(),
-        'company_name_settings': settings.COMPANY_NAME,
-    }
-
-    html_string = render_to_string('dashboard/pages/employee/pdf/benefits_acquisition.html', context, request=request)
-    html = HTML(string=html_string, base_url=request.build_absolute_uri())
-    pdf = html.write_pdf()
-
-    response = HttpResponse(pdf, content_type='application/pdf')
-
-    safe_name = employee.name.replace(' ', '_')
-    filename = f"termo_de_aquisicao_beneficios_{employee.id}_{safe_name}.pdf"
-    response['Content-Disposition'] = f'inline; filename="{filename}"'
-    
-    return response
+    return _admission_document_response(request, pk, 'benefits_acquisition')
 
 @login_required
 @permission_required('rhcontrol.view_employee', raise_exception=True)
 def create_internal_regulation_pdf(request, pk):
-    employee = get_object_or_404(Employee, pk=pk)
-    context = {
-        'employee': employee,
-        'user': request.user,
-        'generated_at': timezone.now(),
-        'company_name_settings': settings.COMPANY_NAME,
-    }
-
-    html_string = render_to_string('dashboard/pages/employee/pdf/internal_regulation.html', context, request=request)
-    html = HTML(string=html_string, base_url=request.build_absolute_uri())
-    pdf = html.write_pdf()
+    return _admission_document_response(request, pk, 'internal_regulation')
 
-    response = HttpResponse(pdf, content_type='application/pdf')
-
-    safe_name = employee.name.replace(' ', '_')
-    filename = f"regimento_interno_{employee.id}_{safe_name}.pdf"
-    response['Content-Disposition'] = f'inline; filename="{filename}"'
-    
+@login_required
+@permission_required('rhcontrol.view_employee', raise_exception=True)
+def admission_pack_pdf(request):
+    """
+    Kit de admissão para vários funcionários de uma vez.
+
+    Query params:
+        employees   ids separados por vírgula (obrigatório)
+        documents   tipos separados por vírgula (default: todos — ver ADMISSION_DOCUMENTS)
+        format      "zip" (default, um arquivo por documento) ou "pdf" (um único PDF)
+        async       "1" força a fila mesmo para kits pequenos
+
+    Até PDF_PACK_INLINE_MAX_EMPLOYEES funcionários o kit sai na resposta.
+    Acima disso (ou com async=1) vira um PdfRenderJob renderizado pelo
+    run_pdf_worker e a resposta é 202 com as URLs de status/download.
+    Os funcionários saem na ordem em que foram informados.
+    """
+    try:
+        employee_ids, doc_types = parse_admission_pack_request(
+            request.GET.get('employees', ''), request.GET.get('documents', ''),
+        )
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    found = set(Employee.objects.filter(pk__in=employee_ids).values_list('pk', flat=True))
+    employee_ids = [pk for pk in employee_ids if pk in found]
+    if not employee_ids:
+        raise Http404("Nenhum funcionário encontrado.")
+
+    fmt = 'pdf' if request.GET.get('format', 'zip') == 'pdf' else 'zip'
+    if len(employee_ids) > pack_inline_limit() or request.GET.get('async', '').lower() in ('1', 'true'):
+        job = enqueue_admission_pack(employee_ids, doc_types, fmt, request.user)
+        return JsonResponse(pdf_job_payload(job), status=202)
+
+    if fmt == 'pdf':
+        pdf = render_admission_pack_pdf(employee_ids, doc_types, request.user)
+        return pdf_file_response(pdf, 'kit_admissao.pdf')
+
+    response = StreamingHttpResponse(
+        iter_admission_pack_zip(employee_ids, doc_types, request.user.pk),
+        content_type='application/zip',
+    )
+    response['Content-Disposition'] = 'attachment; filename="kit_admissao.zip"'
     return response
 
 @login_required
@@ -1172,17 +1121,10 @@ def create_department_and_jobtitle_pdf(request):
         'company_name_settings': settings.COMPANY_NAME,
     }
 
-    html_string = render_to_string('dashboard/pages/departments/pdf/department_and_jobtitle.html', context, request=request)
-    html = HTML(string=html_string, base_url=request.build_absolute_uri())
-    pdf = html.write_pdf()
-
-    response = HttpResponse(pdf, content_type='application/pdf')
-
     safe_name = "setores_e_cargos"
     filename = f"regimento_interno_de_{safe_name}.pdf"
-    response['Content-Disposition'] = f'inline; filename="{filename}"'
 
-    return response
+    return render_pdf_response(request, 'dashboard/pages/departments/pdf/department_and_jobtitle.html', context, filename)
 
 @login_required
 @permission_required('rhcontrol.view_employee', raise_exception=True)
@@ -1205,20 +1147,30 @@ def create_employees_department_pdf(request):
         'company_name_settings': settings.COMPANY_NAME,
     }
 
-    html_string = render_to_string('dashboard/pages/departments/pdf/employees_department.html', context, request=request)
-    html = HTML(string=html_string, base_url=request.build_absolute_uri())
-    pdf = html.write_pdf()
-
-    response = HttpResponse(pdf, content_type='application/pdf')
-
     filename = "funcionarios_por_setor.pdf"
-    response['Content-Disposition'] = f'inline; filename="{filename}"'
 
-    return response
+    return render_pdf_response(request, 'dashboard/pages/departments/pdf/employees_department.html', context, filename)
 
 @login_required
 @permission_required('rhcontrol.view_vacation', raise_exception=True)
 def create_vacation_list_pdf(request):
+    vacation_list, status_filter, search_query, date_from, date_to = _filter_vacation_list(request)
+
+    context = {
+        'vacation': vacation_list,
+        'search_query': search_query,
+        'date_from': date_from,
+        'date_to': date_to,
+        'status_filter': status_filter,
+        'generated_at': timezone.now(),
+        'user': request.user,
+        'company_name_settings': settings.COMPANY_NAME,
+    }
+
+    return render_pdf_response(request, 'dashboard/pages/vacation/pdf/vacation_list.html', context, 'lista_de_ferias.pdf')
+
+def _filter_vacation_list(request):
+    """Filtros da lista de férias (PDF e exportação)."""
     vacation_list = Vacation.objects.select_related('employee').all().order_by('employee__name')
 
     status_filter = request.GET.get('status', 'ativas') 
@@ -1239,29 +1191,34 @@ def create_vacation_list_pdf(request):
     elif status_filter == 'historico':
         vacation_list = vacation_list.filter(end_date__lt=today)
 
+    return vacation_list, status_filter, search_query, date_from, date_to
+
+@login_required
+@permission_required('rhcontrol.view_vacation', raise_exception=True)
+def export_vacation_list(request):
+    vacation_list, *_ = _filter_vacation_list(request)
+    return _export_list_response(request, vacation_list, VACATION_EXPORT_COLUMNS, 'lista_de_ferias')
+
+@login_required
+@permission_required('rhcontrol.view_training', raise_exception=True)
+def create_training_list_pdf(request):
+    training_list, status_filter, query, date_from, date_to = _filter_training_list(request)
+
     context = {
-        'vacation': vacation_list,
-        'search_query': search_query,
+        'trainings': training_list,
+        'status_filter': status_filter,
+        'query': query,
         'date_from': date_from,
         'date_to': date_to,
-        'status_filter': status_filter,
         'generated_at': timezone.now(),
         'user': request.user,
         'company_name_settings': settings.COMPANY_NAME,
     }
 
-    html_string = render_to_string('dashboard/pages/vacation/pdf/vacation_list.html', context, request=request)
-    html = HTML(string=html_string, base_url=request.build_absolute_uri())
-    pdf = html.write_pdf()
-
-    response = HttpResponse(pdf, content_type='application/pdf')
-    response['Content-Disposition'] = 'inline; filename="lista_de_ferias.pdf"'
+    return render_pdf_response(request, 'dashboard/pages/training/pdf/training_list_pdf.html', context, 'lista_de_treinamentos.pdf', with_request=False)
 
-    return response
-
-@login_required
-@permission_required('rhcontrol.view_training', raise_exception=True)
-def create_training_list_pdf(request):
+def _filter_training_list(request):
+    """Filtros e ordenação da lista de treinamentos (PDF e exportação)."""
     training_list = Training.objects.annotate(
         num_attended=Count('attended_employees', distinct=True),
         num_scheduled=Count('scheduled_employees', distinct=True)
@@ -1302,25 +1259,13 @@ def create_training_list_pdf(request):
     else:
         training_list = training_list.order_by('-start_date')
 
-    context = {
-        'trainings': training_list,
-        'status_filter': status_filter,
-        'query': query,
-        'date_from': date_from,
-        'date_to': date_to,
-        'generated_at': timezone.now(),
-        'user': request.user,
-        'company_name_settings': settings.COMPANY_NAME,
-    }
-
-    html_string = render_to_string('dashboard/pages/training/pdf/training_list_pdf.html', context)
-    html = HTML(string=html_string, base_url=request.build_absolute_uri())
-    pdf = html.write_pdf()
-    
-    response = HttpResponse(pdf, content_type='application/pdf')
-    response['Content-Disposition'] = 'inline; filename="lista_de_treinamentos.pdf"'
+    return training_list, status_filter, query, date_from, date_to
 
-    return response
+@login_required
+@permission_required('rhcontrol.view_training', raise_exception=True)
+def export_training_list(request):
+    training_list, *_ = _filter_training_list(request)
+    return _export_list_response(request, training_list, TRAINING_EXPORT_COLUMNS, 'lista_de_treinamentos')
 
 @login_required
 @permission_required('rhcontrol.view_occurrence', raise_exception=True)
@@ -1362,14 +1307,7 @@ def create_occurrence_list_pdf(request, employee_id):
         'company_name_settings': settings.COMPANY_NAME,
     }
 
-    html_string = render_to_string('dashboard/pages/occurrence/pdf/occurrence_list_pdf.html', context)
-    html = HTML(string=html_string, base_url=request.build_absolute_uri())
-    pdf = html.write_pdf()
-    
-    response = HttpResponse(pdf, content_type='application/pdf')
-    response['Content-Disposition'] = f'inline; filename="Ocorrencias_{employee.name.replace(" ", "_")}.pdf"'
-    
-    return response
+    return render_pdf_response(request, 'dashboard/pages/occurrence/pdf/occurrence_list_pdf.html', context, f'Ocorrencias_{employee.name.replace(" ", "_")}.pdf', with_request=False)
 
 @login_required
 
@@ -1452,14 +1390,7 @@ def employee_career_plan_pdf(request, pk):
         'user': request.user,
     }
     
-    html_string = render_to_string('dashboard/pages/career/pdf/career_plan_pdf.html', context, request=request)
-    html = HTML(string=html_string, base_url=request.build_absolute_uri())
-    pdf = html.write_pdf()
-    
-    response = HttpResponse(pdf, content_type='application/pdf')
-    response['Content-Disposition'] = f'inline; filename="Plano_Carreira_{employee.name.replace(" ", "_")}.pdf"'
-    
-    return response
+    return render_pdf_response(request, 'dashboard/pages/career/pdf/career_plan_pdf.html', context, f'Plano_Carreira_{employee.name.replace(" ", "_")}.pdf')
 
 @login_required
 @permission_required('rhcontrol.view_employee', raise_exception=True)
@@ -1482,6 +1413,12 @@ def ajax_load_employee_data(request):
             
     return JsonResponse({'success': False, 'error': 'ID não fornecido'})
 
+@login_required
+@permission_required('rhcontrol.view_employee', raise_exception=True)
+def employee_autocomplete(request):
+    results = autocomplete_employees(request.GET.get('q', ''), limit=getattr(settings, 'EMPLOYEE_AUTOCOMPLETE_LIMIT', 10))
+    return JsonResponse({'success': True, 'results': results})
+
 @login_required
 @permission_required('rhcontrol.view_jobtitle', raise_exception=True)
 def ajax_load_jobs_by_department(request):
@@ -1535,10 +1472,11 @@ def career_plan_list(request):
         'created_at':      'created_at',
         '-created_at':     '-created_at',
     }
-    plans = plans.order_by(valid_sorts.get(sort_by, '-created_at'))
+    page_obj = KeysetPaginator(plans, 30, [valid_sorts.get(sort_by, '-created_at')]).get_page(request.GET.get('cursor'))
 
     context = {
-        'plans': plans,
+        'plans': page_obj,
+        'page_obj': page_obj,
         'search_query': search_query,
         'date_from': date_from,
         'date_to': date_to,
@@ -1850,4 +1788,49 @@ def user_delete_view(request, pk):
         messages.success(request, 'Usuário excluído com sucesso!')
         return redirect('rhcontrol:user_list')
 
-    return render(request, 'dashboard/pages/user/delete.html', {'system_user': user})
\ No newline at end of file
+    return render(request, 'dashboard/pages/user/delete.html', {'system_user': user})
+
+# ========= Automações (run_automations) =========
+@login_required
+@permission_required('rhcontrol.view_automationrun', raise_exception=True)
+def automation_run_list(request):
+    """ Histórico das execuções do run_automations e tendência por rotina (últimos 30 dias). """
+    runs = AutomationRun.objects.prefetch_related('steps')
+    paginator = Paginator(runs, 30)
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    since = timezone.now() - timedelta(days=30)
+    trends = (
+        AutomationStep.objects.filter(run__dry_run=False, started_at__gte=since)
+        .values('name')
+        .annotate(
+            executions=Count('pk'),
+            failures=Count('pk', filter=Q(status=AutomationRun.RunStatus.FAILED)),
+            avg_duration=Avg('duration'),
+            max_duration=Max('duration'),
+            avg_rows=Avg('rows_scanned'),
+        )
+        .order_by('name')
+    )
+
+    return render(request, 'dashboard/pages/automation/list.html', {
+        'page_obj': page_obj,
+        'trends': trends,
+    })
+
+
+def automation_metrics(request):
+    """
+    Métricas do run_automations no formato texto do Prometheus. Aceita
+    `Authorization: Bearer <METRICS_TOKEN>` (para o scraper) ou um usuário
+    logado com permissão de ver as execuções.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorized = bool(token) and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not authorized:
+        if not request.user.is_authenticated:
+            return HttpResponse('Não autorizado', status=401, content_type='text/plain; charset=utf-8')
+        if not request.user.has_perm('rhcontrol.view_automationrun'):
+            raise PermissionDenied
+
+    return HttpResponse(render_automation_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -7,16 +7,21 @@ All views are nested under an employee:
 Access is restricted to authenticated users who belong to the 'RhAdmin' group.
 Non-RhAdmin authenticated users receive HTTP 403 (PermissionDenied).
 """
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.core.paginator import Paginator
-from django.db.models import Q
 from django.http import JsonResponse
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import etag
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, View
 
-from rhcontrol.models import CID, Employee, Occurrence
+from rhcontrol.cid_index import cid_index
+from rhcontrol.models import Employee, Occurrence
+from rhcontrol.pagination import KeysetPaginator
 from rhcontrol.forms import OccurrenceForm
 
 
@@ -42,7 +47,7 @@ class OccurrenceListView(PermissionRequiredMixin, ListView):
     """
     GET  employees/<employee_id>/occurrences/
     Shows all occurrences for the given employee, most recent first.
-    Paginated at 20 per page.
+    Paginated at 20 per page with a keyset cursor (rhcontrol.pagination).
     """
 
     permission_required = 'rhcontrol.view_occurrence'
@@ -71,9 +76,15 @@ class OccurrenceListView(PermissionRequiredMixin, ListView):
             queryset = queryset.filter(occurrence_date__lte=date_to)
 
         if sort_by == 'occurrence_date':
-            return queryset.order_by('occurrence_date', 'created_at')
+            self.keyset_ordering = ['occurrence_date', 'created_at']
         else:
-            return queryset.order_by('-occurrence_date', '-created_at')
+            self.keyset_ordering = ['-occurrence_date', '-created_at']
+        return queryset.order_by(*self.keyset_ordering)
+
+    def paginate_queryset(self, queryset, page_size):
+        # Cursor (?cursor=...) em vez de ?page=N: sem COUNT(*) completo nem OFFSET.
+        page = KeysetPaginator(queryset, page_size, self.keyset_ordering).get_page(self.request.GET.get('cursor'))
+        return None, page, page.object_list, page.has_other_pages
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
@@ -203,23 +214,23 @@ class OccurrenceDeleteView(PermissionRequiredMixin, DeleteView):
         ctx['employee'] = self.employee
         return ctx
     
+def _cid_search_etag(request, *args, **kwargs):
+    return cid_index.get().etag(request.GET.get('q', '').strip())
+
+
 class AjaxSearchCidsView(PermissionRequiredMixin, View):
+    """Autocomplete do CID na ocorrência, servido pelo índice em memória (cid_index.py)."""
     permission_required = 'rhcontrol.view_occurrence'
     raise_exception = True
 
+    @method_decorator(etag(_cid_search_etag))
     def get(self, request, *args, **kwargs):
         query = request.GET.get('q', '').strip()
 
         if len(query) < 2:
             return JsonResponse({'results': []})
 
-        cids = CID.objects.filter(
-            Q(code__icontains=query) | Q(description__icontains=query)
-        )[:20]
-        
-        results = [
-            {'id': cid.id, 'text': f"{cid.code} - {cid.description}"}
-            for cid in cids
-        ]
-        
-        return JsonResponse({'results': results})
\ No newline at end of file
+        results = cid_index.get().search(query, limit=20)
+        response = JsonResponse({'results': results})
+        patch_cache_control(response, private=True, max_age=getattr(settings, 'CID_SEARCH_MAX_AGE', 300))
+        return response